@@ -5,8 +5,22 @@ a = Analysis(
     ['ai-cli'],
     pathex=[],
     binaries=[('/usr/local/lib/python3.12/site-packages/_cffi_backend.cpython-312-x86_64-linux-gnu.so', '.')],
-    datas=[],
-    hiddenimports=['_cffi_backend'],
+    datas=[('tts_rules/*.json', 'tts_rules')],
+    hiddenimports=[
+        '_cffi_backend',
+        # providers are imported by name, see provider_registry.py
+        'passthrough_ai_provider',
+        'openai_ai_provider',
+        'anthropic_ai_provider',
+        'perplexity_ai_provider',
+        'openai_tts_provider',
+        'elevenlabs_tts_provider',
+        'playht_tts_provider',
+        'print_tts_provider',
+        'openai_stt_provider',
+        # optional, enables HTTP/2 in http_transport.py
+        'h2',
+    ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,6 +1,23 @@
+import asyncio
+import concurrent.futures
+import threading
 import utils
+from provider_registry import ProviderDescriptor, ProviderRegistry
 from abc import ABC, abstractmethod
 
+# how often a reader waiting for room in the chunk queue checks whether the consumer stopped
+PUT_POLL_INTERVAL = 0.1
+
+def close_stream(result):
+    close = getattr(result, 'close', None)
+    if close is None:
+        return
+    try:
+        close()
+    except Exception as e:
+        # e.g. a generator which is still running on the reader
+        utils.print_verbose('Stream', f'Failed to close the stream: {e}')
+
 class AIProvider(ABC):
 
     @abstractmethod
@@ -10,12 +27,31 @@ class AIProvider(ABC):
     def supports_sessions(self):
         return False
 
+    def context_tokens(self, model):
+        return 8192
+
+    def warm_up(self):
+        pass
+
+    def max_concurrency(self):
+        # requests at the same time, e.g. in --batch
+        return 4
+
+    def catalog_ttl(self):
+        # seconds until the model list is refreshed
+        return 24 * 60 * 60
+
     @abstractmethod
     def _list_models(self):
         pass
 
     def list_models(self, cache_directory_path):
-        return utils.list_models(self.name(), self._list_models, True, cache_directory_path)
+        return utils.list_models(self.name(), self._list_models, True, cache_directory_path, self.catalog_ttl())
+
+    def request_parameters(self, model):
+        # what chat_completion sends besides model, messages and stream, e.g. sampling options,
+        # a cached response is only used for the same parameters
+        return {}
 
     @abstractmethod
     def chat_completion(self, messages, model, stream=False):
@@ -29,6 +65,59 @@ class AIProvider(ABC):
     def convert_chunk_to_text(self, chunk, text_chunks, sources, handle_metadata_func):
         pass
 
+    async def iterate_chunks_async(self, result, max_pending=64):
+        # the SDK streams block, so they are read on a thread, at most max_pending chunks ahead of the consumer
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(maxsize=max_pending)
+        end = object()
+        stopped = threading.Event()
+        finished = threading.Event()
+
+        def put(item):
+            # returns False once the consumer stopped, the thread never waits on a queue nobody reads anymore
+            try:
+                future = asyncio.run_coroutine_threadsafe(chunks.put(item), loop)
+            except RuntimeError:
+                # the loop is gone
+                return False
+            while not stopped.is_set():
+                try:
+                    future.result(timeout=PUT_POLL_INTERVAL)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    pass
+            future.cancel()
+            return False
+
+        def read():
+            try:
+                for chunk in result:
+                    if not put((chunk, None)):
+                        break
+                else:
+                    put((end, None))
+            except Exception as e:
+                if not stopped.is_set():
+                    put((end, e))
+            finally:
+                finished.set()
+                close_stream(result)
+
+        threading.Thread(target=utils.with_thread_state(read), name='llm-reader', daemon=True).start()
+        try:
+            while True:
+                chunk, error = await chunks.get()
+                if error is not None:
+                    raise error
+                if chunk is end:
+                    break
+                yield chunk
+        finally:
+            stopped.set()
+            if not finished.is_set():
+                # the reader may wait for the next chunk, closing the stream ends the request
+                close_stream(result)
+
     def remove_source_references(self, text):
         return text
 
@@ -36,14 +125,12 @@ class AIProvider(ABC):
     def close(self):
         pass
 
-def get_ai_providers():
-    providers = []
-    from passthrough_ai_provider import PassthroughProvider
-    providers.append(PassthroughProvider())
-    from openai_ai_provider import OpenAIProvider
-    providers.append(OpenAIProvider())
-    from anthropic_ai_provider import AnthropicAIProvider
-    providers.append(AnthropicAIProvider())
-    from perplexity_ai_provider import PerplexityAiProvider
-    providers.append(PerplexityAiProvider())
-    return providers
\ No newline at end of file
+AI_PROVIDERS = [
+    ProviderDescriptor('passthrough', 'passthrough_ai_provider', 'PassthroughProvider'),
+    ProviderDescriptor('openai', 'openai_ai_provider', 'OpenAIProvider'),
+    ProviderDescriptor('anthropic', 'anthropic_ai_provider', 'AnthropicAIProvider'),
+    ProviderDescriptor('perplexity', 'perplexity_ai_provider', 'PerplexityAiProvider'),
+]
+
+def get_ai_providers(cache_directory_path):
+    return ProviderRegistry('ai', AI_PROVIDERS, cache_directory_path)
\ No newline at end of file
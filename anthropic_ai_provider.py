@@ -14,6 +14,13 @@ class AnthropicAIProvider(AIProvider):
     def supports_sessions(self):
         return True
 
+    def context_tokens(self, model):
+        return 200000
+
+    def catalog_ttl(self):
+        # scraped from the docs, which change rarely
+        return 7 * 24 * 60 * 60
+
     def _list_models(self):
         if not self.model_names:
             # no api function, so hack
@@ -31,6 +38,9 @@ class AnthropicAIProvider(AIProvider):
                 print(f"WARNING: Failed to retrieve anthropic model list: {e}")
         return self.model_names
 
+    def request_parameters(self, model):
+        return { 'max_tokens': 1024 }
+
     def chat_completion(self, messages, model, stream=False):
         system_message = ''
         conversation_messages = []
@@ -41,11 +51,11 @@ class AnthropicAIProvider(AIProvider):
                 conversation_messages.append(m)
 
         return self.client.messages.create(
-            max_tokens=1024,
             model=model,
             messages=conversation_messages,
             system=system_message,
             stream=stream,
+            **self.request_parameters(model),
         )
 
     def convert_result_to_text(self, result, sources, handle_metadata_func):
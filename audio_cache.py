@@ -0,0 +1,43 @@
+from disk_cache import DiskCache
+
+class AudioCache(DiskCache):
+    def __init__(self, directory, max_bytes):
+        super().__init__(directory, max_bytes)
+
+    def audio_key(self, tts_provider, model, voice_id, speed, text, audio_format=None):
+        if audio_format is not None:
+            return DiskCache.key(tts_provider.name(), model, voice_id, speed, text, audio_format.name)
+        return DiskCache.key(tts_provider.name(), model, voice_id, speed, text)
+
+class RecordingAudioFile:
+    # passes audio data through to the target and stores it in the cache once complete
+    def __init__(self, cache, key, target):
+        self.cache = cache
+        self.key = key
+        self.target = target
+        self.data = bytearray()
+        self.discarded = False
+
+    def write(self, data) -> int:
+        self.data.extend(data)
+        return self.target.write(data)
+
+    def discard(self):
+        self.discarded = True
+
+    def set_error(self, error):
+        self.discarded = True
+        self.target.set_error(error)
+
+    def close(self):
+        if not self.discarded and len(self.data) > 0:
+            self.cache.put(self.key, bytes(self.data))
+            self.discarded = True
+        self.target.close()
+
+    @property
+    def closed(self):
+        return self.target.closed
+
+    def __str__(self):
+        return str(self.target)
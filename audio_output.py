@@ -0,0 +1,49 @@
+import threading
+
+# how a request plays its audio. The daemon serves several requests at once, each one has its own output,
+# worker threads get the output of their request with utils.with_thread_state
+
+class AudioOutput:
+    def __init__(self, sink='device', crossfade_ms=0, cwd=None):
+        # 'null' discards audio instead of opening a device, for benchmarks
+        self.sink = sink
+        # where -c commands run, the working directory of the client in the daemon
+        self.cwd = cwd
+        self.crossfade_ms = crossfade_ms
+        # TTSProvider.Format asked for when streaming to the playback engine, None for the provider's default
+        self.format = None
+        # see audio_cache.py, None if audio isn't cached
+        self.cache = None
+        # started once per request for a -c command with {stdin}, see audio_pipe.py
+        self.pipe = None
+        self.lock = threading.Lock()
+
+    def get_pipe(self, command):
+        with self.lock:
+            if self.pipe is None:
+                # utils carries the output to worker threads, audio_pipe imports utils
+                from audio_pipe import AudioPipe
+                self.pipe = AudioPipe(command, self.cwd)
+            pipe = self.pipe
+        return pipe.start()
+
+    def close_pipe(self, abort=False):
+        with self.lock:
+            pipe = self.pipe
+            self.pipe = None
+        if pipe is not None:
+            pipe.close(abort)
+
+    def cancel(self):
+        # from another thread, e.g. when the client of a daemon request went away, stops what is played
+        self.close_pipe(abort=True)
+
+default_output = AudioOutput()
+
+local = threading.local()
+
+def get_audio_output():
+    return getattr(local, 'output', default_output)
+
+def set_audio_output(output):
+    local.output = output
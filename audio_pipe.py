@@ -0,0 +1,99 @@
+import queue
+import subprocess
+import threading
+from utils import print_verbose, print_error, with_thread_state
+from tracing import get_tracer
+
+# an audio command with {stdin}, e.g. "mpg123 -q {stdin}" or "ffplay -nodisp -autoexit {stdin}", is started once per run
+# and gets the audio of all segments through its stdin in playback order, {stdin} is replaced with -
+STDIN_PLACEHOLDER = '{stdin}'
+CHUNK_SIZE = 16 * 1024
+
+def is_pipe_command(command):
+    return bool(command) and STDIN_PLACEHOLDER in command
+
+class AudioPipe:
+    def __init__(self, command, cwd=None):
+        self.command = command.replace(STDIN_PLACEHOLDER, '-')
+        self.cwd = cwd
+        self.process = None
+        self.writer = None
+        self.queue = queue.Queue()
+        self.broken = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.process is None:
+                print_verbose("Status", "Running audio command:", self.command)
+                with get_tracer().span('audio command start', 'playback'):
+                    self.process = subprocess.Popen(['bash', '-c', self.command], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=self.cwd)
+                self.writer = threading.Thread(target=with_thread_state(self._write), name='audio-pipe', daemon=True)
+                self.writer.start()
+        return self
+
+    def play(self, source, on_done=None):
+        # source is bytes or a stream which is read until it ends, on_done is called once it was written
+        self.start()
+        self.queue.put((source, on_done))
+
+    def _read(self, source):
+        if isinstance(source, (bytes, bytearray)):
+            yield source
+            return
+        while True:
+            data = source.read(CHUNK_SIZE)
+            if not data:
+                return
+            yield data
+
+    def _write(self):
+        tracer = get_tracer()
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            source, on_done = item
+            try:
+                if self.broken:
+                    raise BrokenPipeError()
+                start = None
+                for data in self._read(source):
+                    if start is None:
+                        start = tracer.now()
+                    self.process.stdin.write(data)
+                self.process.stdin.flush()
+                if start is not None and not isinstance(source, (bytes, bytearray)):
+                    # not the silence which wakes up the output
+                    tracer.playback(f'pipe {source}', start, tracer.now())
+            except BrokenPipeError:
+                if not self.broken:
+                    self.broken = True
+                    print_error("Audio command exited:", self.command)
+                if hasattr(source, 'abort'):
+                    # stops the TTS request behind it
+                    source.abort()
+            except Exception as e:
+                print_error("Failed to play audio:", e)
+            finally:
+                if on_done:
+                    on_done()
+
+    def close(self, abort=False):
+        # waits until the command played everything, unless it is aborted
+        if self.process is None:
+            return
+        if abort:
+            self.broken = True
+            self.process.kill()
+        self.queue.put(None)
+        self.writer.join()
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        try:
+            self.process.wait()
+        except KeyboardInterrupt:
+            self.process.kill()
+            raise
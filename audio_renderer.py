@@ -0,0 +1,91 @@
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import print_verbose, print_error, with_thread_state
+from tracing import get_tracer
+
+# --output-audio-file: the chunks of a text are synthesized in parallel into part files next to the output,
+# which are joined in order once all of them are there. The parts are named by their text, so a run which
+# failed or was interrupted is resumed by running it again, only the missing parts are synthesized.
+
+class AudioRenderer:
+    def __init__(self, synthesize_func, max_workers=2, key=''):
+        # synthesize_func(text, file_path) writes the audio of text to file_path and raises if it failed,
+        # key identifies everything else the audio depends on, e.g. provider, model and voice
+        self.synthesize_func = synthesize_func
+        self.max_workers = max_workers
+        self.key = key
+        self.finished = 0
+        self.lock = threading.Lock()
+
+    def part_path(self, directory, index, text):
+        digest = hashlib.sha256(f'{self.key}\n{text}'.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(directory, f'{index:05d}-{digest}.part')
+
+    def progress(self, total, start):
+        with self.lock:
+            self.finished += 1
+            finished = self.finished
+        if sys.stderr.isatty():
+            print(f'\rRendering:     {finished}/{total} parts, {time.perf_counter() - start:.1f} s', end='', file=sys.stderr, flush=True)
+
+    def render_part(self, text, file_path, total, start):
+        # returns whether the part is there
+        tracer = get_tracer()
+        part_start = time.perf_counter()
+        temp_path = f'{file_path}.tmp'
+        try:
+            with tracer.span('render part', 'tts', file=os.path.basename(file_path)):
+                self.synthesize_func(text, temp_path)
+            if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+                raise RuntimeError('No audio')
+            # only complete parts get the name which is looked for on resume
+            os.replace(temp_path, file_path)
+        except Exception as e:
+            print_error(f'Failed to render {os.path.basename(file_path)}:', e)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+        finally:
+            self.progress(total, start)
+        print_verbose('Render', f'{os.path.basename(file_path)} ({len(text)} characters) in {int((time.perf_counter() - part_start) * 1000)} ms')
+        return True
+
+    def render(self, chunks, output_path):
+        # returns the number of parts which failed, the output is only written if there are none
+        directory = f'{output_path}.parts'
+        os.makedirs(directory, exist_ok=True)
+        paths = [ self.part_path(directory, i, text) for i, text in enumerate(chunks) ]
+        missing = [ i for i, path in enumerate(paths) if not os.path.exists(path) ]
+        if len(missing) < len(paths):
+            print_verbose('Render', f'Resuming, {len(paths) - len(missing)} of {len(paths)} parts are done')
+        print_verbose('Render', f'{len(missing)} parts, {self.max_workers} workers')
+
+        start = time.perf_counter()
+        self.finished = len(paths) - len(missing)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='render') as executor:
+            futures = [ executor.submit(with_thread_state(self.render_part), chunks[i], paths[i], len(paths), start) for i in missing ]
+            try:
+                failed = sum(1 for future in futures if not future.result())
+            except KeyboardInterrupt:
+                # parts in progress are finished and kept for the next run
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+        if sys.stderr.isatty():
+            print(file=sys.stderr)
+        if failed:
+            return failed
+
+        with get_tracer().span('join parts', 'tts'):
+            temp_path = f'{output_path}.tmp'
+            with open(temp_path, 'wb') as output:
+                for path in paths:
+                    with open(path, 'rb') as part:
+                        shutil.copyfileobj(part, output)
+            os.replace(temp_path, output_path)
+        shutil.rmtree(directory, ignore_errors=True)
+        return 0
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import print_verbose, print_error, with_thread_state
+from tracing import get_tracer
+
+# --batch: one request per input line, e.g. {"prompt": "...", "model": "gpt-4o", "role": "...", "session": "...", "output": "answer.txt"}
+# Results are appended to the output file as they complete, one line per request tagged with the line index of the
+# input, so a batch which was interrupted can be resumed by skipping the indexes which already succeeded.
+
+class BatchItem:
+    def __init__(self, index, request):
+        self.index = index
+        self.request = request
+
+def read_batch(file_path):
+    # returns the items and an error result for each line which is not a request
+    items = []
+    errors = []
+    with open(file_path, 'r') as f:
+        for index, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                errors.append({ 'index': index, 'error': f'Invalid JSON: {e}' })
+                continue
+            if isinstance(request, str):
+                request = { 'prompt': request }
+            if not isinstance(request, dict) or not request.get('prompt'):
+                errors.append({ 'index': index, 'error': 'No prompt' })
+                continue
+            items.append(BatchItem(index, request))
+    return items, errors
+
+def read_results(file_path):
+    # indexes which already have a successful result in the output of an earlier run, and all indexes with a result
+    completed = set()
+    written = set()
+    try:
+        with open(file_path, 'r') as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    # the last line may be cut off if the run was killed
+                    continue
+                if isinstance(result, dict) and 'index' in result:
+                    written.add(result['index'])
+                    if not result.get('error'):
+                        completed.add(result['index'])
+    except FileNotFoundError:
+        pass
+    return completed, written
+
+class BatchRunner:
+    def __init__(self, run_func, provider_func, max_workers=8, chain_func=None):
+        # run_func(item) returns the result fields of a request, provider_func(item) the provider it will use.
+        # Items for which chain_func(item) returns the same key, e.g. their session, run one after another in input order
+        self.run_func = run_func
+        self.provider_func = provider_func
+        self.chain_func = chain_func
+        self.max_workers = max_workers
+        # at most max_workers requests at a time over all providers
+        self.slots = threading.BoundedSemaphore(max_workers)
+        self.output = None
+        self.output_lock = threading.Lock()
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.elapsed = 0
+
+    def write(self, result):
+        with self.output_lock:
+            if result.get('error'):
+                self.failed += 1
+            else:
+                self.done += 1
+            print(json.dumps(result, ensure_ascii=False), file=self.output, flush=True)
+
+    def run_item(self, item, provider, total):
+        start = time.perf_counter()
+        try:
+            with self.slots:
+                with get_tracer().span(f'batch #{item.index}', 'batch', provider=provider.name()):
+                    result = dict({ 'index': item.index }, **self.run_func(item))
+        except Exception as e:
+            print_error(f'Batch request {item.index} failed:', e)
+            result = { 'index': item.index, 'error': str(e) }
+        result['elapsed_ms'] = int((time.perf_counter() - start) * 1000)
+        self.write(result)
+        print_verbose('Batch', f'{self.done + self.failed}/{total} request {item.index} in {result["elapsed_ms"]} ms')
+
+    def run_chain(self, chain, total):
+        for item, provider in chain:
+            self.run_item(item, provider, total)
+
+    def chains(self, items):
+        # the items in input order, grouped into chains which run as one task each
+        chains = {}
+        for item in items:
+            key = self.chain_func(item) if self.chain_func else None
+            chains.setdefault(key if key is not None else ('item', item.index), []).append(item)
+        return list(chains.values())
+
+    def submit(self, executors, chain, total):
+        # each provider gets its own pool limited to what it allows, a provider which is slow or
+        # rate limited doesn't hold up the requests to the others. A chain runs in the pool of its first item
+        resolved = []
+        for item in chain:
+            try:
+                resolved.append((item, self.provider_func(item)))
+            except Exception as e:
+                print_error(f'Batch request {item.index} failed:', e)
+                self.write({ 'index': item.index, 'error': str(e) })
+        if not resolved:
+            return None
+        provider = resolved[0][1]
+        executor = executors.get(provider.name())
+        if executor is None:
+            workers = min(self.max_workers, provider.max_concurrency())
+            print_verbose('Batch', f'{provider.name()}: {workers} workers')
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'batch-{provider.name()}')
+            executors[provider.name()] = executor
+        return executor.submit(with_thread_state(self.run_chain), resolved, total)
+
+    def run(self, input_path, output_path, resume=False):
+        # returns the number of failed requests
+        items, errors = read_batch(input_path)
+        reported = []
+        if resume:
+            completed, written = read_results(output_path)
+            self.skipped = sum(1 for item in items if item.index in completed)
+            items = [ item for item in items if item.index not in completed ]
+            # invalid lines keep failing, their errors are in the output already
+            reported = [ error for error in errors if error['index'] in written ]
+            errors = [ error for error in errors if error['index'] not in written ]
+        print_verbose('Batch', f'{len(items)} requests, {self.skipped} already done, at most {self.max_workers} at a time')
+        # invalid lines count as failed requests
+        total = len(items) + len(errors) + len(reported)
+        self.failed += len(reported)
+
+        start = time.perf_counter()
+        directory = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(directory, exist_ok=True)
+        with open(output_path, 'a' if resume else 'w') as self.output:
+            for error in errors:
+                self.write(error)
+            executors = {}
+            try:
+                futures = [ self.submit(executors, chain, total) for chain in self.chains(items) ]
+                for future in futures:
+                    if future is not None:
+                        future.result()
+            finally:
+                for executor in executors.values():
+                    executor.shutdown(cancel_futures=True)
+        self.output = None
+        self.elapsed = time.perf_counter() - start
+        return self.failed
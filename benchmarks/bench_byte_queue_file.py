@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# Throughput and read latency of ByteQueueFile with one writer and one reader thread.
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from byte_queue_file import ByteQueueFile
+
+TOTAL_BYTES = 64 * 1024 * 1024
+WRITE_SIZES = [ 1024, 2048, 16384 ]
+READ_SIZE = 4096
+
+def run(write_size):
+    audio_file = ByteQueueFile()
+    payload = os.urandom(write_size)
+    write_times = []
+
+    def writer():
+        written = 0
+        while written < TOTAL_BYTES:
+            write_times.append(time.perf_counter())
+            written += audio_file.write(payload)
+        audio_file.close()
+
+    latencies = []
+    buffer = bytearray(READ_SIZE)
+    t = threading.Thread(target=writer)
+    start = time.perf_counter()
+    t.start()
+    read = 0
+    while True:
+        before = time.perf_counter()
+        count = audio_file.readinto(buffer)
+        latencies.append(time.perf_counter() - before)
+        if not count:
+            break
+        read += count
+    elapsed = time.perf_counter() - start
+    t.join()
+    assert read == len(write_times) * write_size
+
+    latencies.sort()
+    return read / elapsed / (1024 * 1024), statistics.median(latencies) * 1e6, latencies[int(len(latencies) * 0.99)] * 1e6
+
+def run_first_byte_latency(samples=200):
+    # time from write() to the waiting reader returning
+    latencies = []
+    for _ in range(samples):
+        audio_file = ByteQueueFile()
+        written_at = []
+        def writer():
+            time.sleep(0.001)
+            written_at.append(time.perf_counter())
+            audio_file.write(b'\0' * 1024)
+            audio_file.close()
+        t = threading.Thread(target=writer)
+        t.start()
+        audio_file.read(1024)
+        latencies.append(time.perf_counter() - written_at[0])
+        t.join()
+    latencies.sort()
+    return statistics.median(latencies) * 1e6, latencies[int(len(latencies) * 0.99)] * 1e6
+
+if __name__ == '__main__':
+    for write_size in WRITE_SIZES:
+        throughput, median, p99 = run(write_size)
+        print(f'write {write_size:>6} B, read {READ_SIZE} B: {throughput:8.1f} MB/s, readinto median {median:7.1f} us, p99 {p99:7.1f} us')
+    median, p99 = run_first_byte_latency()
+    print(f'wake-up latency: median {median:7.1f} us, p99 {p99:7.1f} us')
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# Runs ai-cli end to end against the local stand-ins of standin_servers.py, without network, API keys or
+# a sound card (audio goes to the null sink). Reports time to first token and first audio, the gaps between
+# audio segments, CPU time and peak memory per scenario, taken from --profile and the rusage of the process.
+#
+#   python benchmarks/bench_end_to_end.py                       every scenario and prompt, 3 runs each
+#   python benchmarks/bench_end_to_end.py --load 40 --concurrency 8 --scenario openai+openai-tts
+import argparse
+import concurrent.futures
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIRECTORY)
+from standin_servers import StandinServer, add_arguments, config_from_args, OPENAI_MODELS, VOICES
+
+AI_CLI = os.path.join(BENCHMARK_DIRECTORY, '..', 'ai-cli')
+
+PROMPTS = [
+    'What is the capital of Germany?',
+    'How do I reverse a list in Python?',
+    'Any ideas for the weekend?',
+]
+
+# name: ai-cli arguments, the passthrough/printer scenario measures the CLI without any provider SDK
+SCENARIOS = {
+    'passthrough+printer': [ '-m', 'passthrough', '-t', 'printer', '-c', 'true', '-d', '0' ],
+    'openai+openai-tts': [ '-m', 'gpt-4o-mini', '-t', 'tts-1' ],
+    'anthropic+elevenlabs': [ '-m', 'claude-3-5-sonnet-latest', '-t', 'eleven_multilingual_v2', '-v', 'Brian' ],
+    'openai-wait+openai-tts': [ '-m', 'gpt-4o-mini', '-t', 'tts-1', '-w' ],
+}
+
+def seed_catalog(home):
+    # the model index and voice lists, so no run imports every provider or asks the real APIs for lists
+    folder = os.path.join(home, '.cache', 'ai-cli')
+    os.makedirs(folder, exist_ok=True)
+    files = {
+        'ai.index': [ 'passthrough\tpassthrough', 'gpt-4o\topenai', 'gpt-4o-mini\topenai', 'claude-3-5-sonnet-latest\tanthropic' ],
+        'tts.index': [ 'tts-1\topenai-tts', 'tts-1-hd\topenai-tts', 'eleven_multilingual_v2\televenlabs', 'printer\tprinter' ],
+        'passthrough.models': [ 'passthrough' ],
+        'openai.models': [ m for m in OPENAI_MODELS if 'gpt' in m ],
+        'anthropic.models': [ 'claude-3-5-sonnet-latest' ],
+        'openai-tts.models': [ m for m in OPENAI_MODELS if 'tts' in m ],
+        'elevenlabs.models': [ 'eleven_multilingual_v2' ],
+        'elevenlabs.voices': sorted(name for _, name in VOICES),
+        'printer.models': [ 'printer' ],
+    }
+    for name, items in files.items():
+        with open(os.path.join(folder, name), 'w') as f:
+            f.write('\n'.join(items))
+
+def run_measured(server, home, arguments, prompt, index):
+    # waits with wait4 to get the rusage of this child only, the load mode runs many at the same time
+    profile_path = os.path.join(home, f'profile-{index}.json')
+    environment = dict(os.environ, HOME=home, **server.environment())
+    command = [ sys.executable, AI_CLI, '--no-daemon', '--no-session', '--no-model-switch', '-o', 'audio+text',
+                '--output-audio-sink', 'null', '--profile', profile_path ] + arguments + [ prompt ]
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, env=environment, stdin=subprocess.DEVNULL, stdout=stdout, stderr=stderr)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stdout.seek(0)
+        stderr.seek(0)
+        output = stdout.read().decode(errors='replace')
+        if process.returncode != 0:
+            raise RuntimeError(f'ai-cli failed with {process.returncode}: {stderr.read().decode(errors="replace").strip()}')
+    try:
+        with open(profile_path) as f:
+            summary = json.load(f).get('otherData', {})
+    except (OSError, ValueError):
+        summary = {}
+    # ru_maxrss is in KB on Linux
+    return dict(summary, wall_ms=round(wall * 1000, 1), cpu_ms=round((usage.ru_utime + usage.ru_stime) * 1000, 1),
+                rss_mb=round(usage.ru_maxrss / 1024, 1), output=output)
+
+def median(results, key):
+    values = [ r[key] for r in results if r.get(key) is not None ]
+    return statistics.median(values) if values else None
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else None
+
+def format_ms(value):
+    return f'{value:8.1f}' if value is not None else '       -'
+
+def print_header():
+    print(f'{"scenario":24} {"prompt":36} {"ttft ms":>8} {"ttfa ms":>8} {"gap ms":>8} {"wall ms":>8} {"cpu ms":>8} {"rss MB":>8} {"seg":>4}')
+
+def print_row(scenario, prompt, results):
+    segments = median(results, 'segments')
+    print(f'{scenario:24} {prompt[:36]:36} {format_ms(median(results, "ttft_ms"))} {format_ms(median(results, "ttfa_ms"))} '
+          f'{format_ms(median(results, "gap_ms"))} {format_ms(median(results, "wall_ms"))} {format_ms(median(results, "cpu_ms"))} '
+          f'{format_ms(median(results, "rss_mb"))} {int(segments) if segments is not None else "-":>4}')
+
+def check_deterministic(scenario, prompt, results):
+    # the stand-ins answer the same prompt the same way, so every run has to print the same
+    outputs = set(r['output'] for r in results)
+    assert len(outputs) == 1, f'{scenario}: runs of "{prompt}" printed different output'
+
+def benchmark(server, home, scenarios, runs):
+    print_header()
+    index = 0
+    for scenario in scenarios:
+        for prompt in PROMPTS:
+            results = []
+            for i in range(runs):
+                results.append(run_measured(server, home, SCENARIOS[scenario], prompt, index))
+                index += 1
+            check_deterministic(scenario, prompt, results)
+            print_row(scenario, prompt, results)
+
+def load(server, home, scenario, count, concurrency):
+    # many simulated invocations at the same time, each its own process as from a shell
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [ executor.submit(run_measured, server, home, SCENARIOS[scenario], PROMPTS[i % len(PROMPTS)], i) for i in range(count) ]
+        results = []
+        failures = 0
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failures += 1
+                print(e, file=sys.stderr)
+    wall = time.perf_counter() - start
+    print(f'{scenario}: {count} runs, {concurrency} at a time, {failures} failed, {wall:.1f} s, {len(results) / wall:.1f} runs/s')
+    for key in [ 'ttft_ms', 'ttfa_ms', 'gap_ms', 'wall_ms', 'cpu_ms', 'rss_mb' ]:
+        values = [ r[key] for r in results if r.get(key) is not None ]
+        if values:
+            print(f'  {key:8} p50 {format_ms(percentile(values, 0.5))}  p90 {format_ms(percentile(values, 0.9))}  max {format_ms(max(values))}')
+    requests = ', '.join(f'{path} {count}' for path, count in sorted(server.requests.items()))
+    print(f'  stand-in requests: {requests}')
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end latency of ai-cli against local stand-in providers')
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), help='Scenario to run, all if not given')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per scenario and prompt, the median is reported')
+    parser.add_argument('--load', type=int, default=0, metavar='N', help='Run N invocations of the first scenario concurrently instead')
+    parser.add_argument('--concurrency', type=int, default=8, help='Invocations at the same time in load mode')
+    add_arguments(parser)
+    args = parser.parse_args()
+    scenarios = args.scenario or list(SCENARIOS)
+
+    server = StandinServer(config_from_args(args)).start()
+    try:
+        with tempfile.TemporaryDirectory() as home:
+            seed_catalog(home)
+            if args.load > 0:
+                sys.exit(1 if load(server, home, scenarios[0], args.load, args.concurrency) else 0)
+            benchmark(server, home, scenarios, args.runs)
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# Cost of language detection per TTS segment: detection on every segment vs. once per response.
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import tts_optimizer
+from tts_optimizer import LanguageDetection, detect_language, optimize_for_tts
+
+SEGMENTS = {
+    'en': [
+        "The 3 largest cities in Germany are Berlin, Hamburg and Munich.",
+        "Berlin has about 3700000 inhabitants and is the capital since 1990.",
+        "In summer the temperature is often around 25 °C.",
+        "See https://example.com for more details.",
+        "Ok.",
+        "1. Start early",
+        "That's all for today, have a nice day!",
+    ],
+    'de': [
+        "Die 3 größten Städte in Deutschland sind Berlin, Hamburg und München.",
+        "Berlin hat etwa 3700000 Einwohner und ist seit 1990 die Hauptstadt.",
+        "Im Sommer liegt die Temperatur oft bei 25 °C.",
+        "Weitere Details unter https://example.com.",
+        "Ok.",
+        "1. Früh anfangen",
+        "Das war's für heute, schönen Tag noch!",
+    ],
+}
+RESPONSES = 20
+
+def per_segment(segments):
+    # previous behavior: detect_langs() and detect() on every segment
+    for text in segments:
+        tts_optimizer.detect_languages_langdetect(text)
+        optimize_for_tts(text)
+
+def per_response(segments):
+    language_detection = LanguageDetection()
+    for text in segments:
+        optimize_for_tts(text, language_detection=language_detection)
+    return language_detection
+
+def run(name, func, segments):
+    func(segments)
+    start = time.perf_counter()
+    for i in range(RESPONSES):
+        func(segments)
+    elapsed = time.perf_counter() - start
+    print(f'{name:>16}: {elapsed * 1000 / (RESPONSES * len(segments)):8.3f} ms per segment')
+
+def main():
+    for lang, segments in SEGMENTS.items():
+        print(f'{lang}, {len(segments)} segments per response')
+        print(f'  per segment languages: {[ detect_language(text) for text in segments ]}')
+        language_detection = per_response(segments)
+        print(f'  per response language: {language_detection.lang}, {language_detection.detections} detection(s)')
+        run('per segment', per_segment, segments)
+        run('per response', per_response, segments)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# Number verbalization: regex tokenizer with memoized num2words vs. the previous character walk,
+# including an equivalence check on a generated corpus of integers, ordinals and years.
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from num2words import num2words
+from tts_optimizer import convert_numbers_to_words_in_line, get_number_words
+
+LANGUAGES = [ 'en', 'de', 'fr', 'es' ]
+CASES = 2000
+WORDS = [ 'the', 'Haus', 'année', 'a', 'and', 'x', 'is' ]
+NUMBERS = [ '1', '3', '12', '42', '100', '999', '1001', '1990', '2024', '2199', '2200', '10000', '1234567', '007', '٣', '3²' ]
+PUNCTUATION = [ '', '.', ',', '!', '?', ':', ')', '(', '-', '.5' ]
+SPACES = [ ' ', ' ', ' ', '  ', '\t', '' ]
+
+# decimals, percentages, currencies and ranges are converted by the new code only
+EXTENSIONS_PATTERN = re.compile(r'\d[.,\-–]\d|[%$€£]')
+
+# the character walk which was used before
+def legacy_convert_numbers_to_words_in_line(text, lang):
+    result = []
+    i = 0
+    while i < len(text):
+        if text[i].isdigit():
+            # Found a digit, let's extract the full number
+            start = i
+            while i < len(text) and text[i].isdigit():
+                i += 1
+
+            before = text[start-1:start] if start > 0 else ''
+            before_text = text[:start]
+            next = text[i] if i < len(text) else ''
+            next_next = text[i+1] if i+1 < len(text) else ''
+            next_is_last = i == len(text) - 1 or text[i+1:].strip() == ''
+
+            is_ordinal = next == '.' and not next_next.isdigit()
+            is_start_ordinal = is_ordinal and (start == 0 or before_text.strip() == '')
+            is_cardinal = (start == 0 or before_text.strip() == '' or before.isspace()) and (next.isspace() or (next_is_last and not next.isalpha()))
+
+            number = text[start:i]
+            ok = True
+
+            try:
+                num = int(number)
+                if is_start_ordinal:
+                    word = num2words(num, to='ordinal', lang=lang)
+                    if lang == 'de':
+                        # German ends with 'ns', e.g. 'erste' -> 'erstens'
+                        word = word + 'ns'
+                elif is_cardinal:
+                    if num > 1000 and num < 2200:
+                        word = num2words(num, to='year', lang=lang)
+                    else:
+                        word = num2words(num, to='cardinal', lang=lang)
+                else:
+                    ok = False
+
+                if ok:
+                    # Add a space before the word if it's not at the start and the previous char isn't a space
+                    if result and not result[-1].isspace():
+                        result.append(' ')
+                    result.append(word)
+            except (ValueError, NotImplementedError):
+                ok = False
+
+            if not ok:
+                # keep the original number
+                result.append(text[start:i])
+        else:
+            # Not a number, just add the character
+            result.append(text[i])
+            i += 1
+
+    return ''.join(result)
+def generate_line(rng):
+    parts = []
+    if rng.random() < 0.3:
+        parts.append(rng.choice(SPACES))
+    for i in range(rng.randint(1, 8)):
+        parts.append(rng.choice(NUMBERS) if rng.random() < 0.5 else rng.choice(WORDS))
+        parts.append(rng.choice(PUNCTUATION) if rng.random() < 0.3 else '')
+        parts.append(rng.choice(SPACES))
+    if rng.random() < 0.5:
+        parts.pop()
+    return ''.join(parts)
+
+EXTENSION_CASES = [
+    ('en', 'It rose 3.5 percent', 'It rose three point five percent'),
+    ('en', 'It rose 25%', 'It rose twenty-five percent'),
+    ('en', 'It costs $5 or $1 now', 'It costs five dollars or one dollar now'),
+    ('en', 'From 1990-2000 it grew 5–10%', 'From nineteen ninety to two thousand it grew five to ten percent'),
+    ('en', 'Released 2023-10-18', 'Released 2023-10-18'),
+    ('en', 'Version 1.2.3 is out', 'Version 1.2.3 is out'),
+    ('de', 'Es kostet 3,5 € und 25 %', 'Es kostet drei Komma fünf Euro und fünfundzwanzig Prozent'),
+    ('de', 'Von 1990-2000 waren es 5 £', 'Von neunzehnhundertneunzig bis zweitausend waren es fünf Pfund'),
+    ('fr', 'Il coûte 5 €', 'Il coûte cinq €'),
+]
+
+def check_equivalence():
+    rng = random.Random(42)
+    checked = 0
+    for lang in LANGUAGES:
+        for i in range(CASES):
+            line = generate_line(rng)
+            if EXTENSIONS_PATTERN.search(line):
+                continue
+            expected = legacy_convert_numbers_to_words_in_line(line, lang)
+            actual = convert_numbers_to_words_in_line(line, lang)
+            assert actual == expected, f'{lang}: {line!r} -> {actual!r}, expected {expected!r}'
+            checked += 1
+    for lang, line, expected in EXTENSION_CASES:
+        actual = convert_numbers_to_words_in_line(line, lang)
+        assert actual == expected, f'{lang}: {line!r} -> {actual!r}, expected {expected!r}'
+    print(f'generated corpus: {checked} cases equivalent, {len(EXTENSION_CASES)} extension cases ok')
+
+def run(name, func, lines, lang):
+    get_number_words.cache_clear()
+    start = time.perf_counter()
+    for line in lines:
+        func(line, lang)
+    elapsed = time.perf_counter() - start
+    print(f'{name:>16}: {elapsed * 1000:8.2f} ms')
+
+def main():
+    check_equivalence()
+    rng = random.Random(1)
+    answer = [ generate_line(rng) for i in range(500) ]
+    long_line = ' '.join(str(rng.choice([ 1, 2, 3, 1990, 2024, 100 ])) + ' items' for i in range(2000))
+    for lang in LANGUAGES:
+        print(f'{lang}, 500 lines')
+        run('character walk', legacy_convert_numbers_to_words_in_line, answer, lang)
+        run('regex + memo', convert_numbers_to_words_in_line, answer, lang)
+        print(f'{lang}, one line with 2000 numbers')
+        run('character walk', legacy_convert_numbers_to_words_in_line, [ long_line ], lang)
+        run('regex + memo', convert_numbers_to_words_in_line, [ long_line ], lang)
+
+if __name__ == '__main__':
+    main()
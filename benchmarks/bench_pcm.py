@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# Streams answers to the null sink once as MP3, which the playback engine decodes, and once as raw PCM, which
+# goes to the device as it comes (--output-audio-format mp3 versus auto). Reports time to first audio and CPU
+# time of both paths and checks that they play the same amount of audio in the same number of segments.
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIRECTORY)
+from standin_servers import StandinServer, add_arguments, config_from_args
+from bench_end_to_end import PROMPTS, SCENARIOS, seed_catalog, run_measured, format_ms
+
+FORMATS = [ 'mp3', 'auto' ]
+
+def played_seconds(home, index):
+    with open(os.path.join(home, f'profile-{index}.json')) as f:
+        events = json.load(f)['traceEvents']
+    return sum(e['dur'] for e in events if e.get('cat') == 'playback' and e['name'].startswith('play ')) / 1000000
+
+def main():
+    parser = argparse.ArgumentParser(description='Time to first audio and CPU time of decoded MP3 versus raw PCM playback')
+    parser.add_argument('--scenario', action='append', choices=[ 'openai+openai-tts', 'anthropic+elevenlabs' ], help='Scenario to run, both if not given')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per scenario, format and prompt, the median is reported')
+    add_arguments(parser)
+    args = parser.parse_args()
+    scenarios = args.scenario or [ 'openai+openai-tts', 'anthropic+elevenlabs' ]
+
+    server = StandinServer(config_from_args(args)).start()
+    try:
+        with tempfile.TemporaryDirectory() as home:
+            seed_catalog(home)
+            print(f'{"scenario":24} {"prompt":28} {"format":6} {"ttfa ms":>8} {"cpu ms":>8} {"wall ms":>8} {"played s":>8} {"bytes":>8} {"seg":>4}')
+            index = 0
+            for scenario in scenarios:
+                for prompt in PROMPTS:
+                    medians = {}
+                    for audio_format in FORMATS:
+                        results = []
+                        for i in range(args.runs):
+                            arguments = SCENARIOS[scenario] + [ '--output-audio-format', audio_format, '--tts-cache-max-mb', '0' ]
+                            result = run_measured(server, home, arguments, prompt, index)
+                            result['played'] = played_seconds(home, index)
+                            result['total_bytes'] = sum(result.get('bytes', {}).values())
+                            results.append(result)
+                            index += 1
+                        medians[audio_format] = { key: statistics.median(r[key] for r in results if r.get(key) is not None)
+                                                  for key in [ 'ttfa_ms', 'cpu_ms', 'wall_ms', 'played', 'total_bytes', 'segments' ] }
+                        m = medians[audio_format]
+                        print(f'{scenario:24} {prompt[:28]:28} {audio_format:6} {format_ms(m["ttfa_ms"])} {format_ms(m["cpu_ms"])} {format_ms(m["wall_ms"])} '
+                              f'{m["played"]:8.2f} {int(m["total_bytes"]):8} {int(m["segments"]):4}')
+
+                    mp3, pcm = medians['mp3'], medians['auto']
+                    assert mp3['segments'] == pcm['segments'], f'{scenario}: {mp3["segments"]} MP3 segments, {pcm["segments"]} PCM segments'
+                    # MP3 is rounded to whole frames, playback is timed in device periods
+                    tolerance = 0.05 * mp3['played'] + 0.05 * mp3['segments']
+                    assert abs(mp3['played'] - pcm['played']) <= tolerance, f'{scenario}: played {mp3["played"]:.2f} s as MP3, {pcm["played"]:.2f} s as PCM'
+                    # 16 bit at 24 kHz is 48 KB/s against 16 KB/s of MP3, fewer means PCM wasn't negotiated
+                    assert pcm['total_bytes'] > 2 * mp3['total_bytes'], f'{scenario}: PCM was not used'
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
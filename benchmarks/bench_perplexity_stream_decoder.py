@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# Decoding a recorded Perplexity stream: the previous per-event decoding vs. PerplexityStreamDecoder.
+# Every event repeats the full chunk list, the completed copilot steps (JSON encoded) and all sources,
+# like the payloads of the Perplexity API.
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from perplexity_stream_decoder import PerplexityStreamDecoder
+
+CHUNK_COUNTS = [ 250, 500, 1000, 2000 ]
+CHUNKS_PER_SOURCE = 20
+CHUNKS_PER_STEP = 100
+
+mode_pro = 'copilot'
+
+# the decoding which was used before, see convert_chunk_to_text() of PerplexityAiProvider
+def legacy_extract_text_from_chunk(chunk, text_chunks):
+    text = ''
+    ok = False
+    if isinstance(chunk, dict) and 'chunks' in chunk:
+        ok = True
+        chunks = chunk.get('chunks', [])
+        if len(chunks) > 0:
+            new_count = len(chunks) - len(text_chunks)
+            # make sure we only add new chunks
+            if new_count > 0:
+                new_chunks = chunks[-new_count:]
+                text_chunks.extend(new_chunks)
+                text = ''.join(new_chunks)
+    return ok, text
+
+def legacy_extract_copilot_answer(step):
+    if 'content' in step:
+        content = step.get('content', {})
+        if 'answer' in content:
+            answer = content.get('answer', {})
+            if isinstance(answer, str):
+                answer = json.loads(answer)
+            return answer
+        else:
+            return content
+
+    return None
+
+def legacy_convert_chunk_to_text(chunk, text_chunks, sources):
+    text = ''
+
+    parts = [ chunk ]
+    if 'copilot_answer' in chunk:
+        # unpack copilot steps
+        copilot_answer = chunk.get('copilot_answer', [])
+        if len(copilot_answer) > 0:
+            for step in copilot_answer:
+                extracted_part = legacy_extract_copilot_answer(step)
+                if extracted_part:
+                    parts.append(extracted_part)
+
+    for part in parts:
+        current_part = part
+        thread_url_slug = current_part.get('thread_url_slug', '')
+        thread_title = current_part.get('thread_title', '').strip()
+        ok, text = legacy_extract_text_from_chunk(current_part, text_chunks)
+        if not ok and 'text' in current_part:
+            # for the last part, the remaining chunks and web_results seem to be in 'text'
+            text_value = current_part.get('text', {})
+            if isinstance(text_value, str):
+                try:
+                    text_value = json.loads(text_value)
+                except:
+                    pass
+            if not text_value is None:
+                if isinstance(text_value, dict):
+                    current_part = text_value
+                    ok, text = legacy_extract_text_from_chunk(current_part, text_chunks)
+                elif isinstance(text_value, list):
+                    # looks like copilot steps
+                    last_step = text_value[-1]
+                    current_part = legacy_extract_copilot_answer(last_step)
+                    ok, text = legacy_extract_text_from_chunk(current_part, text_chunks)
+
+                if not thread_url_slug:
+                    thread_url_slug = current_part.get('thread_url_slug', '')
+                if not thread_title:
+                    thread_title = current_part.get('thread_title', '').strip()
+
+        if sources is not None:
+            if thread_url_slug:
+                mode = current_part.get('mode', '')
+                model_title = 'Perplexity'
+                if mode == mode_pro:
+                    model_title = 'Perplexity Pro'
+
+                url = f'https://perplexity.ai/search/{thread_url_slug}'
+                if not url in sources:
+                    if len(thread_title) > 0:
+                        thread_title = f'{model_title}: {thread_title}:'
+                    else:
+                        thread_title = f'{model_title}:'
+                    sources[url] = thread_title
+
+            web_results = current_part.get('web_results', [])
+            web_results.extend(current_part.get('extra_web_results', []))
+            if len(web_results) > 0:
+                for w in web_results:
+                    url = w.get('url', '')
+                    if not url in sources:
+                        name = w.get('name', '').strip()
+                        if len(name) > 0:
+                            title = f'[{len(sources) + 1}] {name}:'
+                        else:
+                            title = f'[{len(sources) + 1}]'
+                        sources[url] = title
+    return text
+
+def web_result(i):
+    return { 'url': f'https://example.com/source/{i}', 'name': f'Source {i}', 'snippet': 'Lorem ipsum dolor sit amet. ' * 10 }
+
+def record_stream(chunk_count, copilot):
+    tokens = [ f'word{i} ' for i in range(chunk_count) ]
+    events = []
+    for i in range(1, chunk_count + 1):
+        event = {
+            'status': 'pending',
+            'uuid': '00000000-0000-0000-0000-000000000000',
+            'mode': 'copilot' if copilot else 'concise',
+            'thread_url_slug': 'recorded-stream',
+            'thread_title': 'Recorded stream',
+            'chunks': tokens[:i],
+        }
+        web_results = [ web_result(j) for j in range(i // CHUNKS_PER_SOURCE + 1) ]
+        if copilot:
+            # completed research steps are repeated with every event
+            event['copilot_answer'] = [
+                { 'step_type': 'SEARCH_RESULTS', 'content': { 'answer': json.dumps({ 'web_results': web_results[:k + 1] }) } }
+                for k in range(i // CHUNKS_PER_STEP + 1)
+            ]
+        else:
+            event['web_results'] = web_results
+        events.append(event)
+    final = { 'status': 'completed', 'mode': events[-1]['mode'], 'text': json.dumps({ 'chunks': tokens, 'web_results': [ web_result(j) for j in range(chunk_count // CHUNKS_PER_SOURCE + 1) ] }) }
+    events.append(final)
+    # every event is a separate object, like after reading it from the network
+    return [ json.dumps(event) for event in events ], ''.join(tokens)
+
+def decode_legacy(events):
+    text_chunks = []
+    sources = {}
+    text = ''
+    for event in events:
+        text += legacy_convert_chunk_to_text(event, text_chunks, sources)
+    return text, sources
+
+def decode(events):
+    decoder = PerplexityStreamDecoder()
+    sources = {}
+    text = ''
+    for event in events:
+        text += decoder.decode(event, sources)
+    return text, sources
+
+def run(func, recorded):
+    events = [ json.loads(event) for event in recorded ]
+    start = time.perf_counter()
+    result = func(events)
+    return result, time.perf_counter() - start
+
+def main():
+    for copilot in [ False, True ]:
+        print('copilot' if copilot else 'concise')
+        for chunk_count in CHUNK_COUNTS:
+            recorded, answer = record_stream(chunk_count, copilot)
+            (legacy_text, legacy_sources), legacy_time = run(decode_legacy, recorded)
+            (text, sources), decoder_time = run(decode, recorded)
+            assert text == answer, f'{chunk_count} chunks: decoded text differs'
+            assert list(sources.items()) == list(legacy_sources.items()), f'{chunk_count} chunks: decoded sources differ'
+            # the previous decoding only returned the text of the last part, which lost the text of copilot answers
+            lost = len(answer) - len(legacy_text)
+            print(f'  {chunk_count:5} chunks: previous {legacy_time * 1000:8.2f} ms ({legacy_time * 1e6 / len(recorded):6.1f} us/event{f", lost {lost} chars" if lost else ""}), '
+                  f'decoder {decoder_time * 1000:7.2f} ms ({decoder_time * 1e6 / len(recorded):5.1f} us/event)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# Converts a long article to audio against the OpenAI speech stand-in of standin_servers.py, once the previous way
+# (--wait with an audio command, one request per sentence after another) and once with --output-audio-file, which
+# packs the text into chunks of the provider's max_length and synthesizes them in parallel. Checks that the
+# rendered file has the length of the whole text.
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIRECTORY)
+from standin_servers import StandinServer, StandinConfig, MP3_FRAME, MP3_FRAME_SECONDS, ANSWERS
+from bench_end_to_end import AI_CLI, seed_catalog
+
+def write_article(file_path, paragraphs):
+    with open(file_path, 'w') as f:
+        for i in range(paragraphs):
+            f.write(ANSWERS[i % len(ANSWERS)] + '\n\n')
+
+def run(server, home, cwd, arguments):
+    environment = dict(os.environ, HOME=home, **server.environment())
+    command = [ sys.executable, AI_CLI, '--no-daemon', '--no-session', '--no-tts-optimization', '--tts-cache-max-mb', '0',
+                '-m', 'passthrough', '-t', 'tts-1', '-f', 'article.txt' ] + arguments
+    start = time.perf_counter()
+    subprocess.run(command, env=environment, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Serial TTS versus --output-audio-file for a long text')
+    parser.add_argument('--paragraphs', type=int, default=60)
+    args = parser.parse_args()
+
+    config = StandinConfig(latency_ms=0, jitter_ms=0, audio_latency_ms=300, audio_realtime_factor=8.0)
+    server = StandinServer(config).start()
+    try:
+        with tempfile.TemporaryDirectory() as home:
+            seed_catalog(home)
+            article_path = os.path.join(home, 'article.txt')
+            write_article(article_path, args.paragraphs)
+            with open(article_path) as f:
+                text = f.read().strip()
+            # paragraph breaks are kept within a chunk and become a space between chunks
+            characters = len(' '.join(text.split()))
+
+            serial = run(server, home, home, [ '-o', 'audio', '-w', '-c', 'true', '-d', '0' ])
+            serial_requests = server.requests.get('/openai/v1/audio/speech', 0)
+            server.requests.clear()
+            rendered = run(server, home, home, [ '-o', 'audio', '--output-audio-file', 'article.mp3' ])
+            render_requests = server.requests.get('/openai/v1/audio/speech', 0)
+
+            # every request rounds its audio to whole frames
+            frames = os.path.getsize(os.path.join(home, 'article.mp3')) / len(MP3_FRAME)
+            least = characters / config.chars_per_second / MP3_FRAME_SECONDS - render_requests
+            most = len(text) / config.chars_per_second / MP3_FRAME_SECONDS + render_requests
+            assert frames == int(frames), 'rendered file is not made of whole frames'
+            assert least <= frames <= most, f'rendered {frames} frames, expected {least:.0f} to {most:.0f}'
+            assert not os.path.exists(os.path.join(home, 'article.mp3.parts')), 'parts were not removed'
+
+            print(f'{characters} characters')
+            print(f'  serial:   {serial_requests:4} requests, {serial:6.1f} s')
+            print(f'  rendered: {render_requests:4} requests, {rendered:6.1f} s')
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# Checks SentenceSegmenter/extract_sentence against the original extract_sentence on a generated
+# golden corpus and compares the cost of segmenting multi-kilobyte streams.
+import contextlib
+import io
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sentence_segmenter import SentenceSegmenter, extract_sentence, split_sentences, find_segment_end
+
+MIN_SENTENCE_LENGTH = 50
+MAX_SENTENCE_LENGTH = 1000
+
+# original implementation, kept as reference
+def legacy_extract_sentence(text, min_len=MIN_SENTENCE_LENGTH, max_len=MAX_SENTENCE_LENGTH):
+    text_len = len(text)
+
+    match = re.search(rf'^.{{{min_len},{max_len}}}[^0-9](?:[.!?]{{1,3}})(?:\s|$)', text, re.DOTALL)
+    if not match:
+        match = re.search(rf'^.{{{min_len},{max_len}}}[^0-9](?:[-—,;:])(?:\s|$)', text, re.DOTALL)
+
+    if text_len <= max_len:
+        segment_end = text_len
+    else:
+        if not match:
+            match = re.search(rf'^.{{{min_len},{max_len}}}\n', text, re.DOTALL)
+        if not match:
+            match = re.search(rf'^.{{{min_len},{max_len}}}\s', text, re.DOTALL)
+
+        if match:
+            segment_end = match.end()
+        else:
+            print(f'WARNING: Unable to extract sentence, will split text at {max_len} characters', file=sys.stderr, flush=True)
+            segment_end = max_len
+
+    segment = text[:segment_end].strip()
+    remainder = text[segment_end:].strip()
+    return segment, remainder
+
+WORDS = [ 'the', 'model', 'answers', 'quickly', 'über', 'Straße', '2024', '3.5', 'Dr.', 'e.g.', 'ok', 'voice', 'stream', 'a' ]
+PUNCTUATION = [ '.', '!', '?', '...', '?!', ',', ';', ':', ' -', ' —', '\n', '.\n', '', '', '', '', '', '' ]
+
+def generate_text(rng, length, punctuation=True):
+    parts = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        if punctuation:
+            word += rng.choice(PUNCTUATION)
+        else:
+            word = word.replace('.', '')
+        parts.append(word)
+        size += len(word) + 1
+    return ' '.join(parts)
+
+def corpus(seed=42, count=400):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield generate_text(rng, rng.choice([ 30, 120, 600, 1200, 2500, 5000 ]), punctuation=(i % 7 != 0))
+
+def chunks(rng, text):
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 12)
+        yield text[position:position + size]
+        position += size
+
+def check_equivalence():
+    rng = random.Random(7)
+    cases = 0
+    for text in corpus():
+        for min_len, max_len in [ (MIN_SENTENCE_LENGTH, MAX_SENTENCE_LENGTH), (MIN_SENTENCE_LENGTH, MAX_SENTENCE_LENGTH // 2), (10, 80) ]:
+            assert extract_sentence(text, min_len, max_len) == legacy_extract_sentence(text, min_len, max_len), text
+
+            expected = []
+            remainder = text
+            while len(remainder) > 0:
+                sentence, remainder = legacy_extract_sentence(remainder, min_len, max_len)
+                expected.append(sentence)
+            assert split_sentences(text, min_len, max_len) == expected, text
+
+            # streamed in random deltas, the segmenter emits the same segments as when fed at once
+            whole = SentenceSegmenter(min_len, max_len)
+            expected = whole.feed(text) + [ whole.flush() ]
+            streamed = SentenceSegmenter(min_len, max_len)
+            segments = []
+            for delta in chunks(rng, text):
+                segments.extend(streamed.feed(delta))
+            segments.append(streamed.flush())
+            assert segments == expected, text
+            assert re.sub(r'\s+', '', ''.join(segments)) == re.sub(r'\s+', '', text)
+            cases += 1
+    return cases
+
+def rescan_per_chunk(deltas, min_len, max_len):
+    # searching the accumulated buffer after every delta, like the streaming loop did
+    buffer = ''
+    segments = []
+    for delta in deltas:
+        buffer += delta
+        if len(buffer) > max_len or re.search(rf'^.{{{min_len},{max_len}}}[^0-9](?:[.!?]{{1,3}})\s', buffer, re.DOTALL):
+            end = find_segment_end(buffer, min_len, max_len) if len(buffer) > max_len else re.search(rf'^.{{{min_len},{max_len}}}[^0-9](?:[.!?]{{1,3}})\s', buffer, re.DOTALL).end()
+            segments.append(buffer[:end].strip())
+            buffer = buffer[end:].lstrip()
+    return segments
+
+def segmenter(deltas, min_len, max_len):
+    segmenter = SentenceSegmenter(min_len, max_len)
+    segments = []
+    for delta in deltas:
+        segments.extend(segmenter.feed(delta))
+    return segments
+
+def benchmark():
+    rng = random.Random(1)
+    streams = {
+        'prose 8 KB': generate_text(rng, 8 * 1024),
+        'no punctuation 8 KB': generate_text(rng, 8 * 1024, punctuation=False),
+        'no punctuation 32 KB': generate_text(rng, 32 * 1024, punctuation=False),
+    }
+    for name, text in streams.items():
+        deltas = list(chunks(rng, text))
+        for label, func in [ ('rescan per chunk', rescan_per_chunk), ('SentenceSegmenter', segmenter) ]:
+            start = time.perf_counter()
+            for _ in range(5):
+                func(deltas, MIN_SENTENCE_LENGTH, MAX_SENTENCE_LENGTH)
+            elapsed = (time.perf_counter() - start) / 5
+            print(f'{name:>22}, {len(deltas):>5} deltas, {label:>18}: {elapsed * 1000:8.2f} ms')
+
+if __name__ == '__main__':
+    with contextlib.redirect_stderr(io.StringIO()):
+        cases = check_equivalence()
+    print(f'golden corpus: {cases} cases equivalent')
+    with contextlib.redirect_stderr(io.StringIO()):
+        benchmark()
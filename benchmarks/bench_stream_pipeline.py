@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# Streams a simulated LLM answer through the synchronous loop and through StreamPipeline with a slow
+# normalizer, console and TTS. Checks that both write and speak the same text and compares how long the
+# LLM stream is held up (time until its last chunk was read) and the total time.
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sentence_segmenter import SentenceSegmenter, split_sentences
+from stream_pipeline import StreamPipeline
+
+CHUNK_INTERVAL = 0.002
+NORMALIZE_SECONDS = 0.010
+WRITE_SECONDS = 0.001
+SYNTHESIZE_SECONDS = 0.050
+FIRST_MAX_LEN = 500
+
+SENTENCES = [
+    "The 3 largest cities in Germany are Berlin, Hamburg and Munich.",
+    "Berlin has about 3700000 inhabitants and is the capital since 1990!",
+    "In summer the temperature is often around 25 °C, which is quite pleasant.",
+    "See https://example.com for more details, or ask again later.",
+    "That's all for today, have a nice day and see you soon?",
+]
+
+def generate_chunks(rng, count):
+    text = ' '.join(rng.choice(SENTENCES) for i in range(count)) + ' And a remainder without an end'
+    chunks = []
+    i = 0
+    while i < len(text):
+        n = rng.randint(2, 12)
+        chunks.append(text[i:i + n])
+        i += n
+    return chunks
+
+def read_chunks(chunks, read_times):
+    for chunk in chunks:
+        time.sleep(CHUNK_INTERVAL)
+        yield chunk
+    read_times.append(time.perf_counter())
+
+def normalize(text, last):
+    time.sleep(NORMALIZE_SECONDS)
+    if last:
+        text = text.strip()
+    if not text:
+        return []
+    return split_sentences(text) if last else [ text ]
+
+def synchronous(chunks):
+    # the previous loop: everything happens between two chunks, synthesis is handed off to threads
+    from concurrent.futures import ThreadPoolExecutor
+    written = []
+    spoken = []
+    read_times = []
+    segmenter = SentenceSegmenter(first_max_len=FIRST_MAX_LEN)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = []
+        def synthesize(text):
+            time.sleep(SYNTHESIZE_SECONDS)
+            return text
+        for chunk in read_chunks(chunks, read_times):
+            time.sleep(WRITE_SECONDS)
+            written.append(chunk)
+            for sentence in segmenter.feed(chunk):
+                for text in normalize(sentence, False):
+                    futures.append(executor.submit(synthesize, text))
+        for text in normalize(segmenter.flush(), True):
+            futures.append(executor.submit(synthesize, text))
+        spoken = [ future.result() for future in futures ]
+    return ''.join(written), spoken, read_times[0] - start, time.perf_counter() - start
+
+def pipelined(chunks):
+    written = []
+    spoken = []
+    read_times = []
+
+    async def stream():
+        iterator = read_chunks(chunks, read_times)
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, None)
+            if chunk is None:
+                break
+            yield chunk
+
+    def write(text):
+        time.sleep(WRITE_SECONDS)
+        written.append(text)
+
+    async def synthesize(text, target):
+        await asyncio.sleep(SYNTHESIZE_SECONDS)
+        target.append(text)
+
+    def play(target, on_done):
+        spoken.extend(target)
+        on_done()
+
+    pipeline = StreamPipeline(stream(), write, SentenceSegmenter(first_max_len=FIRST_MAX_LEN), normalize, synthesize, lambda: [], play,
+                              max_workers=2, lookahead=3, wait_for_synthesis=True)
+    start = time.perf_counter()
+    asyncio.run(pipeline.run())
+    return ''.join(written), spoken, read_times[0] - start, time.perf_counter() - start
+
+def main():
+    rng = random.Random(42)
+    for count in [ 10, 40 ]:
+        chunks = generate_chunks(rng, count)
+        text, spoken, read, total = synchronous(chunks)
+        pipeline_text, pipeline_spoken, pipeline_read, pipeline_total = pipelined(chunks)
+        assert pipeline_text == text, 'written text differs'
+        assert pipeline_spoken == spoken, 'spoken segments differ'
+        print(f'{count} sentences, {len(chunks)} chunks, {len(spoken)} segments')
+        print(f'  synchronous: stream read in {read * 1000:7.1f} ms, done in {total * 1000:7.1f} ms')
+        print(f'  pipeline:    stream read in {pipeline_read * 1000:7.1f} ms, done in {pipeline_total * 1000:7.1f} ms')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# Cost of text normalization as the rule table grows: one str.replace pass per rule vs. the combined matcher.
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import tts_optimizer
+from tts_optimizer import normalize_text
+
+RULE_COUNTS = [ 2, 20, 100, 500 ]
+LINES = 500
+WORDS = [ 'the', 'temperature', 'is', 'about', 'and', 'it', 'was', 'measured', 'yesterday', 'in', 'Berlin' ]
+
+def generate_rules(count):
+    rng = random.Random(count)
+    symbols = { '°C': 'degrees Celsius', '°F': 'degrees Fahrenheit' }
+    while len(symbols) < count:
+        symbols['#' + ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for i in range(5))] = 'symbol'
+    return { 'urls': '(see link in the text)', 'symbols': symbols }
+
+def generate_lines(rules):
+    rng = random.Random(0)
+    keys = list(rules['symbols'].keys())
+    lines = []
+    for i in range(LINES):
+        words = [ rng.choice(WORDS) for j in range(15) ]
+        words.insert(rng.randint(0, len(words)), str(rng.randint(0, 40)) + ' ' + rng.choice(keys))
+        if rng.random() < 0.1:
+            words.append('https://example.com/page')
+        lines.append(' '.join(words))
+    return lines
+
+def chained_replace(text, rules):
+    # the previous approach, one pass over the line per rule
+    for key, value in rules['symbols'].items():
+        text = text.replace(key, value)
+    return tts_optimizer.re.sub(tts_optimizer.URL_PATTERN, rules['urls'], text)
+
+def main():
+    tts_optimizer.RULES_FOLDER = tempfile.mkdtemp()
+    for count in RULE_COUNTS:
+        rules = generate_rules(count)
+        with open(os.path.join(tts_optimizer.RULES_FOLDER, 'xx.json'), 'w', encoding='utf-8') as f:
+            json.dump(rules, f)
+        tts_optimizer.get_rules.cache_clear()
+        tts_optimizer.get_rules_pattern.cache_clear()
+        lines = generate_lines(rules)
+        for line in lines:
+            assert normalize_text(line, 'xx') == chained_replace(line, rules), line
+
+        start = time.perf_counter()
+        for line in lines:
+            chained_replace(line, rules)
+        chained = time.perf_counter() - start
+        start = time.perf_counter()
+        for line in lines:
+            normalize_text(line, 'xx')
+        combined = time.perf_counter() - start
+        print(f'{count:4} rules: chained str.replace {chained * 1000:7.2f} ms, combined matcher {combined * 1000:7.2f} ms ({LINES} lines)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# Local stand-ins for the OpenAI chat/speech, Anthropic messages and ElevenLabs APIs, used by
+# bench_end_to_end.py. Answers are deterministic token streams picked by the prompt, audio is silent
+# MP3 frames or raw PCM if it is asked for (response_format pcm, output_format pcm_*), pacing is set by StandinConfig (latency, jitter and throughput).
+#
+#   OPENAI_BASE_URL     http://127.0.0.1:PORT/openai/v1
+#   ANTHROPIC_BASE_URL  http://127.0.0.1:PORT/anthropic
+#   ELEVENLABS_BASE_URL http://127.0.0.1:PORT/elevenlabs
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+ANSWERS = [
+    "Berlin is the capital of Germany and, with about 3.7 million inhabitants, its largest city. "
+    "It is known for its history, its museums and a lively cultural scene. "
+    "Hamburg and Munich follow with 1.9 and 1.5 million inhabitants. "
+    "The best time to visit is between May and September, when it is usually around 20 °C.",
+    "To reverse a list in Python, use list.reverse() to change it in place or reversed() to get an iterator. "
+    "Slicing with [::-1] returns a reversed copy. "
+    "For large lists, reverse() is the fastest option because it doesn't allocate a new list. "
+    "All three work in O(n) time.",
+    "Sure! Here are three ideas for a weekend trip: a hike in the mountains, a visit to a nearby city, or a day at the lake. "
+    "If it rains, a museum or a thermal bath are good alternatives. "
+    "Whatever you choose, start early to avoid the crowds and enjoy the quiet morning hours.",
+]
+
+VOICES = [ ('standin-brian', 'Brian'), ('standin-sarah', 'Sarah') ]
+OPENAI_MODELS = [ 'gpt-4o', 'gpt-4o-mini', 'tts-1', 'tts-1-hd', 'whisper-1' ]
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, mono, all-zero side info decodes to 1152 samples of silence
+MP3_FRAME = b'\xff\xfb\x90\xc0' + bytes(413)
+MP3_FRAME_SECONDS = 1152 / 44100
+
+class StandinConfig:
+    def __init__(self, latency_ms=300, jitter_ms=20, tokens_per_second=60, audio_latency_ms=250, audio_realtime_factor=4.0, chars_per_second=60, seed=0, broken_audio=None):
+        # time to the first token/byte, random jitter per token/chunk, LLM tokens per second
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tokens_per_second = tokens_per_second
+        # audio: time to the first byte, how much faster than real time it is generated, speaking rate,
+        # which is about four times real speech so a run doesn't take as long as listening to it
+        self.audio_latency_ms = audio_latency_ms
+        self.audio_realtime_factor = audio_realtime_factor
+        self.chars_per_second = chars_per_second
+        self.seed = seed
+        # the audio of a text containing this breaks off halfway, for tests of failed synthesis
+        self.broken_audio = broken_audio
+
+def add_arguments(parser):
+    defaults = StandinConfig()
+    parser.add_argument('--latency-ms', type=int, default=defaults.latency_ms, help='Time to the first token')
+    parser.add_argument('--jitter-ms', type=int, default=defaults.jitter_ms, help='Random delay added per token or audio chunk')
+    parser.add_argument('--tokens-per-second', type=float, default=defaults.tokens_per_second)
+    parser.add_argument('--audio-latency-ms', type=int, default=defaults.audio_latency_ms, help='Time to the first audio byte')
+    parser.add_argument('--audio-realtime-factor', type=float, default=defaults.audio_realtime_factor, help='How much faster than real time audio is generated')
+    parser.add_argument('--chars-per-second', type=float, default=defaults.chars_per_second, help='Speaking rate, sets the length of the audio')
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+
+def config_from_args(args):
+    return StandinConfig(args.latency_ms, args.jitter_ms, args.tokens_per_second, args.audio_latency_ms, args.audio_realtime_factor, args.chars_per_second, args.seed)
+
+def pick_answer(prompt):
+    digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+    return ANSWERS[digest[0] % len(ANSWERS)]
+
+def tokenize(text):
+    # words with their trailing whitespace, roughly what LLM APIs stream
+    return re.findall(r'\S+\s*', text)
+
+def mp3_silence(seconds):
+    return MP3_FRAME * max(1, round(seconds / MP3_FRAME_SECONDS))
+
+def pcm_silence(seconds, sample_rate):
+    # signed 16 bit mono
+    return bytes(2 * max(1, round(seconds * sample_rate)))
+
+class Pacer:
+    def __init__(self, config, prompt):
+        self.config = config
+        # the same prompt is always paced the same way
+        self.random = random.Random(f'{config.seed}:{prompt}')
+
+    def sleep(self, milliseconds):
+        jitter = self.random.uniform(0, self.config.jitter_ms) if self.config.jitter_ms > 0 else 0
+        time.sleep(max(0.0, milliseconds + jitter) / 1000)
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length > 0 else b''
+        try:
+            return json.loads(body) if body else {}
+        except ValueError:
+            return {}
+
+    def send_json(self, value, status=200):
+        data = json.dumps(value).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def write_chunk(self, data):
+        if data:
+            self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+            self.wfile.flush()
+
+    def end_chunked(self):
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+    def do_HEAD(self):
+        # connection prewarming
+        self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        self.server.count(path)
+        if path == '/openai/v1/models':
+            self.send_json({ 'object': 'list', 'data': [ { 'id': m, 'object': 'model', 'created': 1700000000 - i, 'owned_by': 'standin' } for i, m in enumerate(OPENAI_MODELS) ] })
+        elif path == '/elevenlabs/v1/voices':
+            self.send_json({ 'voices': [ { 'voice_id': voice_id, 'name': name, 'category': 'premade' } for voice_id, name in VOICES ] })
+        elif path == '/elevenlabs/v1/models':
+            self.send_json([ { 'model_id': 'eleven_multilingual_v2', 'name': 'Multilingual v2' }, { 'model_id': 'eleven_turbo_v2_5', 'name': 'Turbo v2.5' } ])
+        else:
+            self.send_json({ 'error': { 'message': f'Unknown path {path}' } }, 404)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        path = url.path
+        self.server.count(path)
+        request = self.read_json()
+        self.server.record(path, request)
+        if path == '/openai/v1/chat/completions':
+            self.openai_chat(request)
+        elif path == '/openai/v1/audio/speech':
+            self.audio(request.get('input', ''), 24000 if request.get('response_format') == 'pcm' else None)
+        elif path == '/anthropic/v1/messages':
+            self.anthropic_messages(request)
+        elif re.match(r'^/elevenlabs/v1/text-to-speech/[^/]+(/stream)?$', path):
+            output_format = parse_qs(url.query).get('output_format', [ 'mp3_44100_128' ])[0]
+            self.audio(request.get('text', ''), int(output_format[4:]) if output_format.startswith('pcm_') else None)
+        else:
+            self.send_json({ 'error': { 'message': f'Unknown path {path}' } }, 404)
+
+    def prompt(self, messages):
+        return '\n'.join(str(m.get('content', '')) for m in messages if m.get('role') == 'user')
+
+    def tokens(self, prompt):
+        config = self.server.config
+        pacer = Pacer(config, prompt)
+        pacer.sleep(config.latency_ms)
+        interval = 1000 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+        for i, token in enumerate(tokenize(pick_answer(prompt))):
+            if i > 0:
+                pacer.sleep(interval)
+            yield token
+
+    def openai_chat(self, request):
+        prompt = self.prompt(request.get('messages', []))
+        model = request.get('model', 'gpt-4o')
+        created = 1700000000
+        if not request.get('stream'):
+            text = ''.join(self.tokens(prompt))
+            self.send_json({
+                'id': 'chatcmpl-standin', 'object': 'chat.completion', 'created': created, 'model': model,
+                'choices': [ { 'index': 0, 'message': { 'role': 'assistant', 'content': text }, 'finish_reason': 'stop' } ],
+                'usage': { 'prompt_tokens': len(tokenize(prompt)), 'completion_tokens': len(tokenize(text)), 'total_tokens': len(tokenize(prompt)) + len(tokenize(text)) },
+            })
+            return
+
+        self.start_chunked('text/event-stream')
+        def event(delta, finish_reason=None):
+            chunk = { 'id': 'chatcmpl-standin', 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                      'choices': [ { 'index': 0, 'delta': delta, 'finish_reason': finish_reason } ] }
+            self.write_chunk(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+        first = True
+        for token in self.tokens(prompt):
+            event({ 'role': 'assistant', 'content': token } if first else { 'content': token })
+            first = False
+        event({}, 'stop')
+        self.write_chunk(b'data: [DONE]\n\n')
+        self.end_chunked()
+
+    def anthropic_messages(self, request):
+        prompt = self.prompt(request.get('messages', []))
+        model = request.get('model', 'claude-3-5-sonnet-latest')
+        message = { 'id': 'msg_standin', 'type': 'message', 'role': 'assistant', 'model': model, 'content': [],
+                    'stop_reason': None, 'stop_sequence': None, 'usage': { 'input_tokens': len(tokenize(prompt)), 'output_tokens': 0 } }
+        if not request.get('stream'):
+            text = ''.join(self.tokens(prompt))
+            message['content'] = [ { 'type': 'text', 'text': text } ]
+            message['stop_reason'] = 'end_turn'
+            message['usage']['output_tokens'] = len(tokenize(text))
+            self.send_json(message)
+            return
+
+        self.start_chunked('text/event-stream')
+        def event(name, data):
+            self.write_chunk(f'event: {name}\ndata: {json.dumps(dict(data, type=name))}\n\n'.encode('utf-8'))
+        count = 0
+        for token in self.tokens(prompt):
+            if count == 0:
+                event('message_start', { 'message': message })
+                event('content_block_start', { 'index': 0, 'content_block': { 'type': 'text', 'text': '' } })
+            event('content_block_delta', { 'index': 0, 'delta': { 'type': 'text_delta', 'text': token } })
+            count += 1
+        event('content_block_stop', { 'index': 0 })
+        event('message_delta', { 'delta': { 'stop_reason': 'end_turn', 'stop_sequence': None }, 'usage': { 'output_tokens': count } })
+        event('message_stop', {})
+        self.end_chunked()
+
+    def audio(self, text, pcm_rate=None):
+        # silence as long as the text takes to speak, sent faster than real time in chunks of about 100 ms
+        config = self.server.config
+        pacer = Pacer(config, text)
+        seconds = len(text) / config.chars_per_second
+        if pcm_rate:
+            data = pcm_silence(seconds, pcm_rate)
+            chunk_size = 2 * round(0.1 * pcm_rate)
+            interval = 100 / config.audio_realtime_factor
+            self.start_chunked('audio/pcm')
+        else:
+            data = mp3_silence(seconds)
+            frames_per_chunk = max(1, round(0.1 / MP3_FRAME_SECONDS))
+            chunk_size = frames_per_chunk * len(MP3_FRAME)
+            interval = frames_per_chunk * MP3_FRAME_SECONDS * 1000 / config.audio_realtime_factor
+            self.start_chunked('audio/mpeg')
+        broken = bool(config.broken_audio) and config.broken_audio in text
+        if broken:
+            data = data[:len(data) // 2]
+        pacer.sleep(config.audio_latency_ms)
+        for offset in range(0, len(data), chunk_size):
+            if offset > 0:
+                pacer.sleep(interval)
+            self.write_chunk(data[offset:offset + chunk_size])
+        if broken:
+            # the connection is dropped without the last chunk
+            self.close_connection = True
+            return
+        self.end_chunked()
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config=None, port=0):
+        self.config = config or StandinConfig()
+        self.requests = {}
+        # (path, body) of every POST, for tests which check what the providers send
+        self.bodies = []
+        self.requests_lock = threading.Lock()
+        super().__init__(('127.0.0.1', port), StandinHandler)
+
+    def handle_error(self, request, client_address):
+        # clients hang up on purpose, e.g. when playback was aborted
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def count(self, path):
+        with self.requests_lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def record(self, path, body):
+        with self.requests_lock:
+            self.bodies.append((path, body))
+
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def environment(self):
+        # points the provider SDKs at the stand-ins, the keys are never checked
+        return {
+            'OPENAI_BASE_URL': f'{self.base_url()}/openai/v1',
+            'OPENAI_API_KEY': 'standin',
+            'ANTHROPIC_BASE_URL': f'{self.base_url()}/anthropic',
+            'ANTHROPIC_API_KEY': 'standin',
+            'ELEVENLABS_BASE_URL': f'{self.base_url()}/elevenlabs',
+            'ELEVEN_API_KEY': 'standin',
+            'ELEVENLABS_API_KEY': 'standin',
+        }
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='standin-server', daemon=True).start()
+        return self
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-ins for the OpenAI, Anthropic and ElevenLabs APIs')
+    parser.add_argument('--port', type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = StandinServer(config_from_args(args), args.port)
+    for name, value in server.environment().items():
+        print(f'export {name}={value}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
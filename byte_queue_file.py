@@ -1,56 +1,114 @@
 from miniaudio import StreamableSource
-import queue
-import time
+import threading
 from io import RawIOBase
 
+# enough for a few seconds of MP3, more is held back from fast providers
+DEFAULT_CAPACITY = 256 * 1024
+
 class ByteQueueFile(RawIOBase, StreamableSource):
+    # bounded byte ring buffer between one writer (TTS provider) and one reader (decoder/player)
 
-    def __init__(self):
+    def __init__(self, capacity=DEFAULT_CAPACITY, timeout=None, audio_format=None):
         super().__init__()
-        self._queue = queue.Queue()
+        # TTSProvider.Format the provider was asked for, None for its default
+        self.audio_format = audio_format
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._capacity = capacity
+        self._head = 0
+        self._size = 0
         self._position = 0
+        self._timeout = timeout
         self._done = False
+        self._aborted = False
+        self._error = None
+        self._condition = threading.Condition()
+
+    def _wait_for_data(self):
+        # caller holds the lock, returns False on EOF
+        while self._size == 0 and not self._done:
+            if not self._condition.wait(timeout=self._timeout):
+                raise TimeoutError(f'No audio data received within {self._timeout} seconds')
+        if self._size == 0:
+            if self._error is not None:
+                raise IOError('Audio stream failed') from self._error
+            return False
+        return True
 
-    def read(self, size=-1) -> bytes:
-        if self._done and self._queue.empty():
-            return bytes()
-
-        while self._queue.empty():
-            time.sleep(0.1)
-
-        next = None
-        while next is None:
-            next = self._queue.get(block=True, timeout=0.1)
-            if self._done and next is None:
-                next = bytes()
-                break
-
-        self._position += len(next)
-        return next
-
-    def readinto(self, bytes) -> int | None:
-        next = self.read()
-        if next is None:
-            return None
-
-        if len(bytes) < len(next):
-            raise ValueError("Buffer is too small, expected exactly " + str(len(next)) + " bytes, but got " + str(len(bytes)))
+    def _copy_out(self, target, count):
+        # caller holds the lock, copies count bytes into target without intermediate buffers
+        first = min(count, self._capacity - self._head)
+        target[:first] = self._view[self._head:self._head + first]
+        if count > first:
+            target[first:count] = self._view[:count - first]
+        self._head = (self._head + count) % self._capacity
+        self._size -= count
+        self._position += count
+        self._condition.notify_all()
 
-        bytes[:len(next)] = next
-        return len(next)
+    def read(self, size=-1) -> bytes:
+        with self._condition:
+            if not self._wait_for_data():
+                return bytes()
+            count = self._size if size is None or size < 0 else min(size, self._size)
+            result = bytearray(count)
+            self._copy_out(memoryview(result), count)
+            return bytes(result)
+
+    def readinto(self, buffer) -> int | None:
+        target = memoryview(buffer).cast('B')
+        if len(target) == 0:
+            return 0
+        with self._condition:
+            if not self._wait_for_data():
+                return 0
+            count = min(len(target), self._size)
+            self._copy_out(target, count)
+            return count
 
     def readall(self) -> bytes:
         result = bytearray()
         while True:
             next = self.read()
-            if next is None or len(next) == 0:
+            if len(next) == 0:
                 break
             result.extend(next)
-        return result
+        return bytes(result)
 
     def write(self, data) -> int:
-        self._queue.put(data)
-        return len(data)
+        source = memoryview(data).cast('B')
+        offset = 0
+        while offset < len(source):
+            with self._condition:
+                # backpressure, wait until the reader made room
+                while self._size == self._capacity and not self._aborted:
+                    self._condition.wait()
+                if self._aborted:
+                    raise BrokenPipeError('Audio stream was aborted by the reader')
+                if self._done:
+                    raise ValueError('Write to closed audio stream')
+                tail = (self._head + self._size) % self._capacity
+                count = min(len(source) - offset, self._capacity - self._size, self._capacity - tail)
+                self._view[tail:tail + count] = source[offset:offset + count]
+                self._size += count
+                offset += count
+                self._condition.notify_all()
+        return len(source)
+
+    def set_error(self, error) -> None:
+        # ends the stream, the reader gets the error after the buffered data
+        with self._condition:
+            self._error = error
+            self._done = True
+            self._condition.notify_all()
+
+    def abort(self) -> None:
+        # called by the reader, discards buffered data and makes writes fail
+        with self._condition:
+            self._aborted = True
+            self._done = True
+            self._size = 0
+            self._condition.notify_all()
 
     @property
     def seekable(self) -> bool:
@@ -63,7 +121,9 @@ class ByteQueueFile(RawIOBase, StreamableSource):
         return self._position
 
     def close(self) -> None:
-        self._done = True
+        with self._condition:
+            self._done = True
+            self._condition.notify_all()
 
     @property
     def closed(self) -> bool:
@@ -103,4 +163,4 @@ class ByteQueueFile(RawIOBase, StreamableSource):
         return 'ByteQueueFile()'
 
     def __del__(self) -> None:
-        return self.close()
\ No newline at end of file
+        return self.close()
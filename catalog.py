@@ -0,0 +1,147 @@
+import fcntl
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import print_verbose, with_thread_state, write_atomically
+from tracing import get_tracer
+
+DEFAULT_CATALOG_TTL = 24 * 60 * 60
+# how long a run waits at exit for refreshes which are still going, see wait_for_refreshes
+REFRESH_EXIT_TIMEOUT = 2.0
+
+class Catalog:
+    # model and voice lists of the providers, one file per list with one item per line.
+    # A stale list is served at once and refreshed in the background, a failed refresh keeps the last good copy.
+    def __init__(self, cache_directory_path, max_workers=4):
+        self.cache_directory_path = cache_directory_path
+        # refreshes run on daemon threads, so one which hangs never keeps the process from exiting
+        self.slots = threading.BoundedSemaphore(max_workers)
+        self.threads = set()
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    def file_path(self, name, kind):
+        return os.path.join(self.cache_directory_path, f'{name}.{kind}')
+
+    def read(self, file_path):
+        # returns the items and their age in seconds, no items if there is no usable copy
+        try:
+            with open(file_path, 'r') as f:
+                items = f.read().splitlines()
+            return items, time.time() - os.path.getmtime(file_path)
+        except OSError:
+            return [], None
+
+    def write(self, file_path, items):
+        write_atomically(file_path, '\n'.join(items))
+
+    def fetch(self, file_path, fetch_func, on_update=None, blocking=True, if_missing=False):
+        # only one process fetches a list at a time, returns None if another one is at it and blocking is False
+        with open(f'{file_path}.lock', 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            try:
+                items, age = self.read(file_path)
+                if items and if_missing:
+                    # another process fetched it while we waited for the lock
+                    return items
+                new_items = list(fetch_func())
+                if not new_items and items:
+                    # providers return an empty list when the request failed
+                    print_verbose('Catalog', f'Got no items for {file_path}, keeping the last good copy')
+                    return items
+                self.write(file_path, new_items)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        if on_update:
+            on_update(new_items)
+        return new_items
+
+    def get(self, name, kind, fetch_func, ttl_seconds=DEFAULT_CATALOG_TTL, on_update=None):
+        with get_tracer().span(f'catalog {name}.{kind}', 'catalog'):
+            file_path = self.file_path(name, kind)
+            items, age = self.read(file_path)
+            if not items:
+                # nothing to serve yet
+                return self.fetch(file_path, fetch_func, on_update, if_missing=True)
+            if age > ttl_seconds:
+                self.refresh_in_background(file_path, fetch_func, on_update)
+            return items
+
+    def refresh(self, name, kind, fetch_func, on_update=None):
+        file_path = self.file_path(name, kind)
+        try:
+            return self.fetch(file_path, fetch_func, on_update)
+        except Exception as e:
+            items, _ = self.read(file_path)
+            if not items:
+                raise
+            print_verbose('Catalog', f'Failed to refresh {file_path}, keeping the last good copy: {e}')
+            return items
+
+    def refresh_in_background(self, file_path, fetch_func, on_update=None):
+        with self.lock:
+            if file_path in self.refreshing:
+                return
+            self.refreshing.add(file_path)
+
+        def refresh():
+            self.slots.acquire()
+            try:
+                print_verbose('Catalog', f'Refreshing {file_path}')
+                self.fetch(file_path, fetch_func, on_update, blocking=False)
+            except Exception as e:
+                print_verbose('Catalog', f'Failed to refresh {file_path}, keeping the last good copy: {e}')
+            finally:
+                self.slots.release()
+                with self.lock:
+                    self.refreshing.discard(file_path)
+                    self.threads.discard(thread)
+
+        thread = threading.Thread(target=with_thread_state(refresh), name='catalog', daemon=True)
+        with self.lock:
+            self.threads.add(thread)
+        thread.start()
+
+    def wait_for_refreshes(self, deadline):
+        with self.lock:
+            threads = list(self.threads)
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+catalogs = {}
+catalogs_lock = threading.Lock()
+
+def get_catalog(cache_directory_path):
+    with catalogs_lock:
+        catalog = catalogs.get(cache_directory_path)
+        if catalog is None:
+            catalog = Catalog(cache_directory_path)
+            catalogs[cache_directory_path] = catalog
+        return catalog
+
+def wait_for_refreshes(timeout=REFRESH_EXIT_TIMEOUT):
+    # a short run would end the refreshes it started, a stale list would then stay stale until a run
+    # takes longer, so runs wait a little for them at exit
+    deadline = time.monotonic() + timeout
+    with catalogs_lock:
+        pending = list(catalogs.values())
+    for catalog in pending:
+        catalog.wait_for_refreshes(deadline)
+
+def fetch_concurrently(funcs):
+    # runs the functions in parallel and returns their results in order, failed ones return None
+    def run(func):
+        try:
+            return func()
+        except Exception as e:
+            print_verbose('Catalog', f'Failed to fetch: {e}')
+            return None
+
+    if len(funcs) <= 1:
+        return [ run(func) for func in funcs ]
+    with ThreadPoolExecutor(max_workers=len(funcs), thread_name_prefix='catalog') as executor:
+        return list(executor.map(run, funcs))
@@ -0,0 +1,66 @@
+import contextlib
+import fcntl
+import json
+import os
+from utils import write_atomically
+
+COMPLETION_INDEX_FILE = 'completion.index'
+
+def get_completion_index_path(cache_directory_path):
+    return os.path.join(cache_directory_path, COMPLETION_INDEX_FILE)
+
+def read_completion_index(cache_directory_path):
+    try:
+        with open(get_completion_index_path(cache_directory_path), 'r') as f:
+            index = json.load(f)
+        if isinstance(index, dict):
+            return index
+    except (OSError, ValueError):
+        pass
+    return {}
+
+def write_completion_index(cache_directory_path, index):
+    write_atomically(get_completion_index_path(cache_directory_path), json.dumps(index))
+
+@contextlib.contextmanager
+def locked_completion_index(cache_directory_path):
+    # one update at a time across processes and daemon requests, like the catalog lists, readers don't lock
+    with open(f'{get_completion_index_path(cache_directory_path)}.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield read_completion_index(cache_directory_path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def update_completion_index(cache_directory_path, **sections):
+    with locked_completion_index(cache_directory_path) as index:
+        changed = False
+        for key, value in sections.items():
+            if index.get(key) != value:
+                index[key] = value
+                changed = True
+        if changed:
+            write_completion_index(cache_directory_path, index)
+
+def update_completion_voices(cache_directory_path, tts_model, voices):
+    with locked_completion_index(cache_directory_path) as index:
+        all_voices = index.get('voices', {})
+        if all_voices.get(tts_model) != voices:
+            all_voices[tts_model] = voices
+            index['voices'] = all_voices
+            write_completion_index(cache_directory_path, index)
+
+def add_completion_session(cache_directory_path, session):
+    with locked_completion_index(cache_directory_path) as index:
+        sessions = index.get('sessions', [])
+        if session not in sessions:
+            sessions.append(session)
+            index['sessions'] = sessions
+            write_completion_index(cache_directory_path, index)
+
+def complete(cache_directory_path, key, prefix):
+    return [i for i in read_completion_index(cache_directory_path).get(key, []) if i.startswith(prefix)]
+
+def complete_voices(cache_directory_path, tts_model, prefix):
+    voices = read_completion_index(cache_directory_path).get('voices', {}).get(tts_model, [])
+    return [v for v in voices if v.startswith(prefix)]
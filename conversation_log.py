@@ -0,0 +1,208 @@
+import calendar
+import gzip
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from utils import print_error, with_thread_state
+
+# The conversation log in ~/.cache/ai-cli: ai-cli.log has the arguments of each run followed by its answer,
+# ai-cli.jsonl (--log-format jsonl) one line per run with arguments, model, timings, byte counts and answer.
+# A writer thread collects what is logged and writes it at most every FLUSH_INTERVAL, so printing the answer
+# never waits for the disk. A log which is too large or too old is renamed when a run starts and compressed
+# to FILE.YYYYmmdd-HHMMSS.gz once the run is done, only the newest backups are kept.
+
+FLUSH_INTERVAL = 0.1
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+# both formats start their lines with the time
+TIME_PATTERN = re.compile(r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d')
+ROTATED_PATTERN = re.compile(r'\.\d{8}-\d{6}(\.\d+)?$')
+
+# requests of the daemon share the log
+rotation_lock = threading.Lock()
+
+def format_time(timestamp):
+    return time.strftime(TIME_FORMAT, time.gmtime(timestamp))
+
+def first_time(file_path):
+    # time of the first entry, None if there is none
+    try:
+        with open(file_path, 'r', errors='replace') as f:
+            match = TIME_PATTERN.search(f.readline(200))
+    except FileNotFoundError:
+        return None
+    if not match:
+        return None
+    return calendar.timegm(time.strptime(match.group(0), TIME_FORMAT))
+
+def rotate(file_path, max_bytes, max_age_seconds):
+    # renames the log if it is due, returns whether it was
+    with rotation_lock:
+        try:
+            size = os.path.getsize(file_path)
+        except FileNotFoundError:
+            return False
+        if size == 0:
+            return False
+        started = first_time(file_path) if max_age_seconds else None
+        too_large = max_bytes and size > max_bytes
+        too_old = started is not None and time.time() - started > max_age_seconds
+        if not too_large and not too_old:
+            return False
+        rotated = f'{file_path}.{time.strftime("%Y%m%d-%H%M%S", time.gmtime())}'
+        if os.path.exists(rotated) or os.path.exists(f'{rotated}.gz'):
+            rotated = f'{rotated}.{os.getpid()}'
+        os.rename(file_path, rotated)
+        return True
+
+def compress_rotated(file_path, backups):
+    # compresses renamed logs, also those of a run which was killed before, and removes the oldest
+    directory = os.path.dirname(file_path)
+    prefix = os.path.basename(file_path) + '.'
+    names = [ name for name in os.listdir(directory) if name.startswith(prefix) ]
+    for name in names:
+        if not ROTATED_PATTERN.search(name):
+            continue
+        source = os.path.join(directory, name)
+        # unique per process and thread, two runs which finish at once may both compress the same file
+        temp_path = f'{source}.gz.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(source, 'rb') as src, gzip.open(temp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(temp_path, f'{source}.gz')
+            os.remove(source)
+        except FileNotFoundError:
+            # another process compressed it
+            pass
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    compressed = sorted(name for name in os.listdir(directory) if name.startswith(prefix) and name.endswith('.gz'))
+    for name in compressed[:max(0, len(compressed) - backups)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+class ConversationLog:
+    def __init__(self, file_path, log_format='text', max_bytes=0, max_age_seconds=0, backups=5):
+        # max_bytes and max_age_seconds of 0 don't limit the log
+        self.file_path = file_path
+        self.log_format = log_format
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.backups = backups
+        self.queue = queue.Queue()
+        self.thread = None
+        self.closed = False
+        self.args = None
+        self.started = None
+        self.start = None
+        self.first_output = None
+        self.chars = 0
+        self.bytes = 0
+        self.parts = []
+
+    def open(self, args=None):
+        self.args = args
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.thread = threading.Thread(target=with_thread_state(self._run), name='conversation-log', daemon=True)
+        self.thread.start()
+        if self.log_format == 'text' and args:
+            self.queue.put(f'{format_time(self.started)}: {args}\n')
+        return self
+
+    def write(self, text):
+        if self.first_output is None:
+            self.first_output = time.perf_counter()
+        self.chars += len(text)
+        self.bytes += len(text.encode('utf-8'))
+        if self.log_format == 'jsonl':
+            self.parts.append(text)
+        else:
+            self.queue.put(text)
+
+    def record(self, status):
+        def milliseconds(end):
+            return round((end - self.start) * 1000, 1) if end is not None else None
+
+        args = vars(self.args) if self.args is not None else {}
+        return {
+            'time': format_time(self.started),
+            'status': status,
+            'model': args.get('model'),
+            'tts_model': args.get('tts_model') if args.get('output', 'text') != 'text' else None,
+            'session': args.get('session') or None,
+            'first_output_ms': milliseconds(self.first_output),
+            'elapsed_ms': milliseconds(time.perf_counter()),
+            'chars': self.chars,
+            'bytes': self.bytes,
+            'args': args,
+            'text': ''.join(self.parts),
+        }
+
+    def close(self, footer=True, status='ok'):
+        # waits until everything is written, status is only recorded in the JSONL format
+        if self.closed:
+            return
+        self.closed = True
+        if self.log_format == 'jsonl':
+            self.queue.put(json.dumps(self.record(status), ensure_ascii=False, default=str) + '\n')
+        elif footer:
+            self.queue.put('\n')
+        self.queue.put(None)
+        self.thread.join()
+
+    def _next(self):
+        # blocks for the next item, then collects what follows within FLUSH_INTERVAL
+        # into one write, returns the text and whether the log was closed
+        item = self.queue.get()
+        if item is None:
+            return '', True
+        chunks = [ item ]
+        deadline = time.perf_counter() + FLUSH_INTERVAL
+        while True:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                return ''.join(chunks), False
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                return ''.join(chunks), False
+            if item is None:
+                return ''.join(chunks), True
+            chunks.append(item)
+
+    def _run(self):
+        f = None
+        rotated = False
+        try:
+            rotated = rotate(self.file_path, self.max_bytes, self.max_age_seconds)
+            f = open(self.file_path, 'a', encoding='utf-8')
+        except OSError as e:
+            print_error('Failed to open the log:', e)
+
+        closed = False
+        while not closed:
+            text, closed = self._next()
+            if f is None or not text:
+                continue
+            try:
+                f.write(text)
+                f.flush()
+            except OSError as e:
+                print_error('Failed to write the log:', e)
+                f.close()
+                f = None
+
+        if f is not None:
+            f.close()
+        if rotated:
+            try:
+                compress_rotated(self.file_path, self.backups)
+            except OSError as e:
+                print_error('Failed to compress the log:', e)
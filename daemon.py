@@ -0,0 +1,257 @@
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from utils import print_verbose
+from utils import print_error
+
+# one JSON message per line, the client sends the request, the daemon streams
+# {"stdout": text}, {"stderr": text} and finally {"exit": code} back. A client which is interrupted
+# sends {"cancel": true} or just goes away, either cancels the request.
+
+def get_socket_path(folder):
+    return os.path.join(folder, 'ai-cli.sock')
+
+class ThreadLocalStream:
+    # stands in for sys.stdout/sys.stderr/sys.stdin, each request thread writes to its own client
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def set(self, stream):
+        self.local.stream = stream
+
+    def clear(self):
+        self.local.stream = None
+
+    def get(self):
+        return getattr(self.local, 'stream', None) or self.default
+
+    def write(self, text):
+        return self.get().write(text)
+
+    def flush(self):
+        return self.get().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+class ClientDisconnectedError(Exception):
+    pass
+
+class ClientStream:
+    def __init__(self, connection, name, lock):
+        self.connection = connection
+        self.name = name
+        self.lock = lock
+        self.encoding = 'utf-8'
+
+    def write(self, text):
+        if not text:
+            return 0
+        self.connection.send({ self.name: text }, self.lock)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+class ClientConnection:
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.closed = False
+
+    def send(self, message, lock):
+        with lock:
+            if self.closed:
+                raise ClientDisconnectedError('Client disconnected')
+            try:
+                self.wfile.write(json.dumps(message).encode('utf-8') + b'\n')
+                self.wfile.flush()
+            except OSError:
+                self.closed = True
+                raise ClientDisconnectedError('Client disconnected')
+
+def interrupt(thread, exception=KeyboardInterrupt):
+    # raises exception in thread once it runs Python code again, None takes back one which wasn't raised yet
+    import ctypes
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread.ident), ctypes.py_object(exception) if exception else None)
+
+class RequestCancellation:
+    # a cancelled request gets a KeyboardInterrupt as a local run does on Ctrl-C, the functions passed to
+    # on_cancel unblock what it waits for meanwhile, e.g. audio being played
+    def __init__(self, thread):
+        self.thread = thread
+        self.funcs = []
+        self.cancelled = False
+        self.finished = False
+        self.lock = threading.Lock()
+
+    def on_cancel(self, func):
+        # func is called from another thread
+        with self.lock:
+            if not self.cancelled:
+                self.funcs.append(func)
+                return
+        func()
+
+    def cancel(self):
+        with self.lock:
+            if self.cancelled or self.finished:
+                return
+            self.cancelled = True
+            interrupt(self.thread)
+            funcs = list(self.funcs)
+        print_verbose('Daemon', 'Client went away, cancelling the request')
+        for func in funcs:
+            try:
+                func()
+            except Exception as e:
+                print_error("Failed to cancel the request:", e)
+
+    def finish(self):
+        with self.lock:
+            self.finished = True
+            if self.cancelled:
+                interrupt(self.thread, None)
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def watch(self, cancellation):
+        # nothing but a cancel message comes after the request, or the end of the connection
+        try:
+            self.rfile.readline()
+        except (OSError, ValueError):
+            pass
+        cancellation.cancel()
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        request = json.loads(line)
+        cancellation = RequestCancellation(threading.current_thread())
+        request['on_cancel'] = cancellation.on_cancel
+        threading.Thread(target=self.watch, args=(cancellation,), name='daemon-watch', daemon=True).start()
+        connection = ClientConnection(self.wfile)
+        lock = threading.Lock()
+        sys.stdout.set(ClientStream(connection, 'stdout', lock))
+        sys.stderr.set(ClientStream(connection, 'stderr', lock))
+        sys.stdin.set(io.StringIO(request.get('stdin') or ''))
+        code = 0
+        try:
+            try:
+                self.server.handle_request_func(request)
+            finally:
+                cancellation.finish()
+        except KeyboardInterrupt:
+            code = 130
+        except SystemExit as e:
+            if isinstance(e.code, str):
+                print(e.code, file=sys.stderr)
+                code = 1
+            else:
+                code = e.code or 0
+        except ClientDisconnectedError:
+            code = 1
+        except Exception as e:
+            print_error("Failed to handle request:", e)
+            code = 1
+        finally:
+            sys.stdout.clear()
+            sys.stderr.clear()
+            sys.stdin.clear()
+        try:
+            connection.send({ 'exit': code }, lock)
+        except ClientDisconnectedError:
+            print_verbose('Daemon', 'Client disconnected before the request finished')
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, handle_request_func):
+        self.handle_request_func = handle_request_func
+        super().__init__(socket_path, RequestHandler)
+
+def is_daemon_running(socket_path):
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        s.close()
+
+def run_daemon(socket_path, handle_request_func, warm_up_func=None):
+    if os.path.exists(socket_path):
+        if is_daemon_running(socket_path):
+            print_error("Daemon is already running:", socket_path)
+            return 1
+        # left over from a daemon which didn't shut down cleanly
+        os.remove(socket_path)
+
+    if warm_up_func:
+        # before any request thread runs, e.g. for providers which need to change the working directory
+        warm_up_func()
+
+    sys.stdout = ThreadLocalStream(sys.stdout)
+    sys.stderr = ThreadLocalStream(sys.stderr)
+    sys.stdin = ThreadLocalStream(sys.stdin)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt()
+    signal.signal(signal.SIGTERM, stop)
+
+    server = DaemonServer(socket_path, handle_request_func)
+    os.chmod(socket_path, 0o600)
+    print_verbose('Daemon', f'Listening on {socket_path}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+    return 0
+
+def run_client(socket_path, create_request):
+    # returns the exit code of the request or None if no daemon is running, create_request is only
+    # called once connected, so what it reads, e.g. stdin, is still there for a local run otherwise
+    if not os.path.exists(socket_path):
+        return None
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(socket_path)
+    except OSError:
+        s.close()
+        return None
+
+    try:
+        s.sendall(json.dumps(create_request()).encode('utf-8') + b'\n')
+        with s.makefile('rb') as f:
+            for line in f:
+                message = json.loads(line)
+                if 'stdout' in message:
+                    sys.stdout.write(message['stdout'])
+                    sys.stdout.flush()
+                elif 'stderr' in message:
+                    sys.stderr.write(message['stderr'])
+                    sys.stderr.flush()
+                elif 'exit' in message:
+                    return message['exit']
+        print_error("Daemon closed the connection")
+        return 1
+    except KeyboardInterrupt:
+        try:
+            s.sendall(json.dumps({ 'cancel': True }).encode('utf-8') + b'\n')
+        except OSError:
+            pass
+        return 130
+    finally:
+        s.close()
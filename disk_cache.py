@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from utils import write_atomically
+
+# writes between full scans of the directory, which also catch expired entries and what other processes wrote
+EVICT_INTERVAL = 64
+
+class DiskCache:
+    # entries are files named by key, mtime is the creation time (TTL) and atime the last use (LRU)
+
+    def __init__(self, directory, max_bytes, ttl_seconds=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # size of the directory as of the last scan plus what was written since, None before the first scan
+        self.size = None
+        self.writes = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        file_path = self._path(key)
+        try:
+            stat = os.stat(file_path)
+            now = time.time()
+            if self.ttl_seconds and now - stat.st_mtime > self.ttl_seconds:
+                os.remove(file_path)
+                return None
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            os.utime(file_path, (now, stat.st_mtime))
+            return data
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, data):
+        write_atomically(self._path(key), data)
+        with self.lock:
+            self.writes += 1
+            if self.size is not None:
+                self.size += len(data)
+            due = self.size is None or self.size > self.max_bytes or self.writes >= EVICT_INTERVAL
+        if due:
+            self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.is_file() or entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if self.ttl_seconds and now - stat.st_mtime > self.ttl_seconds:
+                    self._remove(entry.path)
+                    continue
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total > self.max_bytes:
+            # least recently used first
+            entries.sort()
+            for _, size, file_path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(file_path)
+                total -= size
+
+        with self.lock:
+            self.size = total
+            self.writes = 0
+
+    def _remove(self, file_path):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
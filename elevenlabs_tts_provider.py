@@ -1,13 +1,18 @@
 from elevenlabs.client import ElevenLabs
+from elevenlabs.environment import ElevenLabsEnvironment
 from tts_provider import TTSProvider
 from byte_queue_file import ByteQueueFile
+from http_transport import get_http_client, get_elevenlabs_base_url
 
 TTS_CHUNK_SIZE = 1024
 
 class ElevenLabsTTSProvider(TTSProvider):
     def __init__(self):
         # reads API key from ELEVEN_API_KEY env variable
-        self.client = ElevenLabs()
+        base_url = get_elevenlabs_base_url()
+        # base_url of the SDK keeps only the host and always uses https
+        environment = ElevenLabsEnvironment(base=base_url, wss=base_url.replace('http', 'ws', 1))
+        self.client = ElevenLabs(environment=environment, httpx_client=get_http_client(base_url))
         self.model_names = []
         self.voices = []
 
@@ -35,12 +40,21 @@ class ElevenLabsTTSProvider(TTSProvider):
     def max_length(self):
         return 5000
 
+    def supports_pcm(self):
+        return True
+
+    def pcm_samplerate(self):
+        return 24000
+
     def default_voice(self):
         return 'Brian'
 
     def default_model(self):
         return 'eleven_multilingual_v2'
 
+    def endpoint(self):
+        return get_elevenlabs_base_url()
+
     def _list_models(self):
         if not self.model_names:
             models = self.client.models.get_all()
@@ -55,7 +69,7 @@ class ElevenLabsTTSProvider(TTSProvider):
             self.voices.sort()
         return self.voices
 
-    def get_response(self, text, model, voice_id, speed, stream):
+    def get_response(self, text, model, voice_id, speed, stream, output_format='mp3_44100_128'):
         if speed != 1.0:
             print(f"WARNING: {self.name()} provider does not support adjustable speed.")
         return self.client.generate(
@@ -63,7 +77,7 @@ class ElevenLabsTTSProvider(TTSProvider):
             voice=voice_id,
             stream=stream,
             model=model if model else self.default_model(),
-            output_format='mp3_44100_128'
+            output_format=output_format
         )
 
     def text_to_speech(self, text, model, voice_id, speed, audio_file):
@@ -73,8 +87,9 @@ class ElevenLabsTTSProvider(TTSProvider):
                 if chunk:
                     f.write(chunk)
 
-    def text_to_speech_stream(self, text, model, voice_id, speed, virtual_audio_file: ByteQueueFile):
-        response = self.get_response(text, model, voice_id, speed, True)
+    def text_to_speech_stream(self, text, model, voice_id, speed, virtual_audio_file: ByteQueueFile, audio_format=None):
+        output_format = f'pcm_{self.pcm_samplerate()}' if audio_format == TTSProvider.Format.PCM else 'mp3_44100_128'
+        response = self.get_response(text, model, voice_id, speed, True, output_format)
         for chunk in response:
             virtual_audio_file.write(chunk)
         virtual_audio_file.close()
\ No newline at end of file
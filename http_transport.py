@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+from utils import print_verbose
+
+OPENAI_BASE_URL = 'https://api.openai.com/v1'
+ELEVENLABS_BASE_URL = 'https://api.elevenlabs.io'
+
+# idle connections are kept this long, the daemon reuses them across requests
+KEEPALIVE_SECONDS = 120
+MAX_KEEPALIVE_CONNECTIONS = 8
+CONNECT_TIMEOUT_SECONDS = 10
+TIMEOUT_SECONDS = 600
+
+# one pooled client per endpoint (scheme, host and port), shared by all providers talking to it
+http_clients = {}
+openai_clients = {}
+prewarmed = {}
+lock = threading.RLock()
+
+def endpoint_key(url):
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    return f'{parts.scheme}://{parts.hostname}:{port}'
+
+def supports_http2():
+    try:
+        import h2
+        return True
+    except ImportError:
+        return False
+
+def get_http_client(url):
+    key = endpoint_key(url)
+    with lock:
+        client = http_clients.get(key)
+        if client is None:
+            import httpx
+            http2 = supports_http2()
+            print_verbose('Transport', f'{key} (HTTP/2)' if http2 else key)
+            client = httpx.Client(
+                http2=http2,
+                limits=httpx.Limits(max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS, keepalive_expiry=KEEPALIVE_SECONDS),
+                timeout=httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+                follow_redirects=True,
+            )
+            http_clients[key] = client
+        return client
+
+def get_openai_base_url():
+    return os.environ.get('OPENAI_BASE_URL') or OPENAI_BASE_URL
+
+def get_elevenlabs_base_url():
+    return os.environ.get('ELEVENLABS_BASE_URL') or ELEVENLABS_BASE_URL
+
+def get_openai_client():
+    # chat, speech and transcription share one client and its connection pool
+    from openai import OpenAI
+    base_url = get_openai_base_url()
+    with lock:
+        client = openai_clients.get(base_url)
+        if client is None:
+            client = OpenAI(base_url=base_url, http_client=get_http_client(base_url))
+            openai_clients[base_url] = client
+        return client
+
+def prewarm(url):
+    # resolves the host and opens a connection (TLS, HTTP/2) in the background, the request which
+    # needs it later finds it in the pool, returns the thread or None if the endpoint is still warm
+    key = endpoint_key(url)
+    with lock:
+        last = prewarmed.get(key)
+        if last is not None and time.time() - last < KEEPALIVE_SECONDS:
+            return None
+        prewarmed[key] = time.time()
+
+    def run():
+        start = time.perf_counter()
+        try:
+            # any response will do, only the connection matters
+            get_http_client(url).head(url)
+            print_verbose('Prewarm', f'{key} in {int((time.perf_counter() - start) * 1000)} ms')
+        except Exception as e:
+            with lock:
+                prewarmed.pop(key, None)
+            print_verbose('Prewarm', f'Failed for {key}: {e}')
+
+    thread = threading.Thread(target=run, name='prewarm', daemon=True)
+    thread.start()
+    return thread
+
+def close():
+    with lock:
+        for client in http_clients.values():
+            try:
+                client.close()
+            except Exception as e:
+                print_verbose('Transport', f'Failed to close client: {e}')
+        http_clients.clear()
+        openai_clients.clear()
+        prewarmed.clear()
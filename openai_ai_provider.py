@@ -1,10 +1,23 @@
 import time
-from openai import OpenAI
 from ai_provider import AIProvider
+from http_transport import get_openai_client
+
+# context window per model prefix, first match wins
+CONTEXT_TOKENS = [
+    ('gpt-4o', 128000),
+    ('gpt-4-turbo', 128000),
+    ('gpt-4-1106', 128000),
+    ('gpt-4-0125', 128000),
+    ('gpt-4-32k', 32768),
+    ('gpt-4', 8192),
+    ('gpt-3.5-turbo-instruct', 4096),
+    ('gpt-3.5-turbo', 16385),
+]
+DEFAULT_CONTEXT_TOKENS = 128000
 
 class OpenAIProvider(AIProvider):
     def __init__(self):
-        self.client = OpenAI()
+        self.client = get_openai_client()
         self.model_names = []
 
     def name(self):
@@ -13,6 +26,9 @@ class OpenAIProvider(AIProvider):
     def supports_sessions(self):
         return True
 
+    def context_tokens(self, model):
+        return next((tokens for prefix, tokens in CONTEXT_TOKENS if model.startswith(prefix)), DEFAULT_CONTEXT_TOKENS)
+
     def _list_models(self):
         if not self.model_names:
             models = self.client.models.list()
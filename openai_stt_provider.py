@@ -1,14 +1,17 @@
-from openai import OpenAI
 from stt_provider import STTProvider
+from http_transport import get_openai_client, get_openai_base_url
 
 class OpenAISTTProvider(STTProvider):
     def __init__(self):
-        self.client = OpenAI()
+        self.client = get_openai_client()
         self.model_names = []
 
     def name(self):
         return 'openai-whisper'
 
+    def endpoint(self):
+        return get_openai_base_url()
+
     def _list_models(self):
         if not self.model_names:
             models = self.client.models.list()
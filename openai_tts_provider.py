@@ -1,12 +1,12 @@
-from openai import OpenAI
 from tts_provider import TTSProvider
+from http_transport import get_openai_client, get_openai_base_url
 from byte_queue_file import ByteQueueFile
 
 TTS_CHUNK_SIZE = 2048
 
 class OpenAITTSProvider(TTSProvider):
     def __init__(self):
-        self.client = OpenAI()
+        self.client = get_openai_client()
         self.model_names = []
 
     def name(self):
@@ -33,12 +33,24 @@ class OpenAITTSProvider(TTSProvider):
     def max_length(self):
         return 4096
 
+    def max_concurrency(self):
+        return 4
+
+    def supports_pcm(self):
+        return True
+
+    def pcm_samplerate(self):
+        return 24000
+
     def default_voice(self):
         return 'nova'
 
     def default_model(self):
         return 'tts-1'
 
+    def endpoint(self):
+        return get_openai_base_url()
+
     def _list_models(self):
         if not self.model_names:
             models = self.client.models.list()
@@ -50,11 +62,11 @@ class OpenAITTSProvider(TTSProvider):
     def _list_voices(self):
         return [ 'alloy', 'echo', 'fable', 'onyx', 'nova', 'shimmer' ]
 
-    def get_response(self, text, model, voice_id, speed):
+    def get_response(self, text, model, voice_id, speed, response_format='mp3'):
         return self.client.audio.speech.with_streaming_response.create(
             model=model if model else self.default_model(),
             voice=voice_id,
-            response_format='mp3',
+            response_format=response_format,
             speed=str(speed),
             input=text
         )
@@ -65,8 +77,9 @@ class OpenAITTSProvider(TTSProvider):
                 for chunk in response.iter_bytes(chunk_size=TTS_CHUNK_SIZE):
                     file.write(chunk)
 
-    def text_to_speech_stream(self, text, model, voice_id, speed, virtual_audio_file: ByteQueueFile):
-        with self.get_response(text, model, voice_id, speed) as response:
+    def text_to_speech_stream(self, text, model, voice_id, speed, virtual_audio_file: ByteQueueFile, audio_format=None):
+        response_format = 'pcm' if audio_format == TTSProvider.Format.PCM else 'mp3'
+        with self.get_response(text, model, voice_id, speed, response_format) as response:
             for chunk in response.iter_bytes(chunk_size=TTS_CHUNK_SIZE):
                 virtual_audio_file.write(chunk)
             virtual_audio_file.close()
\ No newline at end of file
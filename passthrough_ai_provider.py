@@ -13,6 +13,9 @@ class PassthroughProvider(AIProvider):
     def supports_sessions(self):
         return False
 
+    def max_concurrency(self):
+        return 16
+
     def chat_completion(self, messages, model, stream=False):
         result = []
         for m in messages:
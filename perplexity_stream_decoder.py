@@ -0,0 +1,111 @@
+import json
+
+mode_pro = 'copilot'
+
+class PerplexityStreamDecoder:
+    # Perplexity streams cumulative payloads, every event repeats the full chunk list, copilot steps
+    # and sources. The decoder keeps offsets into these lists and parses embedded JSON only once,
+    # so each event only costs as much as the text it adds.
+    def __init__(self):
+        self.chunk_count = 0
+        self.step_index = 0
+        self.source_counts = {}
+        self.parsed = {}
+
+    def parse_json(self, slot, value):
+        # the same JSON string is repeated in every event, only parse it again once it changed
+        if not isinstance(value, str):
+            return value
+        cached = self.parsed.get(slot)
+        if cached is not None and (cached[0] is value or cached[0] == value):
+            return cached[1]
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            parsed = value
+        self.parsed[slot] = (value, parsed)
+        return parsed
+
+    def extract_copilot_answer(self, slot, step):
+        if isinstance(step, dict) and 'content' in step:
+            content = step.get('content', {})
+            if 'answer' in content:
+                return self.parse_json(slot, content.get('answer', {}))
+            return content
+        return None
+
+    def extract_text(self, part):
+        if not isinstance(part, dict) or 'chunks' not in part:
+            return False, ''
+        chunks = part.get('chunks', [])
+        if len(chunks) <= self.chunk_count:
+            return True, ''
+        text = ''.join(chunks[self.chunk_count:])
+        self.chunk_count = len(chunks)
+        return True, text
+
+    def new_items(self, key, items):
+        count = self.source_counts.get(key, 0)
+        if len(items) < count:
+            # a different list, start over, known sources are skipped anyway
+            count = 0
+        self.source_counts[key] = len(items)
+        return items[count:]
+
+    def add_sources(self, key, part, thread_url_slug, thread_title, sources):
+        if thread_url_slug:
+            url = f'https://perplexity.ai/search/{thread_url_slug}'
+            if not url in sources:
+                model_title = 'Perplexity Pro' if part.get('mode', '') == mode_pro else 'Perplexity'
+                if len(thread_title) > 0:
+                    sources[url] = f'{model_title}: {thread_title}:'
+                else:
+                    sources[url] = f'{model_title}:'
+
+        for field in ('web_results', 'extra_web_results'):
+            for w in self.new_items((key, field), part.get(field, None) or []):
+                url = w.get('url', '')
+                if not url in sources:
+                    name = w.get('name', '').strip()
+                    if len(name) > 0:
+                        sources[url] = f'[{len(sources) + 1}] {name}:'
+                    else:
+                        sources[url] = f'[{len(sources) + 1}]'
+
+    def decode(self, chunk, sources):
+        parts = [ ('chunk', chunk) ]
+        steps = chunk.get('copilot_answer', None) or []
+        if len(steps) < self.step_index:
+            self.step_index = 0
+        for i in range(self.step_index, len(steps)):
+            # unpack copilot steps, all but the last one are complete and were decoded already
+            step = steps[i]
+            answer = self.extract_copilot_answer(('step', i), step)
+            if answer:
+                parts.append((('step', i), answer))
+        self.step_index = max(len(steps) - 1, 0)
+
+        text = ''
+        for key, part in parts:
+            thread_url_slug = part.get('thread_url_slug', '')
+            thread_title = part.get('thread_title', '').strip()
+            ok, delta = self.extract_text(part)
+            if not ok and 'text' in part:
+                # for the last part, the remaining chunks and web_results seem to be in 'text'
+                text_value = self.parse_json(('text', key), part.get('text', {}))
+                if isinstance(text_value, list) and len(text_value) > 0:
+                    # looks like copilot steps
+                    text_value = self.extract_copilot_answer(('text step', key), text_value[-1])
+                if isinstance(text_value, dict):
+                    key = ('text', key)
+                    part = text_value
+                    ok, delta = self.extract_text(part)
+                    if not thread_url_slug:
+                        thread_url_slug = part.get('thread_url_slug', '')
+                    if not thread_title:
+                        thread_title = part.get('thread_title', '').strip()
+
+            text += delta
+            if sources is not None:
+                self.add_sources(key, part, thread_url_slug, thread_title, sources)
+        return text
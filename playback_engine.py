@@ -0,0 +1,298 @@
+import array
+import queue
+import sys
+import threading
+import time
+import miniaudio
+import utils
+from tracing import get_tracer
+from tts_provider import TTSProvider
+
+# decoded chunks buffered between decoder and device
+PCM_QUEUE_SIZE = 64
+
+def get_miniaudio_formats(tts_provider):
+    miniaudio_format = miniaudio.FileFormat.UNKNOWN
+    miniaudio_sample_format = miniaudio.SampleFormat.UNKNOWN
+    tts_format = tts_provider.format()
+    if tts_format:
+        if tts_format == TTSProvider.Format.MP3:
+            miniaudio_format = miniaudio.FileFormat.MP3
+        elif tts_format == TTSProvider.Format.WAV:
+            miniaudio_format = miniaudio.FileFormat.WAV
+
+    tts_dtype = tts_provider.dtype()
+    if tts_dtype:
+        tts_dtype = tts_dtype.lower()
+        if tts_dtype == 'float32':
+            miniaudio_sample_format = miniaudio.SampleFormat.FLOAT32
+        elif tts_dtype == 'signed16':
+            miniaudio_sample_format = miniaudio.SampleFormat.SIGNED16
+
+    return miniaudio_format, miniaudio_sample_format
+
+class PlaybackSegment:
+    def __init__(self, source, on_done=None):
+        self.source = source
+        self.on_done = on_done
+        self.error = None
+        self.started_at = None
+        # finished on the decoder thread, which is shared by the requests of the daemon
+        self.tracer = get_tracer()
+        self._done = threading.Event()
+
+    def start(self):
+        # called by the device callback when the first samples are played
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+
+    def finish(self):
+        if not self._done.is_set():
+            if self.started_at is not None:
+                self.tracer.playback(f'play {self.source}', self.started_at, time.perf_counter())
+            self._done.set()
+            if self.on_done:
+                self.on_done()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+class SegmentStart:
+    # queued with the decoded samples, marks where a segment begins
+    def __init__(self, segment):
+        self.segment = segment
+
+class NullPlaybackDevice:
+    # stands in for miniaudio.PlaybackDevice in benchmarks, pulls samples at the pace of a device and drops them
+    PERIOD_SECONDS = 0.01
+
+    def __init__(self, sample_rate):
+        self.frames = int(sample_rate * NullPlaybackDevice.PERIOD_SECONDS)
+        self.running = False
+        self.thread = None
+
+    def start(self, generator):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, args=(generator,), name='null-sink', daemon=True)
+        self.thread.start()
+
+    def _run(self, generator):
+        deadline = time.perf_counter()
+        while self.running:
+            generator.send(self.frames)
+            deadline += NullPlaybackDevice.PERIOD_SECONDS
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def close(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+
+class PlaybackEngine:
+    # opens the playback device once and plays queued segments back to back, silence in between keeps the sink awake
+
+    def __init__(self, tts_provider, buffersize_msec=200, crossfade_msec=0, sink='device', audio_format=None):
+        self.source_format, self.sample_format = get_miniaudio_formats(tts_provider)
+        self.nchannels = tts_provider.channels()
+        self.sample_rate = tts_provider.samplerate()
+        if audio_format == TTSProvider.Format.PCM:
+            # the device takes the samples as the provider sends them
+            self.sample_format = miniaudio.SampleFormat.SIGNED16
+            self.sample_rate = tts_provider.pcm_samplerate()
+        self.frames_to_read = tts_provider.blocksize()
+        self.buffersize_msec = int(buffersize_msec)
+        self.typecode = 'h' if self.sample_format == miniaudio.SampleFormat.SIGNED16 else 'f'
+        self.crossfade_samples = int(self.sample_rate * crossfade_msec / 1000) * self.nchannels
+        self.segments = queue.Queue()
+        self.pcm = queue.Queue(maxsize=PCM_QUEUE_SIZE)
+        self.silence = array.array(self.typecode)
+        self.current = None
+        self.current_offset = 0
+        self.device = None
+        self.decoder = None
+        self.last_segment = None
+        self.starting = None
+        # 'null' discards the audio, see NullPlaybackDevice
+        self.sink = sink
+
+    def start(self):
+        if self.device is None:
+            utils.print_verbose("Play", f'Opening playback device, format: {self.sample_format}, channels: {self.nchannels}, rate: {self.sample_rate}')
+            with get_tracer().span('device start', 'playback'):
+                self.decoder = threading.Thread(target=self._decode, name='audio-decoder', daemon=True)
+                self.decoder.start()
+                if self.sink == 'null':
+                    self.device = NullPlaybackDevice(self.sample_rate)
+                else:
+                    self.device = miniaudio.PlaybackDevice(output_format=self.sample_format, nchannels=self.nchannels, sample_rate=self.sample_rate, buffersize_msec=self.buffersize_msec)
+                generator = self._generate()
+                next(generator)
+                self.device.start(generator)
+        return self
+
+    def play(self, source, on_done=None):
+        # queues a file path or ByteQueueFile, returns immediately
+        self.start()
+        segment = PlaybackSegment(source, on_done)
+        self.last_segment = segment
+        self.segments.put(segment)
+        return segment
+
+    def plays_pcm(self, sample_rate):
+        # raw PCM isn't resampled, it has to come at the rate of the device
+        return self.sample_rate == sample_rate
+
+    def drain(self):
+        # waits until everything queued was played
+        if self.last_segment is not None:
+            self.last_segment.wait()
+
+    def close(self):
+        if self.device is not None:
+            self.segments.put(None)
+            self.decoder.join(timeout=5)
+            self.device.close()
+            self.device = None
+
+    def _stream_pcm(self, source):
+        # raw signed 16 bit samples are passed on without a decoder, an odd byte is kept for the next read
+        size = self.frames_to_read * self.nchannels * 2
+        pending = b''
+        while True:
+            data = source.read(size)
+            if not data:
+                break
+            if pending:
+                data = pending + data
+            usable = len(data) - len(data) % 2
+            pending = data[usable:]
+            samples = array.array('h', data[:usable])
+            if sys.byteorder == 'big':
+                samples.byteswap()
+            if self.typecode == 'f':
+                # a device opened for float samples before, e.g. by an MP3 request in the daemon, converted in one call
+                samples = array.array('f', miniaudio.convert_frames(miniaudio.SampleFormat.SIGNED16, self.nchannels, self.sample_rate, samples.tobytes(),
+                                                                   miniaudio.SampleFormat.FLOAT32, self.nchannels, self.sample_rate))
+            yield samples
+
+    def _stream(self, source):
+        if getattr(source, 'audio_format', None) == TTSProvider.Format.PCM:
+            return self._stream_pcm(source)
+        if isinstance(source, str):
+            return miniaudio.stream_file(source, output_format=self.sample_format, nchannels=self.nchannels, sample_rate=self.sample_rate, frames_to_read=self.frames_to_read)
+        return miniaudio.stream_any(source, source_format=self.source_format, output_format=self.sample_format, nchannels=self.nchannels, sample_rate=self.sample_rate, frames_to_read=self.frames_to_read)
+
+    def _decode(self):
+        tail = None
+        while True:
+            try:
+                # a pending crossfade tail is only held back for a short moment
+                segment = self.segments.get(timeout=0.05 if tail is not None else None)
+            except queue.Empty:
+                self._flush(tail)
+                tail = None
+                continue
+
+            if segment is None:
+                if tail is not None:
+                    self._flush(tail)
+                break
+
+            head = array.array(self.typecode)
+            stream = None
+            self.pcm.put(SegmentStart(segment))
+            try:
+                stream = self._stream(segment.source)
+                for samples in stream:
+                    if self.crossfade_samples <= 0:
+                        self.pcm.put(samples)
+                        continue
+                    head.extend(samples)
+                    if tail is not None:
+                        if len(head) < self.crossfade_samples:
+                            continue
+                        self.pcm.put(self._crossfade(tail[0], head))
+                        self.pcm.put(tail[1])
+                        tail = None
+                        head = array.array(self.typecode)
+                    elif len(head) > self.crossfade_samples:
+                        # keep the last samples back for the next segment
+                        self.pcm.put(head[:-self.crossfade_samples])
+                        head = head[-self.crossfade_samples:]
+            except Exception as e:
+                segment.error = e
+                utils.print_error('Failed to play audio:', e)
+                if hasattr(segment.source, 'abort'):
+                    # unblock the writer
+                    segment.source.abort()
+            finally:
+                if stream is not None:
+                    stream.close()
+
+            if tail is not None:
+                # segment was shorter than the crossfade
+                self.pcm.put(self._crossfade(tail[0], head))
+                self.pcm.put(tail[1])
+                tail = None
+                head = array.array(self.typecode)
+            if len(head) > 0:
+                tail = (head, segment)
+            else:
+                self.pcm.put(segment)
+
+    def _crossfade(self, tail, head):
+        count = min(len(tail), len(head))
+        mixed = array.array(self.typecode, head)
+        for i in range(count):
+            weight = i / count
+            value = tail[i] * (1.0 - weight) + head[i] * weight
+            mixed[i] = int(value) if self.typecode == 'h' else value
+        return mixed
+
+    def _flush(self, tail):
+        # no segment follows, fade the tail out to silence
+        samples, segment = tail
+        self.pcm.put(self._crossfade(samples, array.array(self.typecode, bytes(len(samples) * samples.itemsize))))
+        self.pcm.put(segment)
+
+    def _take(self, count):
+        output = array.array(self.typecode)
+        while len(output) < count:
+            if self.current is None or self.current_offset >= len(self.current):
+                try:
+                    item = self.pcm.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, PlaybackSegment):
+                    item.finish()
+                    continue
+                if isinstance(item, SegmentStart):
+                    # starts with its first samples, there may be silence until they are decoded
+                    self.starting = item.segment
+                    continue
+                if self.starting is not None:
+                    self.starting.start()
+                    self.starting = None
+                self.current = item
+                self.current_offset = 0
+            needed = count - len(output)
+            output.extend(self.current[self.current_offset:self.current_offset + needed])
+            self.current_offset += needed
+        if len(output) < count:
+            # nothing decoded yet, play silence
+            missing = count - len(output)
+            if len(self.silence) < missing:
+                self.silence = array.array(self.typecode, bytes(missing * self.silence.itemsize))
+            output.extend(self.silence[:missing])
+        return output
+
+    def _generate(self):
+        required_frames = yield b''
+        while True:
+            required_frames = yield self._take(required_frames * self.nchannels)
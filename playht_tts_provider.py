@@ -2,9 +2,11 @@ import utils
 import os
 import re
 import requests
+import threading
 from pyht import Client, TTSOptions, Format
 from tts_provider import TTSProvider
 from byte_queue_file import ByteQueueFile
+from catalog import fetch_concurrently
 
 TTS_CHUNK_SIZE = 1024
 VOICES_V1_URL = "https://api.play.ht/api/v1/getVoices"
@@ -15,10 +17,21 @@ class PlayHTProvider(TTSProvider):
         self.client = None
         self.model_names = [ 'PlayHT2.0-turbo', 'PlayHT2.0', 'PlayHT1.0', 'Standard' ]
         self.voices = []
+        self.client_lock = threading.Lock()
 
     def init(self):
-        if not self.client:
-            self.client = Client(os.environ['PLAY_HT_USER_ID'], os.environ['PLAY_HT_API_KEY'])
+        with self.client_lock:
+            if not self.client:
+                self.client = Client(os.environ['PLAY_HT_USER_ID'], os.environ['PLAY_HT_API_KEY'])
+
+    def prewarm(self):
+        # the gRPC client fetches its lease and opens its channel on creation, not over http_transport
+        def run():
+            try:
+                self.init()
+            except Exception as e:
+                utils.print_verbose('Prewarm', f'Failed for {self.name()}: {e}')
+        threading.Thread(target=run, name='prewarm', daemon=True).start()
 
     def name(self):
         return 'playht'
@@ -44,6 +57,10 @@ class PlayHTProvider(TTSProvider):
     def max_length(self):
         return 5000
 
+    def catalog_ttl(self):
+        # the voice list is large and changes rarely
+        return 7 * 24 * 60 * 60
+
     def _list_models(self):
         return self.model_names
 
@@ -72,11 +89,19 @@ class PlayHTProvider(TTSProvider):
             id_set = set()
             name_set = set()
             try:
-                for voice in requests.get(VOICES_V2_URL, headers=headers).json():
+                # both endpoints are requested at the same time
+                v2_voices, v1_voices = fetch_concurrently([
+                    lambda: requests.get(VOICES_V2_URL, headers=headers).json(),
+                    lambda: requests.get(VOICES_V1_URL, headers=headers).json().get('voices', []),
+                ])
+                if v2_voices is None or v1_voices is None:
+                    # an incomplete list would replace the last good copy in the catalog
+                    raise Exception('request failed')
+                for voice in v2_voices:
                     ok, id, name = self._generate_id_and_name(id_set=id_set, name_set=name_set, dict=voice, id_key='id', lang_key='language_code', name_key='name', style_key='style', name_keys=[ 'voice_engine' ])
                     if not ok: continue
                     self.voices.append(f'{id}\t{name}')
-                for voice in requests.get(VOICES_V1_URL, headers=headers).json().get('voices', []):
+                for voice in v1_voices:
                     suffix = None
                     if self._has_attribute(voice, 'isNew'): suffix = 'new'
                     ok, id, name = self._generate_id_and_name(id_set=id_set, name_set=name_set, dict=voice, id_key='value', lang_key='languageCode', name_key='name', style_key=None, name_keys=[ 'voiceType', 'service' ], suffix=suffix)
@@ -159,7 +184,7 @@ class PlayHTProvider(TTSProvider):
                 if chunk:
                     f.write(chunk)
 
-    def text_to_speech_stream(self, text, model, voice_id, speed, virtual_audio_file: ByteQueueFile):
+    def text_to_speech_stream(self, text, model, voice_id, speed, virtual_audio_file: ByteQueueFile, audio_format=None):
         response = self.get_response(text, model, voice_id, speed)
         for chunk in response:
             virtual_audio_file.write(chunk)
@@ -31,12 +31,21 @@ class PrintTTSProvider(TTSProvider):
     def max_length(self):
         return 4096
 
+    def max_concurrency(self):
+        return 1
+
     def default_voice(self):
         return self.voice[0]
 
     def default_model(self):
         return self.model_names[0]
 
+    def allows_audio_caching(self):
+        return False
+
+    def produces_audio(self):
+        return False
+
     def _list_models(self):
         return self.model_names
 
@@ -51,6 +60,6 @@ class PrintTTSProvider(TTSProvider):
         if audio_file is not None and os.path.exists(audio_file):
             os.remove(audio_file)
 
-    def text_to_speech_stream(self, text, model, voice_id, speed, virtual_audio_file: ByteQueueFile):
+    def text_to_speech_stream(self, text, model, voice_id, speed, virtual_audio_file: ByteQueueFile, audio_format=None):
         print(f'({len(text)}): {text}')
         virtual_audio_file.close()
\ No newline at end of file
@@ -0,0 +1,104 @@
+import importlib
+import threading
+import utils
+from catalog import get_catalog, fetch_concurrently
+from tracing import get_tracer
+
+# seconds until the model to provider index is rebuilt, which imports all providers
+INDEX_TTL = 24 * 60 * 60
+
+class ProviderDescriptor:
+    def __init__(self, name, module_name, class_name):
+        self.name = name
+        self.module_name = module_name
+        self.class_name = class_name
+
+    def create(self):
+        module = importlib.import_module(self.module_name)
+        return getattr(module, self.class_name)()
+
+class ProviderRegistry:
+    def __init__(self, kind, descriptors, cache_directory_path):
+        self.kind = kind
+        self.descriptors = list(descriptors)
+        self.cache_directory_path = cache_directory_path
+        self.providers = {}
+        self.index = None
+        # called with the model list whenever the index was rebuilt
+        self.index_listener = None
+        # the daemon looks up providers from several request threads, the index is
+        # protected by the catalog, which may also rebuild it in the background
+        self.lock = threading.RLock()
+
+    def get_provider(self, name):
+        with self.lock:
+            provider = self.providers.get(name)
+            if provider is None:
+                descriptor = next((d for d in self.descriptors if d.name == name), None)
+                if descriptor is None:
+                    raise KeyError(f'Unknown {self.kind} provider: {name}')
+                utils.print_verbose('Import', descriptor.module_name)
+                with get_tracer().span(f'create {name}', 'provider'):
+                    provider = descriptor.create()
+                self.providers[name] = provider
+            return provider
+
+    def get_default_provider(self):
+        return self.get_provider(self.descriptors[0].name)
+
+    def get_provider_for_model(self, model):
+        name = self._load_index().get(model)
+        if name is None:
+            # model may be new, rebuild the index once before giving up
+            name = self._build_index().get(model)
+        if name is None:
+            return None
+        return self.get_provider(name)
+
+    def list_models(self):
+        return list(self._load_index().keys())
+
+    def created_providers(self):
+        return list(self.providers.values())
+
+    def close(self):
+        for provider in self.created_providers():
+            try:
+                provider.close()
+            except Exception as e:
+                utils.print_error(f'Failed to close {self.kind} provider', provider.name(), ':', e)
+        self.providers = {}
+
+    def _load_index(self):
+        if self.index is None:
+            catalog = get_catalog(self.cache_directory_path)
+            self.index = self._parse_index(catalog.get(self.kind, 'index', self._fetch_index, INDEX_TTL, self._index_updated))
+        return self.index
+
+    def _build_index(self):
+        catalog = get_catalog(self.cache_directory_path)
+        self.index = self._parse_index(catalog.refresh(self.kind, 'index', self._fetch_index, self._index_updated))
+        return self.index
+
+    def _fetch_index(self):
+        # the model lists of all providers are fetched at the same time
+        names = [ descriptor.name for descriptor in self.descriptors ]
+        model_lists = fetch_concurrently([ lambda name=name: self.get_provider(name).list_models(self.cache_directory_path) for name in names ])
+        items = []
+        for name, models in zip(names, model_lists):
+            if models is None:
+                utils.print_error(f'Failed to list models of {self.kind} provider', name)
+                # keep what the last index knew about this provider
+                models = [ model for model, provider_name in (self.index or {}).items() if provider_name == name ]
+            items.extend(f'{model}\t{name}' for model in models)
+        return items
+
+    def _parse_index(self, items):
+        return dict(item.split('\t', 1) for item in items if '\t' in item)
+
+    def _index_updated(self, items):
+        # may be called from a background refresh
+        index = self._parse_index(items)
+        self.index = index
+        if self.index_listener:
+            self.index_listener(list(index.keys()))
@@ -0,0 +1,133 @@
+import json
+from collections import OrderedDict
+from ai_provider import AIProvider
+from disk_cache import DiskCache
+
+class CachedResponse:
+    # replays a cached answer chunk by chunk, like a streamed response
+    def __init__(self, entry):
+        self.entry = entry
+
+    def __iter__(self):
+        for text in self.entry.get('chunks', []):
+            yield CachedChunk(self, text)
+
+class CachedChunk:
+    def __init__(self, response, text):
+        self.response = response
+        self.text = text
+
+class RecordingResponse:
+    # passes a live response through and stores it once it was read completely
+    def __init__(self, cache, key, result):
+        self.cache = cache
+        self.key = key
+        self.result = result
+        self.chunks = []
+        self.sources = None
+        self.metadata = OrderedDict()
+
+    def record_metadata(self, handle_metadata_func):
+        def handle(name, value):
+            self.metadata[name] = value
+            if handle_metadata_func:
+                handle_metadata_func(name, value)
+        return handle
+
+    def __iter__(self):
+        for chunk in self.result:
+            yield RecordedChunk(self, chunk)
+        self.save()
+
+    def save(self):
+        entry = {
+            'chunks': self.chunks,
+            'sources': list(self.sources.items()) if self.sources else [],
+            'metadata': list(self.metadata.items()),
+        }
+        self.cache.put(self.key, json.dumps(entry).encode('utf-8'))
+
+class RecordedChunk:
+    def __init__(self, response, chunk):
+        self.response = response
+        self.chunk = chunk
+
+class CachedAIProvider(AIProvider):
+    def __init__(self, provider, cache_directory_path, max_bytes, ttl_seconds):
+        self.provider = provider
+        self.cache = DiskCache(cache_directory_path, max_bytes, ttl_seconds)
+
+    def name(self):
+        return self.provider.name()
+
+    def supports_sessions(self):
+        return self.provider.supports_sessions()
+
+    def context_tokens(self, model):
+        return self.provider.context_tokens(model)
+
+    def warm_up(self):
+        self.provider.warm_up()
+
+    def max_concurrency(self):
+        return self.provider.max_concurrency()
+
+    def catalog_ttl(self):
+        return self.provider.catalog_ttl()
+
+    def request_parameters(self, model):
+        return self.provider.request_parameters(model)
+
+    def _list_models(self):
+        return self.provider._list_models()
+
+    def list_models(self, cache_directory_path):
+        return self.provider.list_models(cache_directory_path)
+
+    def chat_completion(self, messages, model, stream=False):
+        # everything which changes the answer
+        key = DiskCache.key(self.provider.name(), model, stream, self.provider.request_parameters(model), messages)
+        data = self.cache.get(key)
+        if data is not None:
+            return CachedResponse(json.loads(data))
+        return RecordingResponse(self.cache, key, self.provider.chat_completion(messages, model, stream))
+
+    def _replay_sources_and_metadata(self, entry, sources, handle_metadata_func):
+        if sources is not None:
+            for url, title in entry.get('sources', []):
+                if url not in sources:
+                    sources[url] = title
+        if handle_metadata_func:
+            for name, value in entry.get('metadata', []):
+                handle_metadata_func(name, value)
+
+    def convert_result_to_text(self, result, sources, handle_metadata_func):
+        if isinstance(result, CachedResponse):
+            self._replay_sources_and_metadata(result.entry, sources, handle_metadata_func)
+            return ''.join(c for c in result.entry.get('chunks', []) if c)
+
+        text = self.provider.convert_result_to_text(result.result, sources, result.record_metadata(handle_metadata_func))
+        result.chunks = [text]
+        result.sources = sources
+        result.save()
+        return text
+
+    def convert_chunk_to_text(self, chunk, text_chunks, sources, handle_metadata_func):
+        if isinstance(chunk, CachedChunk):
+            if not text_chunks:
+                # sources and metadata are replayed with the first chunk
+                self._replay_sources_and_metadata(chunk.response.entry, sources, handle_metadata_func)
+            text_chunks.append(chunk.text)
+            return chunk.text
+
+        response = chunk.response
+        text = self.provider.convert_chunk_to_text(chunk.chunk, text_chunks, sources, response.record_metadata(handle_metadata_func))
+        response.chunks.append(text)
+        response.sources = sources
+        return text
+
+    def remove_source_references(self, text):
+        return self.provider.remove_source_references(text)
+
+    def close(self):
+        self.provider.close()
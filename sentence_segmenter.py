@@ -0,0 +1,144 @@
+import functools
+import re
+import sys
+
+MIN_SENTENCE_LENGTH = 50
+MAX_SENTENCE_LENGTH = 1000
+
+# a boundary is at most a character, three punctuation marks and a space long
+BOUNDARY_LENGTH = 5
+
+SENTENCE_END_PATTERN = re.compile(r'[^0-9][.!?]{1,3}\s')
+
+@functools.lru_cache(maxsize=32)
+def get_sentence_patterns(min_len, max_len):
+    return (
+        re.compile(rf'^.{{{min_len},{max_len}}}[^0-9](?:[.!?]{{1,3}})(?:\s|$)', re.DOTALL),
+        re.compile(rf'^.{{{min_len},{max_len}}}[^0-9](?:[-—,;:])(?:\s|$)', re.DOTALL),
+        re.compile(rf'^.{{{min_len},{max_len}}}\n', re.DOTALL),
+        re.compile(rf'^.{{{min_len},{max_len}}}\s', re.DOTALL),
+    )
+
+def find_segment_end(text, min_len, max_len):
+    text_len = len(text)
+
+    if text_len <= max_len:
+        # just return the whole text if it's shorter than max_len
+        segment_end = text_len
+    else:
+        # no match can end after max_len + BOUNDARY_LENGTH, so only look at that window
+        window = text[:max_len + BOUNDARY_LENGTH + 1]
+        match = None
+        # try sentence end, then other punctuation, then new line or resort to a space
+        for pattern in get_sentence_patterns(min_len, max_len):
+            match = pattern.search(window)
+            if match:
+                break
+
+        if match:
+            segment_end = match.end()
+        else:
+            # as a last resort, just take the last max_len characters
+            print(f'WARNING: Unable to extract sentence, will split text at {max_len} characters', file=sys.stderr, flush=True)
+            segment_end = max_len
+
+    return segment_end
+
+def extract_sentence(text, min_len=MIN_SENTENCE_LENGTH, max_len=MAX_SENTENCE_LENGTH) -> tuple[str, str] | None:
+    segment_end = find_segment_end(text, min_len, max_len)
+    segment = text[:segment_end].strip()
+    remainder = text[segment_end:].strip()
+    return segment, remainder
+
+def split_sentences(text, min_len=MIN_SENTENCE_LENGTH, max_len=MAX_SENTENCE_LENGTH):
+    sentences = []
+    while len(text) > 0:
+        sentence, text = extract_sentence(text, min_len=min_len, max_len=max_len)
+        sentences.append(sentence)
+    return sentences
+
+def pack_sentences(text, max_len, min_len=MIN_SENTENCE_LENGTH, count=1):
+    # joins whole sentences into chunks of at most max_len characters, e.g. one TTS request each,
+    # with count > 1 the text is spread over about that many chunks of similar length
+    chunks = []
+    chunk = ''
+    # a sentence may end up to BOUNDARY_LENGTH characters after the max_len passed to split_sentences,
+    # which takes the last sentence end within it, smaller pieces balance the chunks better
+    piece_len = min(MAX_SENTENCE_LENGTH, max_len - BOUNDARY_LENGTH, max(2 * min_len, len(text) // (4 * count)))
+    sentences = split_sentences(text, min_len=min_len, max_len=piece_len)
+    share = sum(len(sentence) + 1 for sentence in sentences) / count
+    position = 0
+    for sentence in sentences:
+        # a sentence goes to the chunk its middle falls into
+        past_share = position + len(sentence) / 2 > share * (len(chunks) + 1)
+        if chunk and (past_share or len(chunk) + 1 + len(sentence) > max_len):
+            chunks.append(chunk)
+            chunk = sentence
+        else:
+            chunk = f'{chunk} {sentence}' if chunk else sentence
+        position += len(sentence) + 1
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+class SentenceSegmenter:
+    # fed with streamed text, emits a segment as soon as a sentence end after min_len is confirmed,
+    # only text added since the last call is scanned
+
+    def __init__(self, min_len=MIN_SENTENCE_LENGTH, max_len=MAX_SENTENCE_LENGTH, first_max_len=None):
+        self.min_len = min_len
+        self.max_len = max_len
+        self.first_max_len = first_max_len
+        self.buffer = ''
+        self.scan_position = 0
+        self.count = 0
+
+    def _current_max_len(self):
+        if self.count == 0 and self.first_max_len:
+            return self.first_max_len
+        return self.max_len
+
+    def feed(self, text):
+        segments = []
+        if not text:
+            return segments
+        self.buffer += text
+        if self.buffer[:1].isspace():
+            # segments never start with whitespace, same as after extract_sentence
+            self.buffer = self.buffer.lstrip()
+            self.scan_position = 0
+        while True:
+            segment = self._next_segment()
+            if segment is None:
+                break
+            if segment:
+                segments.append(segment)
+        return segments
+
+    def _next_segment(self):
+        max_len = self._current_max_len()
+        match = SENTENCE_END_PATTERN.search(self.buffer, max(self.scan_position, self.min_len))
+        if match and match.start() <= max_len:
+            segment_end = match.end()
+        elif len(self.buffer) > max_len + BOUNDARY_LENGTH:
+            # no sentence end within max_len, split like extract_sentence
+            segment_end = find_segment_end(self.buffer, self.min_len, max_len)
+        else:
+            # the next boundary can start at most BOUNDARY_LENGTH characters before the end
+            self.scan_position = max(self.min_len, len(self.buffer) - BOUNDARY_LENGTH + 1)
+            return None
+        return self._emit(segment_end)
+
+    def _emit(self, segment_end):
+        segment = self.buffer[:segment_end].strip()
+        self.buffer = self.buffer[segment_end:].lstrip()
+        self.scan_position = 0
+        self.count += 1
+        return segment
+
+    def flush(self):
+        # returns the remaining text, the segmenter can be reused afterwards
+        remainder = self.buffer
+        self.buffer = ''
+        self.scan_position = 0
+        return remainder
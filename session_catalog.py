@@ -0,0 +1,81 @@
+import json
+import os
+import sqlite3
+import time
+
+SESSION_CATALOG_FILE = 'sessions.db'
+
+class SessionCatalog:
+    def __init__(self, session_folder):
+        self.path = os.path.join(session_folder, SESSION_CATALOG_FILE)
+        self.connection = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, timeout=10)
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    name TEXT PRIMARY KEY,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    first_prompt TEXT NOT NULL DEFAULT '',
+                    message_count INTEGER NOT NULL DEFAULT 0,
+                    byte_size INTEGER NOT NULL DEFAULT 0
+                )''')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS sessions_created ON sessions (created)')
+        return self.connection
+
+    def append(self, name, messages, byte_size, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        first_prompt = get_first_prompt(messages)
+        with self._connect() as connection:
+            connection.execute('''
+                INSERT INTO sessions (name, created, updated, first_prompt, message_count, byte_size)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    updated = excluded.updated,
+                    first_prompt = CASE WHEN first_prompt = '' THEN excluded.first_prompt ELSE first_prompt END,
+                    message_count = message_count + excluded.message_count,
+                    byte_size = excluded.byte_size
+                ''', (name, timestamp, timestamp, first_prompt, len(messages), byte_size))
+
+    def list(self):
+        cursor = self._connect().execute('SELECT name, first_prompt FROM sessions ORDER BY created')
+        return cursor.fetchall()
+
+    def names(self):
+        cursor = self._connect().execute('SELECT name FROM sessions ORDER BY created')
+        return [row[0] for row in cursor.fetchall()]
+
+    def rebuild(self, session_files):
+        rows = []
+        for name, file_path in session_files:
+            messages = []
+            with open(file_path, 'r') as f:
+                for line in f:
+                    try:
+                        messages.append(json.loads(line))
+                    except:
+                        continue
+            stat = os.stat(file_path)
+            rows.append((name, stat.st_ctime, stat.st_mtime, get_first_prompt(messages), len(messages), stat.st_size))
+
+        with self._connect() as connection:
+            connection.execute('DELETE FROM sessions')
+            connection.executemany('INSERT INTO sessions (name, created, updated, first_prompt, message_count, byte_size) VALUES (?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+def get_first_prompt(messages):
+    for message in messages:
+        if message.get('role', '') == 'user':
+            return message.get('content', '')
+    return ''
@@ -0,0 +1,173 @@
+import json
+import os
+from utils import write_atomically
+
+# rough estimate without a tokenizer, ~4 characters per token plus message overhead
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# leave room for the answer
+CONTEXT_BUDGET_RATIO = 0.75
+
+TOKENS_KEY = '_tokens'
+
+# room kept in the budget for the summary of older messages
+SUMMARY_TOKENS = 256
+SUMMARY_PREFIX = 'Summary of the earlier conversation: '
+
+SUMMARY_PROMPT = 'Summarize the following conversation in a few sentences. Keep facts, names, numbers and decisions which might be needed to continue the conversation.'
+
+def estimate_tokens(message):
+    content = message.get('content', '')
+    if not isinstance(content, str):
+        content = json.dumps(content)
+    return MESSAGE_OVERHEAD_TOKENS + (len(content) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def get_tokens(message):
+    tokens = message.get(TOKENS_KEY)
+    if tokens is None:
+        tokens = estimate_tokens(message)
+    return tokens
+
+def with_tokens(message):
+    if TOKENS_KEY in message:
+        return message
+    result = dict(message)
+    result[TOKENS_KEY] = estimate_tokens(message)
+    return result
+
+def without_tokens(message):
+    if TOKENS_KEY not in message:
+        return message
+    result = dict(message)
+    del result[TOKENS_KEY]
+    return result
+
+def with_summary(system_message, summary):
+    # some providers only take one system message, so the summary follows the role in it
+    content = f'{SUMMARY_PREFIX}{summary}'
+    if system_message:
+        content = f'{system_message["content"]}\n\n{content}'
+    return {'role': 'system', 'content': content}
+
+def read_lines_reversed(file_path, block_size=65536):
+    # yields (offset, line) from the end of the file
+    with open(file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b''
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size) + remainder
+            lines = block.split(b'\n')
+            remainder = lines.pop(0)
+            end = position + len(block)
+            for line in reversed(lines):
+                start = end - len(line)
+                if line.strip():
+                    yield start, line
+                end = start - 1
+        if remainder.strip():
+            yield 0, remainder
+
+def read_messages(file_path, start=0, end=None):
+    messages = []
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        data = f.read() if end is None else f.read(end - start)
+    for line in data.splitlines():
+        if line.strip():
+            messages.append(json.loads(line))
+    return messages
+
+class SessionContext:
+    def __init__(self, session_path, summary_path=None):
+        self.session_path = session_path
+        self.summary_path = summary_path
+        self._system_message = None
+        self._system_message_loaded = False
+
+    def exists(self):
+        return os.path.exists(self.session_path)
+
+    def system_message(self):
+        if not self._system_message_loaded:
+            self._system_message_loaded = True
+            if self.exists():
+                # the role is stored as the first message of a session
+                with open(self.session_path, 'rb') as f:
+                    line = f.readline()
+                if line.strip():
+                    message = json.loads(line)
+                    if message.get('role', '') == 'system':
+                        self._system_message = without_tokens(message)
+        return self._system_message
+
+    def load(self, budget):
+        # returns the newest messages which fit the token budget and the file offset where they start,
+        # the system message isn't included, it is sent with the request and counted by the caller
+        if not self.exists():
+            return [], 0
+
+        messages = []
+        dropped = False
+        end = os.path.getsize(self.session_path)
+        for offset, line in read_lines_reversed(self.session_path):
+            message = json.loads(line)
+            if message.get('role', '') == 'system':
+                continue
+            tokens = get_tokens(message)
+            if tokens > budget:
+                dropped = True
+                break
+            budget -= tokens
+            messages.append((offset, without_tokens(message)))
+        messages.reverse()
+
+        # the conversation must start with a user message
+        while messages and messages[0][1].get('role', '') != 'user':
+            messages.pop(0)
+            dropped = True
+
+        cut = 0
+        if dropped:
+            cut = messages[0][0] if messages else end
+        return [m for _, m in messages], cut
+
+    def summarize(self, cut, summarize_func):
+        # returns a rolling summary of all messages before cut, cached in summary_path
+        if cut <= 0 or not self.summary_path:
+            return None
+
+        cached = None
+        if os.path.exists(self.summary_path):
+            try:
+                with open(self.summary_path, 'r') as f:
+                    cached = json.load(f)
+            except ValueError:
+                cached = None
+
+        start = 0
+        previous_summary = None
+        if cached and cached.get('offset', 0) <= cut:
+            if cached.get('offset') == cut:
+                return cached.get('summary')
+            start = cached.get('offset', 0)
+            previous_summary = cached.get('summary')
+
+        messages = [without_tokens(m) for m in read_messages(self.session_path, start, cut) if m.get('role', '') != 'system']
+        if not messages:
+            return previous_summary
+
+        lines = []
+        if previous_summary:
+            lines.append(f'Summary so far: {previous_summary}')
+        for message in messages:
+            lines.append(f"{message.get('role', '')}: {message.get('content', '')}")
+        summary = summarize_func(SUMMARY_PROMPT, '\n\n'.join(lines))
+
+        if summary:
+            write_atomically(self.summary_path, json.dumps({'offset': cut, 'summary': summary}))
+        return summary
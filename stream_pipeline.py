@@ -0,0 +1,319 @@
+import asyncio
+import time
+import utils
+from utils import print_verbose
+from utils import print_error
+from tracing import get_tracer
+
+# marks the end of the stream in the queues
+END = object()
+
+TEXT_QUEUE_SIZE = 256
+
+class StageStats:
+    def __init__(self, name, queue=None):
+        self.name = name
+        self.queue = queue
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.max_latency = 0.0
+        self.max_depth = 0
+
+    def queued(self):
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def record(self, start):
+        latency = time.perf_counter() - start
+        self.items += 1
+        self.busy_seconds += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def depth(self):
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def __str__(self):
+        average = self.busy_seconds * 1000 / self.items if self.items else 0
+        text = f'{self.items} items, {average:.1f} ms avg, {self.max_latency * 1000:.1f} ms max'
+        if self.queue is not None:
+            text += f', queue {self.depth()}/{self.queue.maxsize} (max {self.max_depth})'
+        return text
+
+class AudioSegment:
+    def __init__(self, index, text, target):
+        self.index = index
+        self.text = text
+        self.target = target
+        self.task = None
+        # the call of synthesize_func, which may outlive task
+        self.synthesis = None
+        self.played = None
+
+class StreamPipeline:
+    # LLM stream -> console
+    #            -> segmenter -> normalizer -> TTS -> playback
+    # every stage is a task reading from a bounded queue, a slow stage only holds back the stages feeding it,
+    # blocking work runs on worker threads so the LLM stream keeps being read
+
+    def __init__(self, chunks, write_func, segmenter=None, normalize_func=None, synthesize_func=None, create_target_func=None, play_func=None,
+                 max_workers=2, lookahead=3, segment_timeout=None, wait_for_synthesis=False, discard_func=None):
+        # chunks: async iterator of answer text
+        # normalize_func(text, last): sentences to speak, last is set for the remainder at the end of the stream
+        # synthesize_func(text, target): coroutine writing the audio of text to target
+        # play_func(target, on_done): plays target, on_done is called from any thread once it was played
+        # discard_func(target): removes the target of a segment which timed out, once its synthesis returned
+        self.chunks = chunks
+        self.write_func = write_func
+        self.segmenter = segmenter
+        self.normalize_func = normalize_func
+        self.synthesize_func = synthesize_func
+        self.create_target_func = create_target_func
+        self.play_func = play_func
+        self.discard_func = discard_func
+        self.max_workers = max(1, max_workers)
+        self.lookahead = max(1, lookahead)
+        self.segment_timeout = segment_timeout
+        # files are only complete once synthesized, streams are played while synthesizing
+        self.wait_for_synthesis = wait_for_synthesis
+        self.answer = ''
+        self.segments = []
+        self.stats = {}
+        self.queues = {}
+
+    def audio(self):
+        return self.segmenter is not None
+
+    def create_queue(self, name, maxsize):
+        queue = asyncio.Queue(maxsize=maxsize)
+        self.queues[name] = queue
+        self.stats[name] = StageStats(name, queue)
+        return queue
+
+    async def put(self, name, item):
+        queue = self.queues[name]
+        await queue.put(item)
+        self.stats[name].queued()
+
+    async def run_blocking(self, func, *args):
+        return await asyncio.to_thread(self.thread_state_func(func), *args)
+
+    def thread_state_func(self, func):
+        state = self.thread_state
+        def run(*args):
+            utils.apply_thread_state(state)
+            return func(*args)
+        return run
+
+    async def run(self, on_text_done=None):
+        # returns the answer once everything was written and played, on_text_done(answer) is called in between
+        self.loop = asyncio.get_running_loop()
+        self.thread_state = utils.capture_thread_state()
+        self.tracer = get_tracer()
+        self.stats['llm'] = StageStats('llm')
+        self.create_queue('console', TEXT_QUEUE_SIZE)
+        text_tasks = [ asyncio.create_task(self.read()), asyncio.create_task(self.write()) ]
+        audio_tasks = []
+        if self.audio():
+            self.window = asyncio.Semaphore(self.lookahead)
+            self.workers = asyncio.Semaphore(self.max_workers)
+            self.create_queue('segmenter', TEXT_QUEUE_SIZE)
+            self.create_queue('normalizer', self.lookahead)
+            self.create_queue('tts', self.lookahead)
+            self.create_queue('playback', self.lookahead)
+            audio_tasks = [ asyncio.create_task(stage()) for stage in [ self.segment, self.normalize, self.synthesize, self.play ] ]
+
+        self.tasks = text_tasks + audio_tasks
+        self.error = None
+        for task in self.tasks:
+            task.add_done_callback(self.stage_done)
+
+        try:
+            await asyncio.gather(*text_tasks)
+            if on_text_done:
+                await self.run_blocking(on_text_done, self.answer)
+            await asyncio.gather(*audio_tasks)
+            await asyncio.gather(*[ segment.played for segment in self.segments ])
+            return self.answer
+        except BaseException as e:
+            self.cancel()
+            if self.error is not None and isinstance(e, asyncio.CancelledError):
+                # cancelled because a stage failed
+                raise self.error from None
+            raise
+        finally:
+            for name, stats in self.stats.items():
+                print_verbose('Pipeline', f'{name}: {stats}')
+
+    def wake(self):
+        # from any thread, lets the loop run Python code, e.g. to raise the KeyboardInterrupt of a cancelled request
+        try:
+            self.loop.call_soon_threadsafe(lambda: None)
+        except (AttributeError, RuntimeError):
+            # not running (anymore)
+            pass
+
+    def stage_done(self, task):
+        # a failed stage stops the others, nothing would drain their queues anymore
+        if not task.cancelled() and task.exception() is not None:
+            if self.error is None:
+                self.error = task.exception()
+            self.cancel()
+
+    def cancel(self):
+        for task in self.tasks:
+            task.cancel()
+        for segment in self.segments:
+            if segment.task is not None:
+                segment.task.cancel()
+            if segment.synthesis is not None:
+                segment.synthesis.cancel()
+            if segment.played is None or not segment.played.done():
+                # synthesis threads can't be cancelled, make their writes fail instead
+                abort = getattr(segment.target, 'abort', None)
+                if abort:
+                    abort()
+
+    async def read(self):
+        stats = self.stats['llm']
+        start = time.perf_counter()
+        async for text in self.chunks:
+            stats.record(start)
+            self.answer += text
+            await self.put('console', text)
+            if self.audio():
+                await self.put('segmenter', text)
+            start = time.perf_counter()
+        await self.put('console', END)
+        if self.audio():
+            await self.put('segmenter', END)
+
+    async def write(self):
+        queue = self.queues['console']
+        stats = self.stats['console']
+        done = False
+        while not done:
+            texts = [ await queue.get() ]
+            # whatever piled up while the console was busy is written at once
+            while not queue.empty():
+                texts.append(queue.get_nowait())
+            if texts[-1] is END:
+                done = True
+                texts.pop()
+            if texts:
+                start = time.perf_counter()
+                await self.run_blocking(self.write_func, ''.join(texts))
+                stats.record(start)
+
+    async def segment(self):
+        queue = self.queues['segmenter']
+        stats = self.stats['segmenter']
+        # a segment is extracted from its first text until its end was found
+        count = 0
+        first_text = None
+        while True:
+            text = await queue.get()
+            start = time.perf_counter()
+            if first_text is None:
+                first_text = start
+            if text is END:
+                self.tracer.complete(f'extract #{count}', 'segment', first_text)
+                await self.put('normalizer', (self.segmenter.flush(), True))
+                await self.put('normalizer', END)
+                break
+            for sentence in self.segmenter.feed(text):
+                self.tracer.complete(f'extract #{count}', 'segment', first_text, text=sentence)
+                count += 1
+                # the rest of the chunk starts the next one
+                first_text = start
+                await self.put('normalizer', (sentence, False))
+            stats.record(start)
+
+    async def normalize(self):
+        queue = self.queues['normalizer']
+        stats = self.stats['normalizer']
+        while True:
+            item = await queue.get()
+            if item is END:
+                await self.put('tts', END)
+                break
+            start = time.perf_counter()
+            sentences = await self.run_blocking(self.normalize_func, *item)
+            stats.record(start)
+            self.tracer.complete('normalize', 'segment', start, text=item[0])
+            for sentence in sentences:
+                await self.put('tts', sentence)
+
+    async def synthesize(self):
+        queue = self.queues['tts']
+        while True:
+            text = await queue.get()
+            if text is END:
+                await self.put('playback', END)
+                break
+            # at most lookahead segments ahead of playback
+            await self.window.acquire()
+            segment = AudioSegment(len(self.segments), text, self.create_target_func())
+            segment.played = self.loop.create_future()
+            self.segments.append(segment)
+            segment.task = asyncio.create_task(self.synthesize_segment(segment))
+            await self.put('playback', segment)
+
+    async def synthesize_segment(self, segment):
+        async with self.workers:
+            start = time.perf_counter()
+            segment.synthesis = asyncio.ensure_future(self.synthesize_func(segment.text, segment.target))
+            # a timeout cancels the task but leaves the synthesis running, see discard
+            await asyncio.shield(segment.synthesis)
+            self.stats['tts'].record(start)
+            self.tracer.complete(f'tts #{segment.index}', 'tts', start, text=segment.text)
+
+    async def play(self):
+        queue = self.queues['playback']
+        while True:
+            segment = await queue.get()
+            if segment is END:
+                break
+            if self.wait_for_synthesis:
+                try:
+                    await asyncio.wait_for(asyncio.shield(segment.task), self.segment_timeout)
+                except asyncio.TimeoutError:
+                    print_error(f"TTS segment {segment.index} timed out after {self.segment_timeout}s, skipping:", segment.text)
+                    self.discard(segment)
+                    self.segment_played(segment, None)
+                    continue
+            start = time.perf_counter()
+            await self.run_blocking(self.play_func, segment.target, self.on_done_func(segment, start))
+
+    def discard(self, segment):
+        # the segment no longer holds a worker, its target is only removed once the synthesis returned,
+        # a synthesis thread would write it again otherwise
+        segment.task.cancel()
+        abort = getattr(segment.target, 'abort', None)
+        if abort:
+            abort()
+        if segment.synthesis is None or segment.synthesis.done():
+            self.discard_target(segment, segment.synthesis)
+        else:
+            segment.synthesis.add_done_callback(lambda synthesis: self.discard_target(segment, synthesis))
+
+    def discard_target(self, segment, synthesis):
+        if synthesis is not None and not synthesis.cancelled() and synthesis.exception() is not None:
+            print_verbose('Pipeline', f'TTS segment {segment.index} failed after its timeout: {synthesis.exception()}')
+        if self.discard_func:
+            self.discard_func(segment.target)
+
+    def on_done_func(self, segment, start):
+        def on_done():
+            try:
+                self.loop.call_soon_threadsafe(self.segment_played, segment, start)
+            except RuntimeError:
+                # the pipeline is gone
+                pass
+        return on_done
+
+    def segment_played(self, segment, start):
+        if segment.played.done():
+            return
+        if start is not None:
+            self.stats['playback'].record(start)
+        segment.played.set_result(None)
+        self.window.release()
@@ -1,4 +1,6 @@
 import utils
+import http_transport
+from provider_registry import ProviderDescriptor, ProviderRegistry
 from abc import ABC, abstractmethod
 
 class STTProvider(ABC):
@@ -11,15 +13,29 @@ class STTProvider(ABC):
     def _list_models(self):
         pass
 
+    def catalog_ttl(self):
+        # seconds until the model list is refreshed
+        return 24 * 60 * 60
+
+    def endpoint(self):
+        # base URL of the API, None if the provider doesn't talk HTTP through http_transport
+        return None
+
+    def prewarm(self):
+        endpoint = self.endpoint()
+        if endpoint:
+            http_transport.prewarm(endpoint)
+
     def list_models(self, cache_directory_path):
-        return utils.list_models(self.name(), self._list_models, True, cache_directory_path)
+        return utils.list_models(self.name(), self._list_models, True, cache_directory_path, self.catalog_ttl())
 
     @abstractmethod
     def speech_to_text(self, model, audio_file):
         pass
 
-def get_stt_providers():
-    providers = []
-    from openai_stt_provider import OpenAISTTProvider
-    providers.append(OpenAISTTProvider())
-    return providers
\ No newline at end of file
+STT_PROVIDERS = [
+    ProviderDescriptor('openai-whisper', 'openai_stt_provider', 'OpenAISTTProvider'),
+]
+
+def get_stt_providers(cache_directory_path):
+    return ProviderRegistry('stt', STT_PROVIDERS, cache_directory_path)
\ No newline at end of file
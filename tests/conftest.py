@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+AI_CLI = os.path.join(ROOT, 'ai-cli')
+
+def seed_catalog(home):
+    # the model index and voice lists, so no run imports every provider or asks the real APIs
+    folder = os.path.join(home, '.cache', 'ai-cli')
+    os.makedirs(folder, exist_ok=True)
+    files = {
+        'ai.index': [ 'passthrough\tpassthrough', 'gpt-4o\topenai', 'claude-3-5-sonnet-latest\tanthropic' ],
+        'tts.index': [ 'tts-1\topenai-tts', 'printer\tprinter' ],
+        'passthrough.models': [ 'passthrough' ],
+        'openai.models': [ 'gpt-4o' ],
+        'anthropic.models': [ 'claude-3-5-sonnet-latest' ],
+        'openai-tts.models': [ 'tts-1' ],
+        'printer.models': [ 'printer' ],
+    }
+    for name, items in files.items():
+        with open(os.path.join(folder, name), 'w') as f:
+            f.write('\n'.join(items))
+
+@pytest.fixture
+def home(tmp_path):
+    seed_catalog(str(tmp_path))
+    return str(tmp_path)
+
+def run_cli(home, arguments, input=None, python_options=(), timeout=60, environment=None):
+    environment = dict(os.environ, HOME=home, **(environment or {}))
+    return subprocess.run([ sys.executable, *python_options, AI_CLI, *arguments ], env=environment, cwd=home,
+                          input=input, capture_output=True, text=True, timeout=timeout)
+
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+@pytest.fixture
+def standin():
+    # local stand-ins of the provider APIs, answering without delay
+    from standin_servers import StandinServer, StandinConfig
+    server = StandinServer(StandinConfig(latency_ms=0, jitter_ms=0, tokens_per_second=0, audio_latency_ms=0, audio_realtime_factor=1000)).start()
+    yield server
+    server.shutdown()
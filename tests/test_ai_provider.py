@@ -0,0 +1,65 @@
+import asyncio
+import threading
+from ai_provider import AIProvider
+
+class BlockingStream:
+    # an SDK stream which waits for the next chunk until it is closed
+    def __init__(self):
+        self.closed = threading.Event()
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.count >= 3:
+            self.closed.wait(10)
+        if self.closed.is_set():
+            raise ConnectionError('stream closed')
+        self.count += 1
+        return self.count
+
+    def close(self):
+        self.closed.set()
+
+def reader_threads():
+    return [ thread for thread in threading.enumerate() if thread.name == 'llm-reader' ]
+
+def test_stopped_consumer_releases_the_reader():
+    stream = BlockingStream()
+
+    async def consume():
+        # the reader is ahead by a full queue when the consumer stops
+        async for chunk in AIProvider.iterate_chunks_async(None, stream, max_pending=1):
+            await asyncio.sleep(0.2)
+            break
+
+    asyncio.run(consume())
+    assert stream.closed.is_set()
+    for thread in reader_threads():
+        thread.join(2)
+    assert not reader_threads()
+
+def test_cancelled_consumer_closes_a_waiting_stream():
+    stream = BlockingStream()
+    received = []
+
+    async def consume():
+        async for chunk in AIProvider.iterate_chunks_async(None, stream):
+            received.append(chunk)
+
+    async def run():
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.2)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert received == [ 1, 2, 3 ]
+    assert stream.closed.is_set()
+    for thread in reader_threads():
+        thread.join(2)
+    assert not reader_threads()
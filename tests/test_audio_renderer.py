@@ -0,0 +1,26 @@
+import os
+from audio_renderer import AudioRenderer
+from conftest import run_cli
+
+def test_failed_part_is_not_kept(tmp_path):
+    def synthesize(text, file_path):
+        with open(file_path, 'wb') as f:
+            f.write(b'half of the audio')
+        if 'broken' in text:
+            raise ConnectionError('connection dropped')
+
+    output_path = str(tmp_path / 'out.mp3')
+    assert AudioRenderer(synthesize).render([ 'fine', 'broken' ], output_path) == 1
+    parts = sorted(os.listdir(f'{output_path}.parts'))
+    assert len(parts) == 1 and parts[0].startswith('00000-') and parts[0].endswith('.part')
+    assert not os.path.exists(output_path)
+
+def test_cli_does_not_keep_a_part_which_broke_off(home, standin):
+    standin.config.broken_audio = 'BROKEN'
+    output_path = os.path.join(home, 'out.mp3')
+    result = run_cli(home, [ '-m', 'passthrough', '-t', 'tts-1', '--no-session', '--output-audio-file', output_path, 'This part is BROKEN off.' ],
+                     environment=standin.environment())
+    assert result.returncode != 0
+    assert 'audio parts failed' in result.stderr
+    assert os.listdir(f'{output_path}.parts') == []
+    assert not os.path.exists(output_path)
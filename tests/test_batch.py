@@ -0,0 +1,68 @@
+import json
+import os
+from conftest import run_cli
+
+def write_batch(home, lines):
+    path = os.path.join(home, 'batch.jsonl')
+    with open(path, 'w') as f:
+        f.write('\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines) + '\n')
+    return path
+
+def read_results(path):
+    with open(path.replace('.jsonl', '.results.jsonl')) as f:
+        return [ json.loads(line) for line in f ]
+
+def max_overlap(spans):
+    # the most spans running at the same time
+    edges = sorted([ (span['ts'], 1) for span in spans ] + [ (span['ts'] + span['dur'], -1) for span in spans ])
+    running = best = 0
+    for _, change in edges:
+        running += change
+        best = max(best, running)
+    return best
+
+def test_session_lines_run_in_input_order(home, standin):
+    standin.config.latency_ms = 50
+    prompts = [ f'session line {i}' for i in range(5) ]
+    lines = [ { 'prompt': prompt, 'model': 'gpt-4o', 'session': 'chain' } for prompt in prompts ]
+    # other requests run next to the chain
+    lines += [ { 'prompt': f'other line {i}', 'model': 'gpt-4o' } for i in range(3) ]
+    path = write_batch(home, lines)
+    result = run_cli(home, [ '--batch', path, '--batch-workers', '8' ], environment=standin.environment())
+    assert result.returncode == 0, result.stderr
+
+    # each request of the session sees the ones before it
+    chain = [ body for p, body in standin.bodies if p == '/openai/v1/chat/completions' and 'session line' in json.dumps(body) ]
+    assert [ [ m['content'] for m in body['messages'] if m['role'] == 'user' ] for body in chain ] == [ prompts[:i + 1] for i in range(5) ]
+    results = read_results(path)
+    assert sorted(r['index'] for r in results) == list(range(8))
+    assert [ r['index'] for r in results if r.get('session') == 'chain' ] == list(range(5))
+
+def test_resume_skips_completed_and_reported_lines(home):
+    lines = [ { 'prompt': 'one', 'model': 'passthrough' }, '{ not json', { 'prompt': 'two', 'model': 'unknown-model' }, { 'prompt': 'three', 'model': 'passthrough' } ]
+    path = write_batch(home, lines)
+    first = run_cli(home, [ '--batch', path, '--no-session' ])
+    assert first.returncode == 1
+    assert sorted(r['index'] for r in read_results(path)) == [ 0, 1, 2, 3 ]
+
+    second = run_cli(home, [ '--batch', path, '--no-session', '--batch-resume' ])
+    assert second.returncode == 1
+    assert '2 skipped' in second.stderr
+    results = read_results(path)
+    # only the request which failed is tried again, the invalid line is reported once
+    assert sorted(r['index'] for r in results) == [ 0, 1, 2, 2, 3 ]
+    assert [ r['answer'] for r in results if r['index'] in (0, 3) ] == [ 'one', 'three' ]
+
+def test_requests_per_provider_are_limited(home, standin):
+    standin.config.latency_ms = 100
+    path = write_batch(home, [ { 'prompt': f'line {i}', 'model': 'gpt-4o' } for i in range(12) ])
+    profile_path = os.path.join(home, 'batch.json')
+    result = run_cli(home, [ '--batch', path, '--no-session', '--batch-workers', '16', '--profile', profile_path ], environment=standin.environment())
+    assert result.returncode == 0, result.stderr
+
+    with open(profile_path) as f:
+        events = json.load(f)['traceEvents']
+    spans = [ event for event in events if event.get('cat') == 'batch' ]
+    assert len(spans) == 12
+    # the OpenAI provider allows 4 requests at a time
+    assert 1 < max_overlap(spans) <= 4
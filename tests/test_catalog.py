@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+import time
+from conftest import ROOT
+
+# a run which serves a stale list and exits, like a short CLI run
+SCRIPT = '''
+import os, sys, time
+from catalog import get_catalog, wait_for_refreshes
+folder, delay = sys.argv[1], float(sys.argv[2])
+with open(os.path.join(folder, 'slow.models'), 'w') as f:
+    f.write('old')
+os.utime(os.path.join(folder, 'slow.models'), (0, 0))
+print(get_catalog(folder).get('slow', 'models', lambda: time.sleep(delay) or [ 'new' ], ttl_seconds=1))
+wait_for_refreshes()
+'''
+
+def run_script(folder, delay):
+    start = time.perf_counter()
+    result = subprocess.run([ sys.executable, '-c', SCRIPT, folder, str(delay) ], cwd=ROOT, capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "['old']"
+    return time.perf_counter() - start
+
+def read_list(folder):
+    with open(os.path.join(folder, 'slow.models')) as f:
+        return f.read()
+
+def test_stale_list_refresh_does_not_delay_exit(tmp_path):
+    assert run_script(str(tmp_path), 60) < 10
+    assert read_list(str(tmp_path)) == 'old'
+
+def test_stale_list_is_refreshed_before_exit(tmp_path):
+    run_script(str(tmp_path), 0.5)
+    assert read_list(str(tmp_path)) == 'new'
@@ -0,0 +1,14 @@
+import threading
+from completion_index import add_completion_session, read_completion_index, update_completion_voices
+
+def test_concurrent_updates_keep_every_session_and_voice(tmp_path):
+    folder = str(tmp_path)
+    threads = [ threading.Thread(target=add_completion_session, args=(folder, f'session-{i}')) for i in range(32) ]
+    threads += [ threading.Thread(target=update_completion_voices, args=(folder, f'model-{i}', [ f'voice-{i}' ])) for i in range(32) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    index = read_completion_index(folder)
+    assert sorted(index['sessions']) == sorted(f'session-{i}' for i in range(32))
+    assert index['voices'] == { f'model-{i}': [ f'voice-{i}' ] for i in range(32) }
@@ -0,0 +1,113 @@
+import argparse
+import gzip
+import json
+import os
+import shutil
+import threading
+import pytest
+import conversation_log
+from conversation_log import ConversationLog, compress_rotated
+
+def write_log(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+def backups(folder):
+    return sorted(name for name in os.listdir(folder) if name.endswith('.gz'))
+
+def read_backup(folder, name):
+    with gzip.open(os.path.join(folder, name), 'rt') as f:
+        return f.read()
+
+def test_rotates_a_log_over_the_size_limit(tmp_path):
+    path = os.path.join(tmp_path, 'ai-cli.log')
+    old = f'{conversation_log.format_time(0)}: old run\n' + 'x' * 1000 + '\n'
+    write_log(path, old)
+    log = ConversationLog(path, max_bytes=500).open()
+    log.write('new answer')
+    log.close()
+    names = backups(tmp_path)
+    assert len(names) == 1
+    assert read_backup(tmp_path, names[0]) == old
+    with open(path) as f:
+        assert f.read() == 'new answer\n'
+
+def test_keeps_a_log_under_the_size_limit(tmp_path):
+    path = os.path.join(tmp_path, 'ai-cli.log')
+    write_log(path, f'{conversation_log.format_time(0)}: old run\n')
+    log = ConversationLog(path, max_bytes=500).open()
+    log.write('new answer')
+    log.close()
+    assert backups(tmp_path) == []
+    with open(path) as f:
+        assert f.read().endswith('old run\nnew answer\n')
+
+def test_rotates_a_log_by_age(tmp_path):
+    path = os.path.join(tmp_path, 'ai-cli.log')
+    # the first entry is from 1970
+    write_log(path, f'{conversation_log.format_time(0)}: old run\n')
+    ConversationLog(path, max_age_seconds=3600).open().close()
+    assert len(backups(tmp_path)) == 1
+
+    # the new log started just now
+    ConversationLog(path, max_age_seconds=3600).open().close()
+    assert len(backups(tmp_path)) == 1
+
+def test_keeps_only_the_newest_backups(tmp_path):
+    path = os.path.join(tmp_path, 'ai-cli.log')
+    for day in range(1, 6):
+        with gzip.open(f'{path}.202401{day:02}-000000.gz', 'wt') as f:
+            f.write(f'day {day}')
+    write_log(path, 'x' * 1000)
+    ConversationLog(path, max_bytes=500, backups=3).open().close()
+    names = backups(tmp_path)
+    assert len(names) == 3
+    # the two oldest are gone, the new backup sorts last
+    assert [ read_backup(tmp_path, name) for name in names[:2] ] == [ 'day 4', 'day 5' ]
+    assert read_backup(tmp_path, names[2]) == 'x' * 1000
+
+def test_parallel_compression_of_the_same_backup(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, 'ai-cli.log')
+    data = ''.join(f'line {i}\n' for i in range(10000))
+    write_log(f'{path}.20240101-000000', data)
+    # the first run is held before it moves the compressed file in place, while a second one
+    # starts on the same file and fails half way, e.g. because the disk is full
+    first_compressed = threading.Event()
+    second_failed = threading.Event()
+    replace = os.replace
+    def hold_replace(source, target):
+        if not first_compressed.is_set():
+            first_compressed.set()
+            second_failed.wait(10)
+        replace(source, target)
+    def fail_copy(src, dst):
+        raise OSError('No space left on device')
+    monkeypatch.setattr(conversation_log.os, 'replace', hold_replace)
+    first = threading.Thread(target=compress_rotated, args=(path, 5))
+    first.start()
+    first_compressed.wait(10)
+    monkeypatch.setattr(conversation_log.shutil, 'copyfileobj', fail_copy)
+    with pytest.raises(OSError):
+        compress_rotated(path, 5)
+    second_failed.set()
+    first.join()
+    assert os.listdir(tmp_path) == [ 'ai-cli.log.20240101-000000.gz' ]
+    assert read_backup(tmp_path, 'ai-cli.log.20240101-000000.gz') == data
+
+def test_jsonl_record(tmp_path):
+    path = os.path.join(tmp_path, 'ai-cli.jsonl')
+    args = argparse.Namespace(model='gpt-4o', tts_model='tts-1', output='audio', session='chat')
+    log = ConversationLog(path, log_format='jsonl').open(args)
+    log.write('héllo ')
+    log.write('world')
+    log.close(status='interrupted')
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 1
+    record = json.loads(lines[0])
+    assert record['status'] == 'interrupted'
+    assert (record['model'], record['tts_model'], record['session']) == ('gpt-4o', 'tts-1', 'chat')
+    assert record['text'] == 'héllo world'
+    assert (record['chars'], record['bytes']) == (11, 12)
+    assert record['first_output_ms'] <= record['elapsed_ms']
+    assert record['args']['output'] == 'audio'
@@ -0,0 +1,110 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import pytest
+from conftest import AI_CLI, run_cli
+
+@pytest.fixture
+def daemon(home, standin):
+    # the daemon talks to the providers, not the clients
+    environment = dict(os.environ, HOME=home, **standin.environment())
+    process = subprocess.Popen([ sys.executable, AI_CLI, '--daemon' ], env=environment, cwd=home, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    socket_path = os.path.join(home, '.cache', 'ai-cli', 'ai-cli.sock')
+    deadline = time.monotonic() + 30
+    while not os.path.exists(socket_path):
+        assert process.poll() is None, process.stderr.read()
+        assert time.monotonic() < deadline, 'daemon did not start'
+        time.sleep(0.05)
+    yield process
+    process.terminate()
+    process.wait(timeout=10)
+
+def test_stdin_prompt_without_daemon(home):
+    result = run_cli(home, [ '-m', 'passthrough', '-t', 'printer', '-f', '-', '--no-session' ], input='hello world\n')
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'hello world'
+
+def test_stdin_prompt_through_daemon(home, daemon):
+    result = run_cli(home, [ '-m', 'passthrough', '-t', 'printer', '-f', '-', '--no-session' ], input='hello daemon\n')
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'hello daemon'
+
+def test_concurrent_profiles_through_daemon(home, daemon):
+    environment = dict(os.environ, HOME=home)
+    words = [ 'alpha', 'bravo', 'charlie', 'delta' ]
+    clients = []
+    for word in words:
+        arguments = [ '-m', 'passthrough', '-t', 'printer', '-o', 'audio', '--no-session', '--profile', os.path.join(home, f'{word}.json'), f'{word} one. {word} two.' ]
+        clients.append(subprocess.Popen([ sys.executable, AI_CLI, *arguments ], env=environment, cwd=home, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True))
+    for client in clients:
+        _, stderr = client.communicate(timeout=60)
+        assert client.returncode == 0, stderr
+    for word in words:
+        with open(os.path.join(home, f'{word}.json')) as f:
+            events = json.load(f)['traceEvents']
+        texts = [ e['args']['text'] for e in events if 'text' in e.get('args', {}) ]
+        assert texts
+        assert all(word in text for text in texts), texts
+
+def test_concurrent_audio_commands_through_daemon(home, daemon, standin):
+    # the stand-in takes a while per segment, so the requests overlap
+    standin.config.audio_latency_ms = 300
+    environment = dict(os.environ, HOME=home, **standin.environment())
+    prompts = { 'alpha': 'Alpha is short.', 'bravo': 'Bravo is a lot longer than alpha, it takes more audio to speak.' }
+
+    def arguments(word):
+        command = f'cat > {os.path.join(home, word)}.mp3 {{stdin}}'
+        return [ '-m', 'passthrough', '-t', 'tts-1', '-o', 'audio', '--no-session', '--tts-cache-max-mb', '0', '-c', command, prompts[word] ]
+
+    clients = [ subprocess.Popen([ sys.executable, AI_CLI, *arguments(word) ], env=environment, cwd=home, stderr=subprocess.PIPE, text=True) for word in prompts ]
+    for client in clients:
+        _, stderr = client.communicate(timeout=60)
+        assert client.returncode == 0, stderr
+    sizes = { word: os.path.getsize(os.path.join(home, f'{word}.mp3')) for word in prompts }
+
+    # the same requests one at a time
+    for word in prompts:
+        result = run_cli(home, arguments(word), environment=standin.environment())
+        assert result.returncode == 0, result.stderr
+        assert os.path.getsize(os.path.join(home, f'{word}.mp3')) == sizes[word]
+    assert sizes['alpha'] < sizes['bravo']
+
+@pytest.mark.parametrize('stop', [ signal.SIGINT, signal.SIGKILL ])
+def test_client_going_away_stops_playback(home, daemon, standin, stop):
+    # audio in real time, so it is still playing when the client goes away
+    standin.config.audio_realtime_factor = 1
+    output_path = os.path.join(home, 'out.mp3')
+    environment = dict(os.environ, HOME=home, **standin.environment())
+    prompt = ' '.join(f'This is sentence number {i} of a long answer.' for i in range(20))
+    arguments = [ '-m', 'passthrough', '-t', 'tts-1', '-o', 'audio', '--no-session', '--tts-cache-max-mb', '0', '-c', f'cat > {output_path} {{stdin}}', prompt ]
+    client = subprocess.Popen([ sys.executable, AI_CLI, *arguments ], env=environment, cwd=home, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while not os.path.exists(output_path) or os.path.getsize(output_path) < 10000:
+        assert client.poll() is None and time.monotonic() < deadline, 'no audio was played'
+        time.sleep(0.05)
+    client.send_signal(stop)
+    assert client.wait(timeout=10) == (130 if stop == signal.SIGINT else -signal.SIGKILL)
+
+    time.sleep(1)
+    size = os.path.getsize(output_path)
+    time.sleep(2)
+    assert os.path.getsize(output_path) == size
+    # the daemon is still there for the next client
+    result = run_cli(home, [ '-m', 'passthrough', '--no-session', 'still here' ])
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'still here'
+
+@pytest.mark.parametrize('command', [ 'cat > out.mp3 {stdin}', 'cp {} out.mp3' ])
+def test_audio_command_runs_in_the_client_directory(home, daemon, standin, command):
+    client_directory = os.path.join(home, 'client')
+    os.makedirs(client_directory)
+    environment = dict(os.environ, HOME=home, **standin.environment())
+    arguments = [ '-m', 'passthrough', '-t', 'tts-1', '-o', 'audio', '--no-session', '-c', command, 'Where am I?' ]
+    result = subprocess.run([ sys.executable, AI_CLI, *arguments ], env=environment, cwd=client_directory, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert os.path.getsize(os.path.join(client_directory, 'out.mp3')) > 0
+    assert not os.path.exists(os.path.join(home, 'out.mp3'))
@@ -0,0 +1,33 @@
+import os
+import threading
+import disk_cache
+from disk_cache import DiskCache
+
+def test_parallel_puts_of_the_same_key(tmp_path):
+    cache = DiskCache(str(tmp_path), 100 * 1024 * 1024)
+    values = [ bytes([ i ]) * 200000 for i in range(8) ]
+    threads = [ threading.Thread(target=cache.put, args=('key', value)) for value in values ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.get('key') in values
+    assert os.listdir(tmp_path) == [ 'key' ]
+
+def test_evicts_least_recently_used_over_the_limit(tmp_path):
+    cache = DiskCache(str(tmp_path), 1000)
+    for i in range(5):
+        cache.put(f'key{i}', bytes(300))
+        # distinct access times
+        os.utime(os.path.join(tmp_path, f'key{i}'), (i, i))
+    assert sorted(os.listdir(tmp_path)) == [ 'key2', 'key3', 'key4' ]
+
+def test_scans_only_when_due(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), 1024 * 1024)
+    scans = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, 'evict', lambda: scans.append(1) or evict())
+    for i in range(disk_cache.EVICT_INTERVAL * 2 + 1):
+        cache.put(f'key{i}', b'data')
+    # the first write and then every EVICT_INTERVAL writes
+    assert len(scans) == 3
@@ -0,0 +1,42 @@
+from conftest import run_cli
+
+# provider SDKs and audio libraries are only imported once a provider is used
+HEAVY_MODULES = [ 'openai', 'anthropic', 'elevenlabs', 'pyht', 'perplexity', 'httpx', 'miniaudio', 'num2words', 'langdetect', 'lingua', 'bs4' ]
+# about 100 ms here, importing the provider SDKs alone takes about 2 s
+IMPORT_BUDGET_MS = 400
+
+def imported_modules(stderr):
+    # -X importtime lines: "import time: self [us] | cumulative | imported package"
+    modules = set()
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and line.count('|') == 2:
+            modules.add(line.rsplit('|', 1)[1].strip())
+    return modules
+
+def import_time_ms(stderr):
+    # sum of the cumulative times of the top level imports, nested ones are indented further
+    total = 0
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and line.count('|') == 2:
+            _, cumulative, name = line.split('|')
+            if cumulative.strip().isdigit() and not name.startswith('  '):
+                total += int(cumulative)
+    return total / 1000
+
+def test_help_imports_no_provider_sdk(home):
+    result = run_cli(home, [ '--help' ], python_options=[ '-X', 'importtime' ])
+    assert result.returncode == 0, result.stderr
+    modules = imported_modules(result.stderr)
+    assert 'provider_registry' in modules
+    imported = sorted(m for m in modules if m.split('.')[0] in HEAVY_MODULES)
+    assert imported == []
+    assert import_time_ms(result.stderr) < IMPORT_BUDGET_MS
+
+def test_passthrough_imports_no_provider_sdk(home):
+    result = run_cli(home, [ '--no-daemon', '--no-session', '-m', 'passthrough', 'hello' ], python_options=[ '-X', 'importtime' ])
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'hello'
+    modules = imported_modules(result.stderr)
+    imported = sorted(m for m in modules if m.split('.')[0] in HEAVY_MODULES)
+    assert imported == []
+    assert import_time_ms(result.stderr) < IMPORT_BUDGET_MS
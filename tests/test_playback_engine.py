@@ -0,0 +1,81 @@
+import array
+import io
+import pytest
+import sys
+from conftest import run_cli
+from playback_engine import PlaybackEngine
+from tts_provider import TTSProvider
+
+ANSWER = 'Hello world. This is the second sentence.'
+
+class FakeTTSProvider:
+    # what the playback engine asks of a provider, MP3 decoded to float samples like OpenAI
+    def format(self):
+        return TTSProvider.Format.MP3
+
+    def dtype(self):
+        return 'float32'
+
+    def channels(self):
+        return 1
+
+    def samplerate(self):
+        return 24000
+
+    def pcm_samplerate(self):
+        return 24000
+
+    def blocksize(self):
+        return 1024
+
+class PCMSource(io.BytesIO):
+    # hands out the bytes in odd sized reads, like a ByteQueueFile filled by the provider
+    audio_format = TTSProvider.Format.PCM
+
+    def read(self, size=-1):
+        return super().read(min(size, 333))
+
+SAMPLES = array.array('h', [ 0, 1, -1, 32767, -32768, 1000, -1000 ] * 500)
+
+def play(engine):
+    # the provider sends little endian samples
+    data = array.array('h', SAMPLES)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    played = array.array(engine.typecode)
+    for samples in engine._stream(PCMSource(data.tobytes())):
+        played.extend(samples)
+    return played
+
+def test_pcm_is_played_as_sent():
+    engine = PlaybackEngine(FakeTTSProvider(), sink='null', audio_format=TTSProvider.Format.PCM)
+    assert engine.plays_pcm(24000)
+    assert play(engine) == SAMPLES
+
+def test_pcm_is_converted_for_a_float_device():
+    # the daemon opened the device for an MP3 request before
+    engine = PlaybackEngine(FakeTTSProvider(), sink='null')
+    assert engine.plays_pcm(24000)
+    assert not engine.plays_pcm(22050)
+    assert list(play(engine)) == [ sample / 32768 for sample in SAMPLES ]
+
+def speech_formats(standin):
+    return [ body.get('response_format') for path, body in standin.bodies if path == '/openai/v1/audio/speech' ]
+
+@pytest.mark.parametrize('arguments, response_format', [
+    ([ '--output-audio-sink', 'null' ], 'pcm'),
+    ([ '--output-audio-sink', 'null', '--output-audio-format', 'mp3' ], 'mp3'),
+    ([ '-c', 'true' ], 'mp3'),
+    ([ '-c', 'cat > /dev/null {stdin}' ], 'mp3'),
+])
+def test_pcm_only_for_the_playback_device(home, standin, arguments, response_format):
+    result = run_cli(home, [ '--no-daemon', '--no-session', '-m', 'passthrough', '-t', 'tts-1', '-o', 'audio' ] + arguments + [ ANSWER ], environment=standin.environment())
+    assert result.returncode == 0, result.stderr
+    formats = speech_formats(standin)
+    assert formats and set(formats) == { response_format }
+
+def test_pcm_not_for_audio_files(home, standin, tmp_path):
+    result = run_cli(home, [ '--no-daemon', '--no-session', '-m', 'passthrough', '-t', 'tts-1', '--output-audio-file', str(tmp_path / 'out.mp3'), ANSWER ], environment=standin.environment())
+    assert result.returncode == 0, result.stderr
+    formats = speech_formats(standin)
+    assert formats and set(formats) == { 'mp3' }
@@ -0,0 +1,26 @@
+import re
+import pytest
+from conftest import run_cli
+
+ANSWER = 'Hello world. This is the second sentence.'
+
+@pytest.mark.parametrize('arguments', [
+    [ '-o', 'audio' ],
+    [ '-o', 'audio+text' ],
+    [ '-o', 'audio', '-w' ],
+    [ '-o', 'audio', '-c', 'true' ],
+    [ '-o', 'audio', '-c', 'cat > /dev/null {stdin}' ],
+])
+def test_printer_provider_plays_nothing(home, arguments):
+    # the printer prints the segments instead of producing audio, no playback device is opened
+    result = run_cli(home, [ '--no-daemon', '--no-session', '--no-tts-optimization', '-m', 'passthrough', '-t', 'printer' ] + arguments + [ ANSWER ], timeout=30)
+    assert result.returncode == 0, result.stderr
+    assert 'ERROR' not in result.stderr
+    # with text the answer is printed in front of the first segment
+    printed = [ match.group(1) for match in re.finditer(r'\(\d+\): (.*)', result.stdout) ]
+    assert ' '.join(printed) == ANSWER
+
+def test_printer_provider_cannot_render(home, tmp_path):
+    result = run_cli(home, [ '--no-daemon', '--no-session', '-m', 'passthrough', '-t', 'printer', '--output-audio-file', str(tmp_path / 'out.mp3'), ANSWER ], timeout=30)
+    assert result.returncode == 1
+    assert 'no audio to render' in result.stderr
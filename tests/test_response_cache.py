@@ -0,0 +1,48 @@
+from ai_provider import AIProvider
+from response_cache import CachedAIProvider
+
+class CountingProvider(AIProvider):
+    def __init__(self):
+        self.calls = 0
+        self.parameters = { 'temperature': 1.0 }
+
+    def name(self):
+        return 'counting'
+
+    def _list_models(self):
+        return [ 'model' ]
+
+    def request_parameters(self, model):
+        return dict(self.parameters)
+
+    def chat_completion(self, messages, model, stream=False):
+        self.calls += 1
+        return [ f'answer {self.calls}' ]
+
+    def convert_result_to_text(self, result, sources, handle_metadata_func):
+        return ''.join(result)
+
+    def convert_chunk_to_text(self, chunk, text_chunks, sources, handle_metadata_func):
+        return chunk
+
+    def close(self):
+        pass
+
+def answer(cached, stream):
+    messages = [ { 'role': 'user', 'content': 'hello' } ]
+    result = cached.chat_completion(messages, 'model', stream)
+    if stream:
+        text_chunks = []
+        return ''.join(cached.convert_chunk_to_text(chunk, text_chunks, None, None) for chunk in result)
+    return cached.convert_result_to_text(result, None, None)
+
+def test_key_covers_stream_and_request_parameters(tmp_path):
+    provider = CountingProvider()
+    cached = CachedAIProvider(provider, str(tmp_path), 1024 * 1024, None)
+    assert answer(cached, True) == 'answer 1'
+    assert answer(cached, True) == 'answer 1'
+    assert answer(cached, False) == 'answer 2'
+    assert answer(cached, False) == 'answer 2'
+    provider.parameters['temperature'] = 0.2
+    assert answer(cached, True) == 'answer 3'
+    assert provider.calls == 3
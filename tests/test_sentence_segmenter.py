@@ -0,0 +1,38 @@
+import random
+import re
+import pytest
+from sentence_segmenter import SentenceSegmenter, extract_sentence, split_sentences
+from bench_sentence_segmenter import MIN_SENTENCE_LENGTH, MAX_SENTENCE_LENGTH, corpus, chunks, legacy_extract_sentence
+
+LIMITS = [ (MIN_SENTENCE_LENGTH, MAX_SENTENCE_LENGTH), (MIN_SENTENCE_LENGTH, MAX_SENTENCE_LENGTH // 2), (10, 80) ]
+# the golden corpus of benchmarks/bench_sentence_segmenter.py
+CORPUS = list(corpus())
+
+@pytest.mark.parametrize('min_len, max_len', LIMITS)
+def test_extract_sentence_matches_original(min_len, max_len):
+    for text in CORPUS:
+        assert extract_sentence(text, min_len, max_len) == legacy_extract_sentence(text, min_len, max_len), text
+
+@pytest.mark.parametrize('min_len, max_len', LIMITS)
+def test_split_sentences_matches_original(min_len, max_len):
+    for text in CORPUS:
+        expected = []
+        remainder = text
+        while len(remainder) > 0:
+            sentence, remainder = legacy_extract_sentence(remainder, min_len, max_len)
+            expected.append(sentence)
+        assert split_sentences(text, min_len, max_len) == expected, text
+
+@pytest.mark.parametrize('min_len, max_len', LIMITS)
+def test_streamed_segments_match_whole_text(min_len, max_len):
+    rng = random.Random(f'{min_len}-{max_len}')
+    for text in CORPUS:
+        whole = SentenceSegmenter(min_len, max_len)
+        expected = whole.feed(text) + [ whole.flush() ]
+        streamed = SentenceSegmenter(min_len, max_len)
+        segments = []
+        for delta in chunks(rng, text):
+            segments.extend(streamed.feed(delta))
+        segments.append(streamed.flush())
+        assert segments == expected, text
+        assert re.sub(r'\s+', '', ''.join(segments)) == re.sub(r'\s+', '', text)
@@ -0,0 +1,34 @@
+import json
+import os
+from conftest import run_cli
+from session_context import SUMMARY_PREFIX, SUMMARY_PROMPT
+from standin_servers import pick_answer
+
+MODEL = 'claude-3-5-sonnet-latest'
+
+def write_session(home, name, messages):
+    with open(os.path.join(home, '.cache', 'ai-cli', f'ai-cli_{name}.session'), 'w') as f:
+        for message in messages:
+            print(json.dumps(message), file=f)
+
+def test_anthropic_gets_role_and_summary_in_one_system_message(home, standin):
+    role = { 'role': 'system', 'content': 'Be brief.' }
+    # 100 characters are 29 tokens, 20 of them don't fit the budget
+    history = [ { 'role': 'user' if i % 2 == 0 else 'assistant', 'content': f'{i:02d}' + 'x' * 98 } for i in range(20) ]
+    write_session(home, 'test', [ role ] + history)
+
+    result = run_cli(home, [ '--no-daemon', '--no-model-switch', '-m', MODEL, '-s', 'test', '-r', 'Be brief.', '-w',
+                             '--context-tokens', '400', '--summarize-context', 'And now?' ], environment=standin.environment())
+    assert result.returncode == 0, result.stderr
+
+    requests = [ body for path, body in standin.bodies if path == '/anthropic/v1/messages' ]
+    assert len(requests) == 2
+    summary_request, request = requests
+    assert summary_request['system'] == SUMMARY_PROMPT
+    summary = pick_answer(summary_request['messages'][0]['content'])
+
+    assert request['system'] == f'Be brief.\n\n{SUMMARY_PREFIX}{summary}'
+    # 400 - 6 for the prompt - 7 for the role - 256 for the summary leaves room for 4 messages
+    assert request['messages'] == history[-4:] + [ { 'role': 'user', 'content': 'And now?' } ]
+    # the summary covers everything before them
+    assert summary_request['messages'][0]['content'] == '\n\n'.join(f"{m['role']}: {m['content']}" for m in history[:-4])
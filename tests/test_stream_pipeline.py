@@ -0,0 +1,50 @@
+import asyncio
+import os
+import threading
+from sentence_segmenter import SentenceSegmenter
+from stream_pipeline import StreamPipeline
+
+def test_timed_out_segment_is_discarded_once_synthesized(tmp_path):
+    release = threading.Event()
+    targets = iter(str(tmp_path / f'{i}.mp3') for i in range(10))
+    played = []
+    discarded = []
+
+    async def chunks():
+        yield 'This one is slow. This one is fast. '
+
+    async def synthesize(text, target):
+        if 'slow' in text:
+            # a synthesis thread which can't be cancelled
+            await asyncio.to_thread(release.wait, 10)
+        with open(target, 'w') as f:
+            f.write(text)
+
+    def play(target, on_done):
+        played.append(target)
+        os.remove(target)
+        release.set()
+        on_done()
+
+    def discard(target):
+        discarded.append(target)
+        if os.path.exists(target):
+            os.remove(target)
+
+    async def run():
+        pipeline = StreamPipeline(chunks(), lambda text: None, SentenceSegmenter(min_len=1), lambda text, last: [ text ] if text.strip() else [],
+                                  synthesize, lambda: next(targets), play, segment_timeout=0.2, wait_for_synthesis=True, discard_func=discard)
+        await pipeline.run()
+        for i in range(100):
+            if discarded:
+                break
+            await asyncio.sleep(0.05)
+        return pipeline
+
+    pipeline = asyncio.run(run())
+    slow = pipeline.segments[0]
+    assert 'slow' in slow.text
+    assert slow.synthesis.done() and not slow.synthesis.cancelled()
+    assert discarded == [ slow.target ]
+    assert played == [ pipeline.segments[1].target ]
+    assert os.listdir(tmp_path) == []
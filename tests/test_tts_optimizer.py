@@ -0,0 +1,58 @@
+import json
+import random
+import pytest
+import tts_optimizer
+from tts_optimizer import LanguageDetection, convert_numbers_to_words_in_line, normalize_text
+from bench_number_words import LANGUAGES, CASES, EXTENSIONS_PATTERN, EXTENSION_CASES, generate_line, legacy_convert_numbers_to_words_in_line
+from bench_tts_rules import RULE_COUNTS, generate_rules, generate_lines, chained_replace
+from bench_language_detection import SEGMENTS
+
+def number_corpus(lang):
+    # the generated corpus of benchmarks/bench_number_words.py, seeded per language
+    rng = random.Random(f'numbers-{lang}')
+    lines = [ generate_line(rng) for i in range(CASES) ]
+    return [ line for line in lines if not EXTENSIONS_PATTERN.search(line) ]
+
+@pytest.mark.parametrize('lang', LANGUAGES)
+def test_numbers_match_character_walk(lang):
+    for line in number_corpus(lang):
+        expected = legacy_convert_numbers_to_words_in_line(line, lang)
+        assert convert_numbers_to_words_in_line(line, lang) == expected, line
+
+@pytest.mark.parametrize('lang, line, expected', EXTENSION_CASES)
+def test_numbers_golden(lang, line, expected):
+    assert convert_numbers_to_words_in_line(line, lang) == expected
+
+@pytest.fixture
+def rules_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(tts_optimizer, 'RULES_FOLDER', str(tmp_path))
+    tts_optimizer.get_rules.cache_clear()
+    tts_optimizer.get_rules_pattern.cache_clear()
+    yield tmp_path
+    tts_optimizer.get_rules.cache_clear()
+    tts_optimizer.get_rules_pattern.cache_clear()
+
+@pytest.mark.parametrize('count', RULE_COUNTS)
+def test_rules_match_chained_replace(rules_folder, count):
+    rules = generate_rules(count)
+    with open(rules_folder / 'xx.json', 'w', encoding='utf-8') as f:
+        json.dump(rules, f)
+    for line in generate_lines(rules):
+        assert normalize_text(line, 'xx') == chained_replace(line, rules), line
+
+def test_language_is_detected_again_when_the_answer_switches():
+    language_detection = LanguageDetection()
+    languages = [ language_detection.language(text) for text in SEGMENTS['en'] + SEGMENTS['de'] * 2 ]
+    assert languages[0] == 'en'
+    assert languages[-1] == 'de'
+
+def test_language_is_only_checked_now_and_then():
+    language_detection = LanguageDetection()
+    segments = SEGMENTS['en'] * 4
+    assert { language_detection.language(text) for text in segments } == { 'en' }
+    assert language_detection.detections <= 1 + len(segments) // language_detection.check_interval
+
+def test_language_hint_is_never_detected():
+    language_detection = LanguageDetection(lang_hint='en')
+    assert { language_detection.language(text) for text in SEGMENTS['de'] } == { 'en' }
+    assert language_detection.detections == 0
@@ -0,0 +1,21 @@
+import os
+import threading
+from utils import write_atomically
+
+def test_write_atomically_from_many_threads(tmp_path):
+    file_path = str(tmp_path / 'file')
+    contents = [ str(i) * 100000 for i in range(8) ]
+    threads = [ threading.Thread(target=write_atomically, args=(file_path, content)) for content in contents ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(file_path) as f:
+        assert f.read() in contents
+    assert os.listdir(tmp_path) == [ 'file' ]
+
+def test_write_atomically_bytes(tmp_path):
+    file_path = str(tmp_path / 'file')
+    write_atomically(file_path, b'\x00\x01')
+    with open(file_path, 'rb') as f:
+        assert f.read() == b'\x00\x01'
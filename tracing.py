@@ -0,0 +1,178 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+# spans of one run in Chrome trace format (chrome://tracing, Perfetto), see --profile
+# timestamps are microseconds since the tracer was started
+
+class Tracer:
+    enabled = True
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.events = []
+        self.marks = {}
+        self.bytes = {}
+        self.playbacks = []
+        self.lock = threading.Lock()
+
+    def now(self):
+        return time.perf_counter()
+
+    def timestamp(self, t):
+        return round((t - self.origin) * 1000000, 1)
+
+    def add(self, event):
+        event['pid'] = self.pid
+        event['tid'] = threading.get_ident()
+        with self.lock:
+            self.events.append(event)
+
+    def complete(self, name, category, start, end=None, **args):
+        end = self.now() if end is None else end
+        self.add({ 'name': name, 'cat': category, 'ph': 'X', 'ts': self.timestamp(start), 'dur': round((end - start) * 1000000, 1), 'args': args })
+
+    @contextlib.contextmanager
+    def span(self, name, category, **args):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.complete(name, category, start, **args)
+
+    def instant(self, name, category, **args):
+        self.add({ 'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': self.timestamp(self.now()), 'args': args })
+
+    def mark(self, name):
+        # only the first occurrence counts, e.g. the first token
+        with self.lock:
+            if name in self.marks:
+                return
+            self.marks[name] = self.now()
+        self.instant(name, 'mark')
+
+    def add_bytes(self, provider, count):
+        with self.lock:
+            self.bytes[provider] = self.bytes.get(provider, 0) + count
+
+    def playback(self, name, start, end):
+        with self.lock:
+            self.playbacks.append((start, end))
+        self.complete(name, 'playback', start, end)
+
+    def audio_file(self, target, provider, text):
+        if isinstance(target, str):
+            return target
+        return TracedAudioFile(self, target, provider, text)
+
+    def summary(self):
+        def milliseconds(start, end):
+            if start is None or end is None:
+                return None
+            return round((end - start) * 1000, 1)
+
+        with self.lock:
+            playbacks = sorted(self.playbacks)
+            marks = dict(self.marks)
+            total_bytes = dict(self.bytes)
+        request = marks.get('llm request')
+        first_audio = playbacks[0][0] if playbacks else None
+        gaps = sum(max(0.0, start - end) for (_, end), (start, _) in zip(playbacks, playbacks[1:]))
+        return {
+            'ttft_ms': milliseconds(request, marks.get('first token')),
+            'ttfa_ms': milliseconds(request, first_audio),
+            'ttfa_since_start_ms': milliseconds(self.origin, first_audio),
+            'segments': len(playbacks),
+            'gap_ms': round(gaps * 1000, 1),
+            'bytes': total_bytes,
+        }
+
+    def write(self, file_path):
+        summary = self.summary()
+        with self.lock:
+            events = list(self.events)
+        with open(file_path, 'w') as f:
+            json.dump({ 'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': summary }, f)
+        return summary
+
+class NullTracer:
+    # used unless --profile is given, costs a method call per span
+    enabled = False
+
+    def now(self):
+        return 0
+
+    def complete(self, name, category, start, end=None, **args):
+        pass
+
+    def span(self, name, category, **args):
+        return contextlib.nullcontext()
+
+    def instant(self, name, category, **args):
+        pass
+
+    def mark(self, name):
+        pass
+
+    def add_bytes(self, provider, count):
+        pass
+
+    def playback(self, name, start, end):
+        pass
+
+    def audio_file(self, target, provider, text):
+        return target
+
+class TracedAudioFile:
+    # marks the first and last audio byte of a TTS request and counts its bytes
+    def __init__(self, tracer, target, provider, text):
+        self.tracer = tracer
+        self.target = target
+        self.provider = provider
+        self.text = text
+        self.count = 0
+
+    def write(self, data) -> int:
+        if self.count == 0:
+            self.tracer.instant('first audio byte', 'tts', provider=self.provider, text=self.text)
+        self.count += len(data)
+        return self.target.write(data)
+
+    def set_error(self, error):
+        self.target.set_error(error)
+
+    def close(self):
+        self.tracer.instant('last audio byte', 'tts', provider=self.provider, text=self.text, bytes=self.count)
+        self.tracer.add_bytes(self.provider, self.count)
+        self.target.close()
+
+    @property
+    def closed(self):
+        return self.target.closed
+
+    def __str__(self):
+        return str(self.target)
+
+null_tracer = NullTracer()
+
+# the daemon profiles each request on its own, worker threads get the tracer of their request with
+# utils.with_thread_state
+local = threading.local()
+
+def get_tracer():
+    return getattr(local, 'tracer', null_tracer)
+
+def set_tracer(tracer):
+    local.tracer = tracer
+
+def start_tracing():
+    local.tracer = Tracer()
+    return local.tracer
+
+def stop_tracing():
+    stopped = get_tracer()
+    local.tracer = null_tracer
+    return stopped
@@ -1,115 +1,268 @@
 from num2words import num2words
-from langdetect import detect_langs, detect
 from num2words import CONVERTER_CLASSES
+from utils import print_verbose
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+import json
+import os
 import re
 
-URL_PATTERN = re.compile(r'https*:[^ ]+')
+# per language rules for units, symbols, abbreviations etc., see get_rules()
+RULES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tts_rules')
+
+URL_PATTERN = r'https*:[^ ]+'
+EMAIL_PATTERN = r'(?<![\w.+-])[\w.+-]+@[\w-]+\.[\w.-]*\w'
+EMOJI_PATTERN = '[\U0001F1E6-\U0001F1FF\U0001F300-\U0001FAFF\u2600-\u27BF\u200D\uFE0F]+'
+UNIT_NUMBER_PATTERN = r'(?<![\w.,])\d+(?:[.,]\d+)?'
+
+DETECTION_SAMPLE_LENGTH = 300
+DETECTION_MIN_CONFIDENCE = 0.9
+# texts after which a detected language is checked against the texts that followed
+DETECTION_CHECK_INTERVAL = 4
+
+lingua_detector = None
 
 def get_supported_languages():
     return list(CONVERTER_CLASSES.keys())
 
-def is_digit(char):
-    return char.isdigit()
+def detect_languages_langdetect(text):
+    from langdetect import DetectorFactory, detect_langs
+    from langdetect.lang_detect_exception import LangDetectException
+    # make results deterministic, langdetect is randomized by default
+    DetectorFactory.seed = 0
+    try:
+        return [ (lang.lang, lang.prob) for lang in detect_langs(text) ]
+    except LangDetectException:
+        return []
+
+def detect_languages_lingua(text):
+    from lingua import LanguageDetectorBuilder
+    global lingua_detector
+    if lingua_detector is None:
+        lingua_detector = LanguageDetectorBuilder.from_all_languages().with_preloaded_language_models().build()
+    return [ (value.language.iso_code_639_1.name.lower(), value.value) for value in lingua_detector.compute_language_confidence_values(text) ]
+
+LANGUAGE_DETECTORS = {
+    'langdetect': detect_languages_langdetect,
+    'lingua': detect_languages_lingua,
+}
 
-def detect_language(text):
-    return detect(text)
+def get_language_detectors():
+    return list(LANGUAGE_DETECTORS.keys())
 
-def optimize_for_tts(text, lang_hint=None) -> tuple[str, str]:
-    # Detect the language
-    detected_lang = detect(text)
+def detect_language(text, detector='langdetect'):
+    languages = LANGUAGE_DETECTORS[detector](text)
+    return languages[0][0] if languages else None
 
-    for lang in detect_langs(text):
-        print(lang.lang)
-        print(type(lang.prob))
-        print(lang.prob)
+class LanguageDetection:
+    def __init__(self, detector='langdetect', lang_hint=None, sample_length=DETECTION_SAMPLE_LENGTH, min_confidence=DETECTION_MIN_CONFIDENCE,
+                 check_interval=DETECTION_CHECK_INTERVAL):
+        self.detect_func = LANGUAGE_DETECTORS[detector]
+        self.sample_length = sample_length
+        self.min_confidence = min_confidence
+        self.check_interval = check_interval
+        self.sample = ""
+        # texts since the language was detected or last checked
+        self.recent = ""
+        self.unchecked = 0
+        self.lang_hint = lang_hint
+        self.lang = lang_hint
+        self.confidence = 1.0 if lang_hint else 0.0
+        self.detections = 0
 
-    # Get supported languages
-    supported_langs = get_supported_languages()
+    def language(self, text):
+        # until the language was detected with enough confidence the sample grows with each text and is
+        # detected again, after that every check_interval texts are detected on their own and the
+        # detection starts over with them if they aren't the language with enough confidence
+        if self.lang_hint:
+            return self.lang
+        if self.confidence >= self.min_confidence:
+            return self.check(text)
+
+        if len(self.sample) < self.sample_length:
+            self.sample = (self.sample + " " + text).strip()[:self.sample_length]
+        languages = self.detect_func(self.sample)
+        self.detections += 1
+        if languages:
+            self.lang, self.confidence = languages[0]
+            if len(self.sample) >= self.sample_length:
+                # more text won't change the result, keep the best guess
+                self.confidence = 1.0
+            print_verbose("Language", f'{self.lang} ({self.confidence:.2f})')
+        return self.lang
+
+    def check(self, text):
+        self.recent = (self.recent + " " + text).strip()[:self.sample_length]
+        self.unchecked += 1
+        if self.unchecked < self.check_interval:
+            return self.lang
+        recent = self.recent
+        self.recent = ""
+        self.unchecked = 0
+        languages = self.detect_func(recent)
+        self.detections += 1
+        if languages and languages[0][0] == self.lang and languages[0][1] >= self.min_confidence:
+            return self.lang
+        print_verbose("Language", f'{self.lang} no longer detected, detecting again')
+        self.sample = ""
+        self.confidence = 0.0
+        return self.language(recent)
+
+def optimize_for_tts(text, lang_hint=None, language_detection=None) -> tuple[str, str]:
+    if lang_hint:
+        detected_lang = lang_hint
+    elif language_detection:
+        detected_lang = language_detection.language(text)
+    else:
+        detected_lang = detect_language(text)
 
     # Check if the detected language is supported by num2words
-    if detected_lang in supported_langs:
+    if detected_lang in get_supported_languages():
         lang = detected_lang
     else:
-        print(f"WARNING: Language '{detected_lang}' not supported, skipping TTS optimization.")
+        print_verbose("Optimize", f"Language '{detected_lang}' not supported, skipping TTS optimization.")
         return text, None
 
     lines = []
     lines.extend(text.splitlines())
     for i in range(len(lines)):
+        lines[i] = normalize_text(lines[i], lang)
         lines[i] = convert_numbers_to_words_in_line(lines[i], lang)
-        lines[i] = convert_symbols_to_words(lines[i], lang)
-        lines[i] = replace_urls(lines[i], lang)
 
     return '\n'.join(lines), detected_lang
 
-def replace_urls(text, lang):
-    if lang == 'en':
-        return URL_PATTERN.sub('(see link in the text)', text)
-    elif lang == 'de':
-        return URL_PATTERN.sub('(siehe Link im Text)', text)
+@lru_cache(maxsize=None)
+def get_rules(lang):
+    rules_path = os.path.join(RULES_FOLDER, f'{lang}.json')
+    if not os.path.exists(rules_path):
+        return {}
+    with open(rules_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def get_trie_pattern(node):
+    alternatives = [ re.escape(char) + get_trie_pattern(child) for char, child in sorted(node.items()) if char ]
+    if not alternatives:
+        return ''
+    pattern = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+    if '' in node:
+        pattern = '(?:' + pattern + ')?'
+    return pattern
 
-    return text
+def get_alternatives(keys):
+    # keys are merged into a trie, so matching costs the same no matter how many keys there are,
+    # longer keys win, e.g. 'km/h' over 'km'
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return get_trie_pattern(trie)
 
-def convert_symbols_to_words(text, lang):
-    if lang == 'en':
-        return text.replace('°C', 'degrees Celsius').replace('°F', 'degrees Fahrenheit')
-    elif lang == 'de':
-        return text.replace('°C', 'Grad Celsius').replace('°F', 'Grad Fahrenheit')
+@lru_cache(maxsize=None)
+def get_rules_pattern(lang):
+    # all rules of a language are combined into one pattern, so each line is rewritten in one pass,
+    # the name of the outer group tells which rule matched
+    rules = get_rules(lang)
+    patterns = []
+    if 'urls' in rules:
+        patterns.append(f'(?P<urls>{URL_PATTERN})')
+    if 'emails' in rules:
+        patterns.append(f'(?P<emails>{EMAIL_PATTERN})')
+    if 'emoji' in rules:
+        patterns.append(f'(?P<emoji>{EMOJI_PATTERN})')
+    if rules.get('units'):
+        patterns.append(f'(?P<units>(?P<unit_number>{UNIT_NUMBER_PATTERN}) ?(?P<unit>{get_alternatives(rules["units"].keys())})(?!\\w))')
+    if rules.get('abbreviations'):
+        patterns.append(f'(?P<abbreviations>(?<!\\w)(?:{get_alternatives(rules["abbreviations"].keys())})(?!\\w))')
+    if rules.get('symbols'):
+        patterns.append(f'(?P<symbols>{get_alternatives(rules["symbols"].keys())})')
+    if not patterns:
+        return None
+    return re.compile('|'.join(patterns))
 
-    return text
+def normalize_text(text, lang):
+    pattern = get_rules_pattern(lang)
+    if not pattern:
+        return text
+
+    rules = get_rules(lang)
+
+    def replace(match):
+        rule = match.lastgroup
+        if rule == 'units':
+            number = match.group('unit_number')
+            singular, plural = rules['units'][match.group('unit')]
+            return number + ' ' + (singular if number == '1' else plural)
+        if rule == 'abbreviations' or rule == 'symbols':
+            return rules[rule][match.group()]
+        return rules[rule]
+
+    return pattern.sub(replace, text)
+
+@lru_cache(maxsize=4096)
+def get_number_words(number, mode, lang):
+    try:
+        if mode == 'decimal':
+            return num2words(Decimal(number), to='cardinal', lang=lang)
+        word = num2words(int(number), to=mode, lang=lang)
+        if mode == 'ordinal' and lang == 'de':
+            # German ends with 'ns', e.g. 'erste' -> 'erstens'
+            word = word + 'ns'
+        return word
+    except (ValueError, NotImplementedError, OverflowError, InvalidOperation):
+        return None
+
+@lru_cache(maxsize=None)
+def get_number_pattern(lang):
+    words = get_rules(lang).get('numbers')
+    if not words:
+        return re.compile(r'(?P<first>\d+)')
+    number = r'\d+(?:' + re.escape(words['decimal_separator']) + r'\d+)?'
+    currencies = '[' + re.escape(''.join(words['currencies'].keys())) + ']'
+    return re.compile(f'(?P<prefix>{currencies})?(?P<first>{number})(?:[-–](?P<second>{number}))?(?P<suffix>\\s?%|\\s?{currencies})?')
+
+def get_cardinal_words(number, lang):
+    words = get_rules(lang).get('numbers')
+    if words and words['decimal_separator'] in number:
+        return get_number_words(number.replace(words['decimal_separator'], '.'), 'decimal', lang)
+    num = int(number)
+    if num > 1000 and num < 2200:
+        return get_number_words(number, 'year', lang)
+    return get_number_words(number, 'cardinal', lang)
 
 def convert_numbers_to_words_in_line(text, lang):
-    result = []
-    i = 0
-    while i < len(text):
-        if is_digit(text[i]):
-            # Found a digit, let's extract the full number
-            start = i
-            while i < len(text) and is_digit(text[i]):
-                i += 1
-
-            before = text[start-1:start] if start > 0 else ''
-            before_text = text[:start]
-            next = text[i] if i < len(text) else ''
-            next_next = text[i+1] if i+1 < len(text) else ''
-            next_is_last = i == len(text) - 1 or text[i+1:].strip() == ''
-
-            is_ordinal = next == '.' and not is_digit(next_next)
-            is_start_ordinal = is_ordinal and (start == 0 or before_text.strip() == '')
-            is_cardinal = (start == 0 or before_text.strip() == '' or before.isspace()) and (next.isspace() or (next_is_last and not next.isalpha()))
-
-            number = text[start:i]
-            ok = True
-
-            try:
-                num = int(number)
-                if is_start_ordinal:
-                    word = num2words(num, to='ordinal', lang=lang)
-                    if lang == 'de':
-                        # German ends with 'ns', e.g. 'erste' -> 'erstens'
-                        word = word + 'ns'
-                elif is_cardinal:
-                    if num > 1000 and num < 2200:
-                        word = num2words(num, to='year', lang=lang)
-                    else:
-                        word = num2words(num, to='cardinal', lang=lang)
-                else:
-                    ok = False
-
-                if ok:
-                    # Add a space before the word if it's not at the start and the previous char isn't a space
-                    if result and not result[-1].isspace():
-                        result.append(' ')
-                    result.append(word)
-            except (ValueError, NotImplementedError):
-                ok = False
-
-            if not ok:
-                # keep the original number
-                result.append(text[start:i])
+    # numbers are only converted when they stand alone, i.e. they start the line or follow
+    # whitespace and they are followed by whitespace or only by punctuation at the end of the line
+    first_char = len(text) - len(text.lstrip())
+    last_char = len(text.rstrip())
+    words = get_rules(lang).get('numbers')
+
+    def replace(match):
+        start, end = match.span()
+        before = text[start - 1] if start > 0 else ''
+        next = text[end] if end < len(text) else ''
+        next_next = text[end + 1] if end + 1 < len(text) else ''
+        if (before and not before.isspace()) or next.isdigit():
+            return match.group()
+
+        prefix, first, second, suffix = [ match.groupdict().get(name) for name in ('prefix', 'first', 'second', 'suffix') ]
+        is_integer = first.isdigit() and not (prefix or second or suffix)
+        if is_integer and start <= first_char and next == '.' and not next_next.isdigit():
+            word = get_number_words(first, 'ordinal', lang)
+        elif next.isspace() or (end + 1 >= last_char and not next.isalpha()):
+            word = get_cardinal_words(first, lang)
+            if word and second:
+                second_word = get_cardinal_words(second, lang)
+                word = word + ' ' + words['range'] + ' ' + second_word if second_word else None
+            if word and suffix and suffix.strip() == '%':
+                word = word + ' ' + words['percent']
+            elif word and (prefix or suffix):
+                singular, plural = words['currencies'][(prefix or suffix).strip()]
+                word = word + ' ' + (singular if first == '1' and not second else plural)
         else:
-            # Not a number, just add the character
-            result.append(text[i])
-            i += 1
+            word = None
+
+        return word if word else match.group()
 
-    return ''.join(result)
\ No newline at end of file
+    return get_number_pattern(lang).sub(replace, text)
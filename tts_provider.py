@@ -1,4 +1,7 @@
+import asyncio
 import utils
+import http_transport
+from provider_registry import ProviderDescriptor, ProviderRegistry
 from enum import Enum
 from abc import ABC, abstractmethod
 
@@ -7,6 +10,8 @@ class TTSProvider(ABC):
     class Format(Enum):
         WAV = 1
         MP3 = 2
+        # raw signed 16 bit little endian samples at pcm_samplerate(), played without a decoder
+        PCM = 3
 
     @abstractmethod
     def name(self):
@@ -40,6 +45,16 @@ class TTSProvider(ABC):
     def max_length(self):
         pass
 
+    def max_concurrency(self):
+        return 2
+
+    def supports_pcm(self):
+        # whether text_to_speech_stream can return Format.PCM
+        return False
+
+    def pcm_samplerate(self):
+        return self.samplerate()
+
     @abstractmethod
     def _list_models(self):
         pass
@@ -59,11 +74,35 @@ class TTSProvider(ABC):
     def allows_list_caching(self):
         return True
 
+    def warm_up(self):
+        pass
+
+    def endpoint(self):
+        # base URL of the API, None if the provider doesn't talk HTTP through http_transport
+        return None
+
+    def prewarm(self):
+        # opens the connection in the background, so the first segment doesn't pay for the handshake
+        endpoint = self.endpoint()
+        if endpoint:
+            http_transport.prewarm(endpoint)
+
+    def catalog_ttl(self):
+        # seconds until the model and voice lists are refreshed
+        return 24 * 60 * 60
+
+    def allows_audio_caching(self):
+        return True
+
+    def produces_audio(self):
+        # False for providers with their own output, nothing is played and no device is opened for them
+        return True
+
     def list_models(self, cache_directory_path):
-        return utils.list_models(self.name(), self._list_models, self.allows_list_caching(), cache_directory_path)
+        return utils.list_models(self.name(), self._list_models, self.allows_list_caching(), cache_directory_path, self.catalog_ttl())
 
     def list_voices(self, cache_directory_path):
-        return utils.list_voices(self.name(), self._list_voices, self.allows_list_caching(), cache_directory_path)
+        return utils.list_voices(self.name(), self._list_voices, self.allows_list_caching(), cache_directory_path, self.catalog_ttl())
 
     def get_voice_name(self, voice):
         return voice.split('\t')[1] if '\t' in voice else voice
@@ -84,9 +123,17 @@ class TTSProvider(ABC):
         pass
 
     @abstractmethod
-    def text_to_speech_stream(self, text, model, voice_id, speed, virtual_audio_file):
+    def text_to_speech_stream(self, text, model, voice_id, speed, virtual_audio_file, audio_format=None):
+        # audio_format is format() if None
         pass
 
+    async def text_to_speech_async(self, text, model, voice_id, speed, audio_file):
+        # the SDKs block, the calls run on a worker thread
+        await asyncio.to_thread(utils.with_thread_state(self.text_to_speech), text, model, voice_id, speed, audio_file)
+
+    async def text_to_speech_stream_async(self, text, model, voice_id, speed, virtual_audio_file, audio_format=None):
+        await asyncio.to_thread(utils.with_thread_state(self.text_to_speech_stream), text, model, voice_id, speed, virtual_audio_file, audio_format)
+
     @abstractmethod
     def get_response(self, text, model, voice_id, speed):
         pass
@@ -94,14 +141,12 @@ class TTSProvider(ABC):
     def close(self):
         pass
 
-def get_tts_providers():
-    providers = []
-    from openai_tts_provider import OpenAITTSProvider
-    providers.append(OpenAITTSProvider())
-    from elevenlabs_tts_provider import ElevenLabsTTSProvider
-    providers.append(ElevenLabsTTSProvider())
-    from playht_tts_provider import PlayHTProvider
-    providers.append(PlayHTProvider())
-    from print_tts_provider import PrintTTSProvider
-    providers.append(PrintTTSProvider())
-    return providers
\ No newline at end of file
+TTS_PROVIDERS = [
+    ProviderDescriptor('openai-tts', 'openai_tts_provider', 'OpenAITTSProvider'),
+    ProviderDescriptor('elevenlabs', 'elevenlabs_tts_provider', 'ElevenLabsTTSProvider'),
+    ProviderDescriptor('playht', 'playht_tts_provider', 'PlayHTProvider'),
+    ProviderDescriptor('printer', 'print_tts_provider', 'PrintTTSProvider'),
+]
+
+def get_tts_providers(cache_directory_path):
+    return ProviderRegistry('tts', TTS_PROVIDERS, cache_directory_path)
\ No newline at end of file
@@ -2,16 +2,66 @@ import sys
 import re
 import traceback
 import os
-import datetime
+import threading
+import tracing
+import audio_output
 
 VERBOSE = False
 
+# the daemon serves requests with and without --verbose at the same time
+local = threading.local()
+
+def set_verbose(verbose):
+    global VERBOSE
+    VERBOSE = verbose
+    local.verbose = verbose
+
+def is_verbose():
+    return getattr(local, 'verbose', VERBOSE)
+
+def capture_thread_state():
+    # verbosity, the tracer, the audio output and, in the daemon, the client's stdout/stderr are per thread
+    streams = {}
+    for name in [ 'stdout', 'stderr' ]:
+        stream = getattr(sys, name)
+        if hasattr(stream, 'set') and hasattr(stream, 'get'):
+            streams[name] = stream.get()
+    return is_verbose(), streams, tracing.get_tracer(), audio_output.get_audio_output()
+
+def apply_thread_state(state):
+    verbose, streams, tracer, output = state
+    local.verbose = verbose
+    tracing.set_tracer(tracer)
+    audio_output.set_audio_output(output)
+    for name, stream in streams.items():
+        getattr(sys, name).set(stream)
+
+def with_thread_state(func):
+    # func runs on a worker thread with the state of the calling thread
+    state = capture_thread_state()
+    def run(*args, **kwargs):
+        apply_thread_state(state)
+        return func(*args, **kwargs)
+    return run
+
+def write_atomically(file_path, data):
+    # readers see the old or the new file, never a partial one, the temp file is unique per process and thread
+    temp_path = f'{file_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temp_path, 'wb' if isinstance(data, (bytes, bytearray)) else 'w') as f:
+            f.write(data)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
 def print_verbose(*args):
     pargs = list(args)
     if len(pargs) > 1:
         pargs[0] = (str(pargs[0]) + ':').ljust(15)
 
-    if VERBOSE:
+    if is_verbose():
         print(*pargs, file=sys.stderr, flush=True)
 
 def print_error(*args):
@@ -32,29 +82,17 @@ def print_error(*args):
                 last_message = message
 
     print(''.join(messages), file=sys.stderr, flush=True)
-    if VERBOSE and is_exception:
+    if is_verbose() and is_exception:
         traceback.print_exc(file=sys.stderr)
 
-def list_models(name, list_models_func, allows_caching, cache_directory_path):
-    return list_items(name, 'models', list_models_func, allows_caching, cache_directory_path)
-
-def list_voices(name, list_voices_func, allows_caching, cache_directory_path):
-    return list_items(name, 'voices', list_voices_func, allows_caching, cache_directory_path)
-
-def list_items(name, suffix, list_func, allows_caching, cache_directory_path):
-    items = []
-    file_path = None
-    if allows_caching:
-        file_path = os.path.join(cache_directory_path, f'{name}.{suffix}')
-    if file_path and os.path.exists(file_path):
-        mod_time = os.path.getmtime(file_path)
-        mod_date = datetime.date.fromtimestamp(mod_time)
-        if mod_date == datetime.date.today():
-            with open(file_path, 'r') as f:
-                items = f.read().splitlines()
-    if len(items) == 0:
-        items = list_func()
-        if file_path:
-            with open(file_path, 'w') as f:
-                f.write('\n'.join(items))
-    return items
\ No newline at end of file
+def list_models(name, list_models_func, allows_caching, cache_directory_path, ttl_seconds=None):
+    return list_items(name, 'models', list_models_func, allows_caching, cache_directory_path, ttl_seconds)
+
+def list_voices(name, list_voices_func, allows_caching, cache_directory_path, ttl_seconds=None):
+    return list_items(name, 'voices', list_voices_func, allows_caching, cache_directory_path, ttl_seconds)
+
+def list_items(name, suffix, list_func, allows_caching, cache_directory_path, ttl_seconds=None):
+    if not allows_caching:
+        return list_func()
+    from catalog import get_catalog, DEFAULT_CATALOG_TTL
+    return get_catalog(cache_directory_path).get(name, suffix, list_func, ttl_seconds or DEFAULT_CATALOG_TTL)